@@ -1,22 +1,163 @@
 from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import and_, func, desc, or_
+from sqlalchemy import Index, and_, desc, func, literal_column, select, tuple_
+from sqlalchemy.dialects.postgresql import Range, insert
+from sqlalchemy.exc import IntegrityError
 from app.models.booking import Booking, BookingStatus
+from app.models.booking_interval import BookingInterval
 from app.models.user import User
 from app.models.car_wash import CarWash
 from app.models.service import Service
 from app.schemas.booking import BookingCreate, BookingUpdate
-from typing import List, Optional
+from app.crud.car_wash import get_nearby_car_washes
+from app.crud.pagination import BOOKING_CURSOR, decode_cursor, encode_cursor
+from app.crud.notification import enqueue_notification
+from app.services.notification import NotificationType
+from app.services.availability import (
+    DEFAULT_STEP_MINUTES,
+    compute_free_slots,
+    first_free_slot,
+    minutes_to_label
+)
+from typing import Iterator, List, Optional, Tuple
+from collections import defaultdict
 from datetime import date, time, datetime, timedelta
+import zlib
 
+ACTIVE_STATUSES = (BookingStatus.PENDENTE, BookingStatus.CONFIRMADO)
 
-def create_booking(db: Session, booking: BookingCreate, user_id: str) -> Booking:
+
+class BookingConflict(Exception):
+    """O período do agendamento se sobrepõe a outro agendamento ativo do lava-jato"""
+
+
+# Índices compostos que sustentam as listagens paginadas por cursor
+Index("ix_bookings_user_data_hora_id", Booking.user_id, Booking.data, Booking.hora, Booking.id)
+Index("ix_bookings_car_wash_data_hora_id", Booking.car_wash_id, Booking.data, Booking.hora, Booking.id)
+
+
+def booking_sort_key(booking: Booking) -> tuple:
+    return booking.data, booking.hora, booking.id
+
+
+def _booking_period(target_date: date, target_time: time, duration_minutes: int):
+    start = datetime.combine(target_date, target_time)
+    return start, start + timedelta(minutes=duration_minutes)
+
+
+def _sync_booking_interval(db: Session, booking: Booking, duration_minutes: int = None):
+    """Mantém o período materializado coerente com o status do agendamento (sem commit)"""
+    interval = db.get(BookingInterval, booking.id)
+
+    if BookingStatus(booking.status) not in ACTIVE_STATUSES:
+        if interval:
+            db.delete(interval)
+        return
+
+    if interval:
+        return
+
+    if duration_minutes is None:
+        duration_minutes = db.query(Service.duracao_minutos).filter(
+            Service.id == booking.service_id
+        ).scalar()
+
+    inicio, fim = _booking_period(booking.data, booking.hora, duration_minutes)
+    db.add(BookingInterval(
+        booking_id=booking.id,
+        car_wash_id=booking.car_wash_id,
+        inicio=inicio,
+        fim=fim
+    ))
+
+
+def _day_lock_key(car_wash_id: str, target_date: date) -> Tuple[int, int]:
+    # Chave estável entre processos para pg_advisory_xact_lock(int4, int4)
+    car_wash_key = zlib.crc32(str(car_wash_id).encode())
+    if car_wash_key >= 2 ** 31:
+        car_wash_key -= 2 ** 32
+    return car_wash_key, target_date.toordinal()
+
+
+def _insert_booking(
+        db: Session,
+        booking: BookingCreate,
+        user_id: str,
+        duration_minutes: int
+) -> Optional[Booking]:
     db_booking = Booking(user_id=user_id, **booking.dict())
     db.add(db_booking)
-    db.commit()
+    db.flush()
+    _sync_booking_interval(db, db_booking, duration_minutes)
+    enqueue_notification(db, NotificationType.BOOKING_CREATED, booking_id=db_booking.id)
+
+    try:
+        db.commit()
+    except IntegrityError:
+        # A exclusion constraint rejeitou um período sobreposto
+        db.rollback()
+        return None
+
     db.refresh(db_booking)
     return db_booking
 
 
+# Notificações disparadas quando um agendamento passa para cada status
+STATUS_NOTIFICATIONS = {
+    BookingStatus.CONFIRMADO: NotificationType.BOOKING_CONFIRMED,
+    BookingStatus.CONCLUIDO: NotificationType.REVIEW_REQUEST,
+}
+
+
+def _enqueue_status_notification(db: Session, booking: Booking, previous_status):
+    new_status = BookingStatus(booking.status)
+    if previous_status is not None and BookingStatus(previous_status) == new_status:
+        return
+
+    notification_type = STATUS_NOTIFICATIONS.get(new_status)
+    if notification_type:
+        enqueue_notification(db, notification_type, booking_id=booking.id)
+
+
+def create_booking(db: Session, booking: BookingCreate, user_id: str) -> Optional[Booking]:
+    duration_minutes = db.query(Service.duracao_minutos).filter(
+        Service.id == booking.service_id
+    ).scalar()
+    if duration_minutes is None:
+        return None
+
+    return _insert_booking(db, booking, user_id, duration_minutes)
+
+
+def reserve_booking(db: Session, booking: BookingCreate, user_id: str) -> Optional[Booking]:
+    """
+    Verifica e grava o agendamento de forma atômica
+    Um advisory lock de transação serializa apenas as reservas do mesmo
+    lava-jato no mesmo dia; outros dias e lava-jatos seguem em paralelo.
+    O lock é liberado no commit/rollback de _insert_booking.
+    """
+    db.execute(select(func.pg_advisory_xact_lock(*_day_lock_key(booking.car_wash_id, booking.data))))
+
+    duration_minutes = db.query(Service.duracao_minutos).filter(
+        Service.id == booking.service_id
+    ).scalar()
+    if duration_minutes is None:
+        db.rollback()
+        return None
+
+    inicio, fim = _booking_period(booking.data, booking.hora, duration_minutes)
+    conflicting_booking = db.query(BookingInterval.booking_id).filter(
+        and_(
+            BookingInterval.car_wash_id == booking.car_wash_id,
+            BookingInterval.periodo.overlaps(Range(inicio, fim, bounds="[)"))
+        )
+    ).first()
+    if conflicting_booking:
+        db.rollback()
+        return None
+
+    return _insert_booking(db, booking, user_id, duration_minutes)
+
+
 def get_booking_by_id(db: Session, booking_id: str, user_id: str = None) -> Optional[Booking]:
     query = db.query(Booking).options(
         joinedload(Booking.user),
@@ -35,7 +176,8 @@ def get_user_bookings(
         user_id: str,
         status: Optional[BookingStatus] = None,
         skip: int = 0,
-        limit: int = 100
+        limit: int = 100,
+        cursor: Optional[str] = None
 ) -> List[Booking]:
     query = db.query(Booking).options(
         joinedload(Booking.car_wash),
@@ -45,7 +187,16 @@ def get_user_bookings(
     if status:
         query = query.filter(Booking.status == status.value)  # <-- CORREÇÃO
 
-    return query.order_by(desc(Booking.data), desc(Booking.hora)).offset(skip).limit(limit).all()
+    query = query.order_by(desc(Booking.data), desc(Booking.hora), desc(Booking.id))
+
+    if cursor:
+        # Keyset: continua logo após a última linha da página anterior
+        query = query.filter(
+            tuple_(Booking.data, Booking.hora, Booking.id) < tuple_(*decode_cursor(cursor, BOOKING_CURSOR))
+        )
+        return query.limit(limit).all()
+
+    return query.offset(skip).limit(limit).all()
 
 
 def get_car_wash_bookings(
@@ -54,7 +205,8 @@ def get_car_wash_bookings(
         target_date: Optional[date] = None,
         status: Optional[BookingStatus] = None,
         skip: int = 0,
-        limit: int = 100
+        limit: int = 100,
+        cursor: Optional[str] = None
 ) -> List[Booking]:
     query = db.query(Booking).options(
         joinedload(Booking.user),
@@ -67,7 +219,15 @@ def get_car_wash_bookings(
     if status:
         query = query.filter(Booking.status == status.value)  # <-- CORREÇÃO
 
-    return query.order_by(Booking.data, Booking.hora).offset(skip).limit(limit).all()
+    query = query.order_by(Booking.data, Booking.hora, Booking.id)
+
+    if cursor:
+        query = query.filter(
+            tuple_(Booking.data, Booking.hora, Booking.id) > tuple_(*decode_cursor(cursor, BOOKING_CURSOR))
+        )
+        return query.limit(limit).all()
+
+    return query.offset(skip).limit(limit).all()
 
 
 def get_booking_with_details(db: Session, booking_id: str) -> Optional[dict]:
@@ -103,8 +263,18 @@ def update_booking_status(
     if not booking:
         return None
 
+    previous_status = booking.status
     booking.status = new_status
-    db.commit()
+    _sync_booking_interval(db, booking)
+    _enqueue_status_notification(db, booking, previous_status)
+
+    try:
+        db.commit()
+    except IntegrityError:
+        # Reativar o agendamento esbarrou na exclusion constraint
+        db.rollback()
+        raise BookingConflict()
+
     db.refresh(booking)
     return booking
 
@@ -122,12 +292,22 @@ def update_booking(
     if not booking:
         return None
 
+    previous_status = booking.status
     update_data = booking_update.dict(exclude_unset=True)
     for field, value in update_data.items():
         if hasattr(booking, field):
             setattr(booking, field, value)
 
-    db.commit()
+    _sync_booking_interval(db, booking)
+    _enqueue_status_notification(db, booking, previous_status)
+
+    try:
+        db.commit()
+    except IntegrityError:
+        # Reativar o agendamento esbarrou na exclusion constraint
+        db.rollback()
+        raise BookingConflict()
+
     db.refresh(booking)
     return booking
 
@@ -145,6 +325,7 @@ def cancel_booking(db: Session, booking_id: str, user_id: str) -> bool:
         return False
 
     booking.status = BookingStatus.CANCELADO
+    _sync_booking_interval(db, booking)
     db.commit()
     return True
 
@@ -156,87 +337,239 @@ def check_availability(
         target_date: date,
         target_time: time
 ) -> bool:
-    service = db.query(Service).filter(Service.id == service_id).first()
-    if not service:
+    duration_minutes = db.query(Service.duracao_minutos).filter(
+        Service.id == service_id
+    ).scalar()
+    if duration_minutes is None:
         return False
 
-    service_duration = timedelta(minutes=service.duracao_minutos)
-    start_datetime = datetime.combine(target_date, target_time)
-    end_datetime = start_datetime + service_duration
+    inicio, fim = _booking_period(target_date, target_time, duration_minutes)
 
-    conflicting_bookings = db.query(Booking).filter(
+    # Uma única sondagem no índice GiST (car_wash_id, periodo)
+    conflicting_booking = db.query(BookingInterval.booking_id).filter(
         and_(
-            Booking.car_wash_id == car_wash_id,
-            Booking.data == target_date,
-            Booking.status.in_([BookingStatus.PENDENTE, BookingStatus.CONFIRMADO]),
-            or_(
-                and_(
-                    Booking.hora <= target_time,
-                    func.addtime(Booking.hora, func.sec_to_time(Service.duracao_minutos * 60)) > target_time
-                ),
-                and_(
-                    Booking.hora < end_datetime.time(),
-                    func.addtime(Booking.hora, func.sec_to_time(Service.duracao_minutos * 60)) >= end_datetime.time()
-                ),
-                and_(
-                    Booking.hora >= target_time,
-                    Booking.hora < end_datetime.time()
-                )
-            )
+            BookingInterval.car_wash_id == car_wash_id,
+            BookingInterval.periodo.overlaps(Range(inicio, fim, bounds="[)"))
         )
-    ).join(Service, Booking.service_id == Service.id).first()
+    ).first()
 
-    return conflicting_bookings is None
+    return conflicting_booking is None
 
 
 def get_available_times(
         db: Session,
         car_wash_id: str,
         target_date: date,
-        service_duration: int = 60
+        service_duration: int = 60,
+        step_minutes: int = DEFAULT_STEP_MINUTES
 ) -> List[str]:
     car_wash = db.query(CarWash).filter(CarWash.id == car_wash_id).first()
     if not car_wash or not car_wash.aberto_de or not car_wash.aberto_ate:
         return []
 
-    existing_bookings = db.query(Booking).options(
-        joinedload(Booking.service)
-    ).filter(
+    day_start = datetime.combine(target_date, time.min)
+    day_end = day_start + timedelta(days=1)
+
+    # Os períodos materializados dispensam o join com Service
+    existing_intervals = db.query(BookingInterval.inicio, BookingInterval.fim).filter(
         and_(
-            Booking.car_wash_id == car_wash_id,
-            Booking.data == target_date,
-            Booking.status.in_([BookingStatus.PENDENTE, BookingStatus.CONFIRMADO])
+            BookingInterval.car_wash_id == car_wash_id,
+            BookingInterval.periodo.overlaps(Range(day_start, day_end, bounds="[)"))
         )
     ).all()
 
-    available_times = []
-    current_time = car_wash.aberto_de
-    end_time = car_wash.aberto_ate
+    busy = [
+        (int((inicio - day_start).total_seconds() // 60), int((fim - day_start).total_seconds() // 60))
+        for inicio, fim in existing_intervals
+    ]
+
+    return compute_free_slots(
+        car_wash.aberto_de,
+        car_wash.aberto_ate,
+        busy,
+        duration=service_duration,
+        step=step_minutes
+    )
+
+
+def iter_availability_calendar(
+        db: Session,
+        car_wash_id: str,
+        start_date: date,
+        end_date: date,
+        service_duration: int = 60,
+        step_minutes: int = DEFAULT_STEP_MINUTES
+) -> Iterator[Tuple[date, List[str]]]:
+    """
+    Gera (dia, horários livres) para um intervalo de datas com uma única consulta
+    As linhas chegam ordenadas por início; um dia é emitido assim que o cursor
+    passa dele, o que permite transmitir resultados parciais em faixas longas.
+    """
+    car_wash = db.query(CarWash).filter(CarWash.id == car_wash_id).first()
+    if not car_wash or not car_wash.aberto_de or not car_wash.aberto_ate:
+        return
+
+    range_start = datetime.combine(start_date, time.min)
+    range_end = datetime.combine(end_date, time.min) + timedelta(days=1)
+
+    intervals = db.query(BookingInterval.inicio, BookingInterval.fim).filter(
+        and_(
+            BookingInterval.car_wash_id == car_wash_id,
+            BookingInterval.periodo.overlaps(Range(range_start, range_end, bounds="[)"))
+        )
+    ).order_by(BookingInterval.inicio).yield_per(500)
+
+    busy_by_day = defaultdict(list)
+    current_day = start_date
+
+    def emit(day: date) -> Tuple[date, List[str]]:
+        return day, compute_free_slots(
+            car_wash.aberto_de,
+            car_wash.aberto_ate,
+            busy_by_day.pop(day, []),
+            duration=service_duration,
+            step=step_minutes
+        )
+
+    for inicio, fim in intervals:
+        # Nenhum intervalo posterior pode tocar os dias anteriores ao início atual
+        while current_day < inicio.date() and current_day <= end_date:
+            yield emit(current_day)
+            current_day += timedelta(days=1)
 
-    while current_time < end_time:
-        is_available = True
-        service_end = (datetime.combine(target_date, current_time) +
-                       timedelta(minutes=service_duration)).time()
+        day = max(inicio.date(), start_date)
+        while day <= end_date and datetime.combine(day, time.min) < fim:
+            day_start = datetime.combine(day, time.min)
+            busy_by_day[day].append((
+                int((inicio - day_start).total_seconds() // 60),
+                int((fim - day_start).total_seconds() // 60)
+            ))
+            day += timedelta(days=1)
 
-        if service_end > end_time:
-            break
+    while current_day <= end_date:
+        yield emit(current_day)
+        current_day += timedelta(days=1)
 
-        for booking in existing_bookings:
-            booking_start = booking.hora
-            booking_end = (datetime.combine(target_date, booking.hora) +
-                           timedelta(minutes=booking.service.duracao_minutos)).time()
 
-            if (current_time < booking_end and service_end > booking_start):
-                is_available = False
-                break
+def get_availability_calendar(
+        db: Session,
+        car_wash_id: str,
+        start_date: date,
+        end_date: date,
+        service_duration: int = 60,
+        step_minutes: int = DEFAULT_STEP_MINUTES
+) -> dict:
+    return {
+        day.isoformat(): times
+        for day, times in iter_availability_calendar(
+            db, car_wash_id, start_date, end_date, service_duration, step_minutes
+        )
+    }
 
-        if is_available:
-            available_times.append(current_time.strftime("%H:%M"))
 
-        current_time = (datetime.combine(target_date, current_time) +
-                        timedelta(minutes=30)).time()
+def find_next_available_car_washes(
+        db: Session,
+        user_lat: float,
+        user_lon: float,
+        radius_km: float = 10,
+        target_date: Optional[date] = None,
+        service_duration: int = 60,
+        step_minutes: int = DEFAULT_STEP_MINUTES,
+        minutes_per_km: float = 3.0,
+        limit: int = 10,
+        max_candidates: int = 50
+) -> List[dict]:
+    """
+    Combina proximidade e disponibilidade: busca os períodos ocupados de todos os
+    lava-jatos candidatos em uma única consulta e calcula o primeiro horário livre
+    de cada um. A pontuação soma a espera em minutos com a distância convertida em
+    minutos de deslocamento (minutes_per_km); menor é melhor.
+    """
+    now = datetime.now()
+    target_date = target_date or now.date()
+    if target_date < now.date():
+        return []
 
-    return available_times
+    car_washes = [
+        car_wash for car_wash in get_nearby_car_washes(
+            db, user_lat, user_lon, radius_km=radius_km, limit=max_candidates
+        )
+        if car_wash.aberto_de and car_wash.aberto_ate
+    ]
+    if not car_washes:
+        return []
+
+    day_start = datetime.combine(target_date, time.min)
+    day_end = day_start + timedelta(days=1)
+
+    intervals = db.query(
+        BookingInterval.car_wash_id,
+        BookingInterval.inicio,
+        BookingInterval.fim
+    ).filter(
+        and_(
+            BookingInterval.car_wash_id.in_([car_wash.id for car_wash in car_washes]),
+            BookingInterval.periodo.overlaps(Range(day_start, day_end, bounds="[)"))
+        )
+    ).all()
+
+    busy_by_car_wash = defaultdict(list)
+    for car_wash_id, inicio, fim in intervals:
+        busy_by_car_wash[str(car_wash_id)].append((
+            int((inicio - day_start).total_seconds() // 60),
+            int((fim - day_start).total_seconds() // 60)
+        ))
+
+    not_before = None
+    if target_date == now.date():
+        not_before = now.hour * 60 + now.minute + (1 if now.second or now.microsecond else 0)
+
+    results = []
+    for car_wash in car_washes:
+        slot = first_free_slot(
+            car_wash.aberto_de,
+            car_wash.aberto_ate,
+            busy_by_car_wash.get(str(car_wash.id), []),
+            duration=service_duration,
+            step=step_minutes,
+            not_before=not_before
+        )
+        if slot is None:
+            continue
+
+        wait_minutes = max(0, int(((day_start + timedelta(minutes=slot)) - now).total_seconds() // 60))
+        results.append({
+            "car_wash": car_wash,
+            "data": target_date,
+            "horario": minutes_to_label(slot),
+            "espera_minutos": wait_minutes,
+            "pontuacao": round(wait_minutes + car_wash.distancia * minutes_per_km, 2)
+        })
+
+    results.sort(key=lambda item: item["pontuacao"])
+    return results[:limit]
+
+
+def rebuild_booking_intervals(db: Session) -> int:
+    """
+    Recria os períodos materializados a partir dos agendamentos ativos
+    Usado para popular a tabela em bases existentes; agendamentos legados que já
+    se sobrepõem são ignorados em vez de violar a exclusion constraint.
+    """
+    inicio = Booking.data + Booking.hora
+    fim = inicio + literal_column("interval '1 minute'") * Service.duracao_minutos
+
+    db.query(BookingInterval).delete(synchronize_session=False)
+    result = db.execute(
+        insert(BookingInterval).from_select(
+            ["booking_id", "car_wash_id", "inicio", "fim"],
+            select(Booking.id, Booking.car_wash_id, inicio, fim).join(
+                Service, Booking.service_id == Service.id
+            ).where(Booking.status.in_(ACTIVE_STATUSES)).order_by(Booking.criado_em)
+        ).on_conflict_do_nothing()
+    )
+    db.commit()
+    return result.rowcount
 
 
 def get_upcoming_bookings(db: Session, days_ahead: int = 7) -> List[Booking]:
@@ -254,6 +587,39 @@ def get_upcoming_bookings(db: Session, days_ahead: int = 7) -> List[Booking]:
     ).order_by(Booking.data, Booking.hora).all()
 
 
+def _user_upcoming_filter(user_id: str, days_ahead: int):
+    today = date.today()
+    return and_(
+        Booking.user_id == user_id,
+        Booking.data.between(today, today + timedelta(days=days_ahead)),
+        Booking.status.in_(ACTIVE_STATUSES)
+    )
+
+
+def get_user_upcoming_bookings(db: Session, user_id: str, days_ahead: int = 7) -> List[Booking]:
+    # Percorre apenas o trecho do usuário em ix_bookings_user_data_hora_id
+    return db.query(Booking).options(
+        joinedload(Booking.car_wash),
+        joinedload(Booking.service)
+    ).filter(
+        _user_upcoming_filter(user_id, days_ahead)
+    ).order_by(Booking.data, Booking.hora).all()
+
+
+def get_user_upcoming_version(db: Session, user_id: str, days_ahead: int = 7) -> str:
+    """
+    Token de mudança dos próximos agendamentos do usuário
+    Muda quando um agendamento entra, sai ou é alterado na janela (ou quando o dia vira),
+    e custa apenas um agregado sobre o índice, sem carregar as entidades.
+    """
+    total, last_update = db.query(
+        func.count(Booking.id),
+        func.max(Booking.atualizado_em)
+    ).filter(_user_upcoming_filter(user_id, days_ahead)).one()
+
+    return encode_cursor((date.today(), days_ahead, total, last_update or ""))
+
+
 def get_bookings_for_reminder(db: Session, reminder_date: date) -> List[Booking]:
     return db.query(Booking).options(
         joinedload(Booking.user),
@@ -264,4 +630,52 @@ def get_bookings_for_reminder(db: Session, reminder_date: date) -> List[Booking]
             Booking.data == reminder_date,
             Booking.status == BookingStatus.CONFIRMADO
         )
-    ).all()
\ No newline at end of file
+    ).all()
+
+
+def iter_reminder_batches(db: Session, reminder_date: date, batch_size: int = 200) -> Iterator[List[dict]]:
+    """
+    Percorre os agendamentos confirmados do dia em lotes, sem carregar tudo em memória
+    Seleciona só as colunas usadas no lembrete e lê o cursor com yield_per
+    """
+    stmt = select(
+        Booking.id,
+        Booking.data,
+        Booking.hora,
+        User.email,
+        User.nome,
+        CarWash.nome,
+        CarWash.endereco,
+        Service.nome
+    ).join(
+        User, Booking.user_id == User.id
+    ).join(
+        CarWash, Booking.car_wash_id == CarWash.id
+    ).join(
+        Service, Booking.service_id == Service.id
+    ).where(
+        and_(
+            Booking.data == reminder_date,
+            Booking.status == BookingStatus.CONFIRMADO
+        )
+    ).order_by(Booking.hora, Booking.id)
+
+    rows = db.execute(stmt, execution_options={"yield_per": batch_size})
+
+    for partition in rows.partitions():
+        yield [
+            {
+                'user_email': user_email,
+                'user_name': user_name,
+                'booking_data': {
+                    'booking_id': str(booking_id),
+                    'car_wash_name': car_wash_name,
+                    'car_wash_address': car_wash_address or '',
+                    'service_name': service_name,
+                    'booking_date': booking_date.strftime('%d/%m/%Y'),
+                    'booking_time': booking_time.strftime('%H:%M')
+                }
+            }
+            for booking_id, booking_date, booking_time, user_email, user_name,
+            car_wash_name, car_wash_address, service_name in partition
+        ]
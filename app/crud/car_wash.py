@@ -1,12 +1,38 @@
 # app/crud/car_wash.py
 from sqlalchemy.orm import Session
-from sqlalchemy import func, and_
+from sqlalchemy import Index, Numeric, and_, cast, desc, func, or_, select, tuple_, update
+from sqlalchemy.dialects.postgresql import insert
 from app.models.car_wash import CarWash
 from app.models.service import Service
 from app.models.review import Review
+from app.models.car_wash_rating_stats import CarWashRatingStats
 from app.schemas.car_wash import CarWashCreate
-from typing import List, Optional
-import math
+from app.crud.search import matches_search, prefix_tsquery, search_document, search_rank
+from app.services.core.config import settings
+from app.services.geo_index import MAX_DISTANCE_KM, car_wash_index
+from app.services.geo_kernel import distance_km
+from app.services.location import get_bounding_box, longitude_ranges
+from app.services.nearby_cache import nearby_cache
+from app.services.review_stats_cache import RATING_STARS, rating_stats_payload, review_stats_cache
+from app.services.suggest import suggest_index
+from typing import List, Optional, Tuple
+from uuid import UUID
+
+# Pré-filtro por bounding box da busca por proximidade (só lava-jatos ativos)
+Index(
+    "ix_car_washes_ativo_latitude_longitude",
+    CarWash.latitude,
+    CarWash.longitude,
+    postgresql_where=CarWash.ativo == True
+)
+
+# Busca textual em português (nome com peso A, descrição com peso B), sem acentos
+Index(
+    "ix_car_washes_busca",
+    search_document(CarWash.nome, CarWash.descricao),
+    postgresql_using="gin",
+    postgresql_where=CarWash.ativo == True
+)
 
 
 def create_car_wash(db: Session, car_wash: CarWashCreate) -> CarWash:
@@ -14,6 +40,9 @@ def create_car_wash(db: Session, car_wash: CarWashCreate) -> CarWash:
     db.add(db_car_wash)
     db.commit()
     db.refresh(db_car_wash)
+    car_wash_index.add(db_car_wash.id, db_car_wash.latitude, db_car_wash.longitude)
+    nearby_cache.invalidate_point(db_car_wash.latitude, db_car_wash.longitude)
+    suggest_index.add_car_wash(db_car_wash)
     return db_car_wash
 
 
@@ -29,21 +58,129 @@ def get_car_washes(db: Session, skip: int = 0, limit: int = 100) -> List[CarWash
 
 def calculate_distance(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
     """Calcula distância entre dois pontos usando fórmula de Haversine"""
-    R = 6371  # Raio da Terra em km
+    return distance_km(lat1, lon1, lat2, lon2)
+
+
+def distance_km_column(user_lat: float, user_lon: float):
+    """Haversine em SQL, arredondado em 2 casas como calculate_distance"""
+    a = (
+        func.power(func.sin(func.radians(CarWash.latitude - user_lat) / 2), 2) +
+        func.cos(func.radians(user_lat)) * func.cos(func.radians(CarWash.latitude)) *
+        func.power(func.sin(func.radians(CarWash.longitude - user_lon) / 2), 2)
+    )
+    distance = 2 * 6371 * func.asin(func.least(1.0, func.sqrt(a)))
+    return func.round(cast(distance, Numeric), 2)
+
+
+def bounding_box_filter(user_lat: float, user_lon: float, radius_km: float):
+    """Pré-filtro do raio pelo índice (latitude, longitude), dando a volta no antimeridiano"""
+    min_lat, max_lat, min_lon, max_lon = get_bounding_box(user_lat, user_lon, radius_km)
+    return and_(
+        CarWash.latitude.between(min_lat, max_lat),
+        or_(*[CarWash.longitude.between(low, high) for low, high in longitude_ranges(min_lon, max_lon)])
+    )
+
+
+def _get_nearby_from_database(
+        db: Session,
+        user_lat: float,
+        user_lon: float,
+        radius_km: float,
+        skip: int,
+        limit: int
+) -> List[CarWash]:
+    """
+    O bounding box do raio usa o índice (latitude, longitude) e descarta quase todas
+    as linhas; o Haversine exato, a ordenação e a paginação rodam no banco só
+    sobre as que sobraram.
+    """
+    distance = distance_km_column(user_lat, user_lon).label('distancia')
+
+    rows = db.query(CarWash, distance).filter(
+        and_(
+            CarWash.ativo == True,
+            bounding_box_filter(user_lat, user_lon, radius_km),
+            distance <= radius_km
+        )
+    ).order_by(distance, CarWash.id).offset(skip).limit(limit).all()
+
+    nearby_car_washes = []
+    for car_wash, car_wash_distance in rows:
+        # Adiciona distância como atributo temporário
+        car_wash.distancia = float(car_wash_distance)
+        nearby_car_washes.append(car_wash)
+
+    return nearby_car_washes
+
+
+def _load_ranked_car_washes(db: Session, ranked: List[Tuple[UUID, float]]) -> List[CarWash]:
+    """Carrega do banco, na ordem dada, os lava-jatos de [(id, distância)] vindos do índice"""
+    if not ranked:
+        return []
 
-    lat1_rad = math.radians(lat1)
-    lon1_rad = math.radians(lon1)
-    lat2_rad = math.radians(lat2)
-    lon2_rad = math.radians(lon2)
+    car_washes = {
+        car_wash.id: car_wash
+        for car_wash in db.query(CarWash).filter(
+            and_(CarWash.id.in_([car_wash_id for car_wash_id, _ in ranked]), CarWash.ativo == True)
+        ).all()
+    }
 
-    dlat = lat2_rad - lat1_rad
-    dlon = lon2_rad - lon1_rad
+    nearby_car_washes = []
+    for car_wash_id, distance in ranked:
+        car_wash = car_washes.get(car_wash_id)
+        if car_wash is None:
+            # Desativado por outro processo depois da última carga do índice
+            car_wash_index.remove(car_wash_id)
+            continue
+        # Adiciona distância como atributo temporário
+        car_wash.distancia = distance
+        nearby_car_washes.append(car_wash)
+
+    return nearby_car_washes
 
-    a = math.sin(dlat / 2) ** 2 + math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(dlon / 2) ** 2
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-    distance = R * c
 
-    return round(distance, 2)
+def _get_nearby_from_index(
+        db: Session,
+        user_lat: float,
+        user_lon: float,
+        radius_km: float,
+        skip: int,
+        limit: int
+) -> List[CarWash]:
+    """
+    O índice espacial em memória seleciona os ids dentro do raio já ordenados por
+    distância; só a página pedida é carregada do banco.
+    """
+    car_wash_index.ensure_loaded(db)
+    page = car_wash_index.query_radius(user_lat, user_lon, radius_km)[skip:skip + limit]
+    return _load_ranked_car_washes(db, page)
+
+
+def _get_nearby_candidates(
+        db: Session,
+        center_lat: float,
+        center_lon: float,
+        radius_km: float
+) -> List[Tuple[UUID, float, float, float]]:
+    """Candidatos (id, latitude, longitude, distância) de uma entrada do cache de proximidade"""
+    if settings.NEARBY_SEARCH_BACKEND == "memory":
+        car_wash_index.ensure_loaded(db)
+        return car_wash_index.query_radius_points(center_lat, center_lon, radius_km)
+
+    distance = distance_km_column(center_lat, center_lon)
+
+    rows = db.query(CarWash.id, CarWash.latitude, CarWash.longitude, distance).filter(
+        and_(
+            CarWash.ativo == True,
+            bounding_box_filter(center_lat, center_lon, radius_km),
+            distance <= radius_km
+        )
+    ).all()
+
+    return [
+        (car_wash_id, latitude, longitude, float(car_wash_distance))
+        for car_wash_id, latitude, longitude, car_wash_distance in rows
+    ]
 
 
 def get_nearby_car_washes(
@@ -54,31 +191,69 @@ def get_nearby_car_washes(
         skip: int = 0,
         limit: int = 100
 ) -> List[CarWash]:
-    """Busca lava-jatos próximos ao usuário"""
-    car_washes = db.query(CarWash).filter(CarWash.ativo == True).all()
+    """
+    Busca lava-jatos próximos ao usuário, do mais próximo ao mais distante
+    NEARBY_SEARCH_BACKEND escolhe entre o banco ("database", sempre consistente entre
+    processos) e o índice em memória ("memory", mais rápido, recarregado periodicamente).
+    Com o cache ativo, os candidatos da célula vêm do cache e só a página é lida do banco.
+    """
+    if nearby_cache.enabled:
+        ranked = nearby_cache.search(
+            user_lat, user_lon, radius_km,
+            lambda center_lat, center_lon, search_radius: _get_nearby_candidates(
+                db, center_lat, center_lon, search_radius
+            )
+        )
+        page = ranked[skip:skip + limit]
+        car_washes = _load_ranked_car_washes(db, page)
+        if len(car_washes) == len(page):
+            return car_washes
+        # Algum candidato foi desativado/removido por outro processo e a página veio
+        # curta: descarta a entrada velha e refaz esta página pelo backend
+        nearby_cache.invalidate_search(user_lat, user_lon, radius_km)
 
-    nearby_car_washes = []
-    for car_wash in car_washes:
-        distance = calculate_distance(user_lat, user_lon, car_wash.latitude, car_wash.longitude)
-        if distance <= radius_km:
-            # Adiciona distância como atributo temporário
-            car_wash.distancia = distance
-            nearby_car_washes.append(car_wash)
+    if settings.NEARBY_SEARCH_BACKEND == "memory":
+        return _get_nearby_from_index(db, user_lat, user_lon, radius_km, skip, limit)
+    return _get_nearby_from_database(db, user_lat, user_lon, radius_km, skip, limit)
 
-    # Ordena por distância
-    nearby_car_washes.sort(key=lambda x: x.distancia)
 
-    return nearby_car_washes[skip:skip + limit]
+def get_nearest_car_washes(
+        db: Session,
+        user_lat: float,
+        user_lon: float,
+        k: int = 10,
+        initial_radius_km: float = 5
+) -> List[CarWash]:
+    """
+    Retorna os k lava-jatos ativos mais próximos, sem raio máximo
+    Busca por raio dobrando o raio até achar k resultados: com k lava-jatos dentro do
+    raio, nenhum fora dele pode estar mais perto. Cada rodada é uma consulta por raio
+    já indexada (grade em memória ou bounding box no banco).
+    """
+    if settings.NEARBY_SEARCH_BACKEND == "memory":
+        car_wash_index.ensure_loaded(db)
+        ranked = car_wash_index.query_nearest(user_lat, user_lon, k, initial_radius_km=initial_radius_km)
+        return _load_ranked_car_washes(db, ranked)
+
+    radius_km = initial_radius_km
+    while True:
+        car_washes = _get_nearby_from_database(db, user_lat, user_lon, radius_km, 0, k)
+        if len(car_washes) >= k or radius_km >= MAX_DISTANCE_KM:
+            return car_washes
+        radius_km = min(radius_km * 2, MAX_DISTANCE_KM)
 
 
 def search_car_washes(db: Session, query: str, skip: int = 0, limit: int = 100) -> List[CarWash]:
-    """Busca lava-jatos por nome ou descrição"""
+    """Busca lava-jatos por nome ou descrição, ordenados por relevância"""
+    tsquery = prefix_tsquery(query)
+    if tsquery is None:
+        return []
+
+    document = search_document(CarWash.nome, CarWash.descricao)
     return db.query(CarWash).filter(
-        and_(
-            CarWash.ativo == True,
-            func.lower(CarWash.nome).contains(query.lower()) |
-            func.lower(CarWash.descricao).contains(query.lower())
-        )
+        and_(CarWash.ativo == True, matches_search(document, tsquery))
+    ).order_by(
+        desc(search_rank(document, tsquery)), CarWash.nome, CarWash.id
     ).offset(skip).limit(limit).all()
 
 
@@ -96,20 +271,148 @@ def get_car_wash_with_services(db: Session, car_wash_id: str):
     return car_wash
 
 
-def update_car_wash_rating(db: Session, car_wash_id: str):
-    """Atualiza a nota média do lava-jato baseado nas avaliações"""
-    rating_data = db.query(
-        func.avg(Review.nota).label('avg_rating'),
-        func.count(Review.id).label('total_reviews')
-    ).filter(Review.car_wash_id == car_wash_id).first()
+def _rating_summary_values(stats) -> dict:
+    """car_washes.nota / total_avaliacoes derivados de uma linha (ou CTE) de agregados"""
+    return {
+        "nota": func.coalesce(
+            func.round(cast(stats.soma_notas, Numeric) / func.nullif(stats.total_avaliacoes, 0), 1),
+            0
+        ),
+        "total_avaliacoes": stats.total_avaliacoes
+    }
+
+
+def apply_rating_delta(
+        db: Session,
+        car_wash_id: str,
+        removed_nota: Optional[int] = None,
+        added_nota: Optional[int] = None
+):
+    """
+    Aplica nos agregados de avaliação a troca de uma nota, sem commit
+    Avaliação criada: só added_nota; removida: só removed_nota; alterada: as duas.
+    Agregados e car_washes.nota/total_avaliacoes mudam em um único UPDATE com CTE,
+    dentro da transação de quem chamou. Retorna (id, nome, nota, total_avaliacoes,
+    ativo) do lava-jato mais os agregados (versao, soma_notas, nota_1..nota_5), ou None se
+    nada mudou.
+    """
+    if removed_nota == added_nota:
+        return None
+
+    stats = CarWashRatingStats
+    sum_delta = (added_nota or 0) - (removed_nota or 0)
+    count_delta = int(added_nota is not None) - int(removed_nota is not None)
+    values = {
+        "soma_notas": stats.soma_notas + sum_delta,
+        "total_avaliacoes": stats.total_avaliacoes + count_delta,
+        "versao": stats.versao + 1,
+        "atualizado_em": func.now()
+    }
+    if removed_nota is not None:
+        values[f"nota_{removed_nota}"] = getattr(stats, f"nota_{removed_nota}") - 1
+    if added_nota is not None:
+        values[f"nota_{added_nota}"] = getattr(stats, f"nota_{added_nota}") + 1
+
+    histogram = [f"nota_{star}" for star in RATING_STARS]
+    updated_stats = update(stats).where(stats.car_wash_id == car_wash_id).values(**values).returning(
+        stats.car_wash_id, stats.soma_notas, stats.total_avaliacoes, stats.versao,
+        *[getattr(stats, column) for column in histogram]
+    ).cte("agregados")
+    summary = db.execute(
+        update(CarWash).where(CarWash.id == updated_stats.c.car_wash_id).values(
+            **_rating_summary_values(updated_stats.c)
+        ).returning(
+            CarWash.id, CarWash.nome, CarWash.nota, CarWash.total_avaliacoes, CarWash.ativo,
+            updated_stats.c.versao, updated_stats.c.soma_notas,
+            *[updated_stats.c[column] for column in histogram]
+        ).execution_options(synchronize_session=False)
+    ).first()
+
+    if summary is None:
+        # Lava-jato sem linha de agregados (avaliações anteriores à tabela): recalcula a
+        # partir das avaliações, que já incluem a alteração pendente (flush de quem chamou)
+        rebuild_rating_stats(db, car_wash_id)
+        summary = db.execute(
+            select(
+                CarWash.id, CarWash.nome, CarWash.nota, CarWash.total_avaliacoes, CarWash.ativo,
+                stats.versao, stats.soma_notas, *[getattr(stats, column) for column in histogram]
+            ).join(stats, stats.car_wash_id == CarWash.id).where(CarWash.id == car_wash_id)
+        ).first()
+
+    return summary
+
+
+def publish_rating_summary(summary):
+    """
+    Depois do commit: leva a nota nova para o cache de estatísticas e o autocomplete
+    O cache vem primeiro; quem chama atualiza o feed de avaliações antes desta
+    chamada, então uma falha no autocomplete não deixa os dois desatualizados.
+    """
+    if summary is None:
+        return
+    review_stats_cache.put(summary.id, summary.versao, rating_stats_payload(summary))
+    suggest_index.add_car_wash(summary)
+
+
+def rebuild_rating_stats(db: Session, car_wash_id: Optional[str] = None) -> int:
+    """
+    Recalcula os agregados de avaliação a partir da tabela de avaliações, sem commit
+    Sem car_wash_id, refaz todos os lava-jatos em dois comandos (upsert agregado +
+    UPDATE ... FROM). Só linhas que divergem são reescritas; retorna quantas linhas
+    de agregados foram criadas ou corrigidas.
+    """
+    stats = CarWashRatingStats
+    star_columns = [f"nota_{star}" for star in RATING_STARS]
+    aggregated_columns = ["soma_notas", "total_avaliacoes", *star_columns]
+
+    aggregated = select(
+        CarWash.id,
+        func.coalesce(func.sum(Review.nota), 0),
+        func.count(Review.id),
+        *[func.count(Review.id).filter(Review.nota == star) for star in RATING_STARS]
+    ).select_from(CarWash).outerjoin(Review, Review.car_wash_id == CarWash.id).group_by(CarWash.id)
+    if car_wash_id:
+        aggregated = aggregated.where(CarWash.id == car_wash_id)
 
+    upsert = insert(stats).from_select(["car_wash_id", *aggregated_columns], aggregated)
+    upsert = upsert.on_conflict_do_update(
+        index_elements=[stats.car_wash_id],
+        set_={
+            **{column: upsert.excluded[column] for column in aggregated_columns},
+            "versao": stats.versao + 1,
+            "atualizado_em": func.now()
+        },
+        where=tuple_(*[getattr(stats, column) for column in aggregated_columns]).is_distinct_from(
+            tuple_(*[upsert.excluded[column] for column in aggregated_columns])
+        )
+    )
+    repaired = db.execute(upsert).rowcount
+
+    summary_values = _rating_summary_values(stats)
+    sync = update(CarWash).where(
+        CarWash.id == stats.car_wash_id,
+        tuple_(CarWash.nota, CarWash.total_avaliacoes).is_distinct_from(
+            tuple_(summary_values["nota"], summary_values["total_avaliacoes"])
+        )
+    ).values(**summary_values)
+    if car_wash_id:
+        sync = sync.where(CarWash.id == car_wash_id)
+    db.execute(sync.execution_options(synchronize_session=False))
+
+    return repaired
+
+
+def update_car_wash_rating(db: Session, car_wash_id: str):
+    """Recalcula a nota média do lava-jato a partir das avaliações (reparo pontual)"""
     car_wash = get_car_wash_by_id(db, car_wash_id)
-    if car_wash and rating_data:
-        car_wash.nota = round(rating_data.avg_rating or 0, 1)
-        car_wash.total_avaliacoes = rating_data.total_reviews or 0
-        db.commit()
-        db.refresh(car_wash)
+    if not car_wash:
+        return None
 
+    rebuild_rating_stats(db, car_wash_id)
+    db.commit()
+    db.refresh(car_wash)
+    suggest_index.add_car_wash(car_wash)
+    review_stats_cache.invalidate(car_wash.id)
     return car_wash
 
 
@@ -120,4 +423,33 @@ def deactivate_car_wash(db: Session, car_wash_id: str) -> bool:
 
     car_wash.ativo = False
     db.commit()
-    return True
\ No newline at end of file
+    car_wash_index.remove(car_wash.id)
+    nearby_cache.invalidate_point(car_wash.latitude, car_wash.longitude)
+    suggest_index.remove_car_wash(car_wash.id)
+    return True
+
+
+def update_car_wash_location(
+        db: Session,
+        car_wash_id: str,
+        latitude: float,
+        longitude: float,
+        endereco: Optional[str] = None
+) -> Optional[CarWash]:
+    """Muda a localização do lava-jato e mantém índice e cache de proximidade em dia"""
+    car_wash = get_car_wash_by_id(db, car_wash_id)
+    if not car_wash:
+        return None
+
+    old_latitude, old_longitude = car_wash.latitude, car_wash.longitude
+    car_wash.latitude = latitude
+    car_wash.longitude = longitude
+    if endereco is not None:
+        car_wash.endereco = endereco
+    db.commit()
+    db.refresh(car_wash)
+
+    car_wash_index.move(car_wash.id, car_wash.latitude, car_wash.longitude)
+    nearby_cache.invalidate_point(old_latitude, old_longitude)
+    nearby_cache.invalidate_point(car_wash.latitude, car_wash.longitude)
+    return car_wash
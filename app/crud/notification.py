@@ -0,0 +1,169 @@
+# app/crud/notification.py
+from sqlalchemy.orm import Session, joinedload
+from sqlalchemy import and_, func, literal_column
+from app.models.notification_outbox import NotificationOutbox, OutboxStatus
+from app.models.booking import Booking
+from app.services.notification import NotificationType, review_link
+from typing import Dict, List, Optional, Tuple
+
+
+def enqueue_notification(
+        db: Session,
+        notification_type: NotificationType,
+        to_email: Optional[str] = None,
+        booking_id: Optional[str] = None,
+        data: Optional[Dict] = None
+) -> NotificationOutbox:
+    """
+    Adiciona a notificação à outbox SEM commit
+    Deve ser chamada antes do commit da alteração que originou a notificação,
+    para que ambas sejam gravadas (ou descartadas) juntas.
+    """
+    entry = NotificationOutbox(
+        tipo=notification_type.value,
+        destinatario=to_email,
+        booking_id=booking_id,
+        dados=data or {}
+    )
+    db.add(entry)
+    return entry
+
+
+def _booking_payload(booking: Booking) -> Tuple[str, Dict]:
+    car_wash = booking.car_wash
+    service = booking.service
+    return booking.user.email, {
+        'user_name': booking.user.nome,
+        'booking_id': str(booking.id),
+        'car_wash_name': car_wash.nome,
+        'car_wash_address': car_wash.endereco or '',
+        'car_wash_phone': car_wash.telefone or '',
+        'service_name': service.nome,
+        'service_price': f"{service.preco:.2f}",
+        'booking_date': booking.data.strftime('%d/%m/%Y'),
+        'booking_time': booking.hora.strftime('%H:%M'),
+        'review_link': review_link(booking.id)
+    }
+
+
+def claim_outbox_batch(
+        db: Session,
+        limit: int = 50,
+        lease_seconds: int = 300,
+        max_attempts: int = 5
+) -> List[Dict]:
+    """
+    Reserva um lote de notificações prontas para envio e já resolve os dados de cada uma
+    FOR UPDATE SKIP LOCKED deixa vários workers drenarem a fila sem disputar as mesmas linhas.
+    Uma linha cujo lease venceu já com `max_attempts` tentativas (o worker morreu em
+    todas elas) vira FALHOU em vez de ser reservada de novo.
+    """
+    entries = db.query(NotificationOutbox).filter(
+        and_(
+            NotificationOutbox.status == OutboxStatus.PENDENTE.value,
+            NotificationOutbox.disponivel_em <= func.now()
+        )
+    ).order_by(NotificationOutbox.disponivel_em, NotificationOutbox.id).limit(limit).with_for_update(
+        skip_locked=True
+    ).all()
+
+    if not entries:
+        db.rollback()
+        return []
+
+    lease_until = func.now() + literal_column(f"interval '{int(lease_seconds)} seconds'")
+    claimed = []
+    for entry in entries:
+        if entry.tentativas >= max_attempts:
+            entry.status = OutboxStatus.FALHOU.value
+            entry.ultimo_erro = entry.ultimo_erro or "Tentativas esgotadas sem resultado registrado"
+            continue
+        entry.tentativas = entry.tentativas + 1
+        entry.disponivel_em = lease_until
+        claimed.append(entry)
+    entries = claimed
+
+    # Resolve os agendamentos do lote inteiro em uma consulta
+    booking_ids = {entry.booking_id for entry in entries if entry.booking_id}
+    bookings = {}
+    if booking_ids:
+        bookings = {
+            booking.id: booking
+            for booking in db.query(Booking).options(
+                joinedload(Booking.user),
+                joinedload(Booking.car_wash),
+                joinedload(Booking.service)
+            ).filter(Booking.id.in_(booking_ids)).all()
+        }
+
+    batch = []
+    for entry in entries:
+        to_email = entry.destinatario
+        data = dict(entry.dados or {})
+
+        if entry.booking_id:
+            booking = bookings.get(entry.booking_id)
+            if booking is None:
+                entry.status = OutboxStatus.FALHOU.value
+                entry.ultimo_erro = "Agendamento não encontrado"
+                continue
+            booking_email, booking_data = _booking_payload(booking)
+            to_email = to_email or booking_email
+            data = {**booking_data, **data}
+
+        batch.append({
+            'id': entry.id,
+            'tipo': NotificationType(entry.tipo),
+            'destinatario': to_email,
+            'dados': data,
+            'tentativas': entry.tentativas
+        })
+
+    db.commit()
+    return batch
+
+
+def complete_outbox_batch(
+        db: Session,
+        sent_ids: List[int],
+        failures: List[Tuple[int, int, str]],
+        max_attempts: int = 5,
+        base_backoff_seconds: int = 30,
+        max_backoff_seconds: int = 3600
+):
+    """
+    Registra o resultado de um lote
+    `failures` traz (id, tentativas, erro); falhas voltam para a fila com backoff
+    exponencial até `max_attempts`, depois ficam como FALHOU.
+    """
+    if sent_ids:
+        db.query(NotificationOutbox).filter(NotificationOutbox.id.in_(sent_ids)).update(
+            {
+                NotificationOutbox.status: OutboxStatus.ENVIADO.value,
+                NotificationOutbox.enviado_em: func.now(),
+                NotificationOutbox.ultimo_erro: None
+            },
+            synchronize_session=False
+        )
+
+    for entry_id, attempts, error in failures:
+        values = {NotificationOutbox.ultimo_erro: error[:1000]}
+        if attempts >= max_attempts:
+            values[NotificationOutbox.status] = OutboxStatus.FALHOU.value
+        else:
+            delay = min(base_backoff_seconds * 2 ** (attempts - 1), max_backoff_seconds)
+            values[NotificationOutbox.disponivel_em] = func.now() + literal_column(f"interval '{int(delay)} seconds'")
+
+        db.query(NotificationOutbox).filter(NotificationOutbox.id == entry_id).update(
+            values, synchronize_session=False
+        )
+
+    db.commit()
+
+
+def get_outbox_stats(db: Session) -> Dict[str, int]:
+    """Contagem de notificações por status"""
+    rows = db.query(NotificationOutbox.status, func.count(NotificationOutbox.id)).group_by(
+        NotificationOutbox.status
+    ).all()
+    return {status: count for status, count in rows}
@@ -0,0 +1,100 @@
+# app/crud/pagination.py
+import base64
+import json
+from datetime import date, time, datetime
+from typing import Callable, List, Optional, Sequence
+from uuid import UUID
+
+
+def encode_cursor(values: Sequence) -> str:
+    """Serializa os valores da chave de ordenação em um cursor opaco"""
+    payload = [
+        value.isoformat() if isinstance(value, (date, time, datetime)) else str(value)
+        for value in values
+    ]
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, parsers: Sequence[Callable[[str], object]]) -> tuple:
+    """
+    Reconstrói os valores de um cursor usando um parser por coluna
+    Lança ValueError para cursores malformados
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        if not isinstance(payload, list) or len(payload) != len(parsers):
+            raise ValueError("Cursor inválido")
+        # Elementos de tipo errado (ex.: [1, 2]) falham no parser com TypeError/AttributeError
+        return tuple(parser(value) for parser, value in zip(parsers, payload))
+    except (ValueError, TypeError, AttributeError) as e:
+        raise ValueError("Cursor inválido") from e
+
+
+def next_cursor(rows: List, key: Callable[[object], Sequence], limit: int) -> Optional[str]:
+    """Cursor da próxima página, ou None quando a página veio incompleta"""
+    if len(rows) < limit:
+        return None
+    return encode_cursor(key(rows[-1]))
+
+
+# Parsers das chaves usadas nas listagens
+BOOKING_CURSOR = (date.fromisoformat, time.fromisoformat, UUID)
+REVIEW_CURSOR = (datetime.fromisoformat, UUID)
+
+
+if __name__ == "__main__":
+    # Benchmark: página de 20 avaliações de um lava-jato com 1M avaliações, por profundidade,
+    # com OFFSET vs. cursor (keyset) sobre o índice (car_wash_id, criado_em, id).
+    # Roda em qualquer base (tabela temporária):
+    #   python -m app.crud.pagination
+    import time as timer
+    from sqlalchemy import Column, DateTime, Index, Integer, MetaData, Table, desc, select, text, tuple_
+    from sqlalchemy.dialects.postgresql import UUID as PG_UUID
+    from app.database import engine
+
+    total, page_size = 1_000_000, 20
+    metadata = MetaData()
+    bench = Table(
+        "bench_paginacao", metadata,
+        Column("id", PG_UUID(as_uuid=True), primary_key=True),
+        Column("car_wash_id", Integer, nullable=False),
+        Column("criado_em", DateTime, nullable=False),
+        prefixes=["TEMPORARY"]
+    )
+    Index("ix_bench_paginacao", bench.c.car_wash_id, bench.c.criado_em, bench.c.id)
+    ordered = select(bench.c.criado_em, bench.c.id).where(bench.c.car_wash_id == 1).order_by(
+        desc(bench.c.criado_em), desc(bench.c.id)
+    )
+
+    def timed(connection, statement, repeat=20):
+        started = timer.perf_counter()
+        for _ in range(repeat):
+            rows = connection.execute(statement).fetchall()
+        return (timer.perf_counter() - started) * 1000 / repeat, rows
+
+    with engine.connect() as connection:
+        bench.create(connection)
+        # Horários repetidos de propósito: o desempate por id precisa funcionar
+        connection.execute(text(
+            "INSERT INTO bench_paginacao "
+            "SELECT md5(n::text)::uuid, 1, timestamp '2024-01-01' + (n / 3) * interval '1 minute' "
+            "FROM generate_series(1, :total) AS n"
+        ), {"total": total})
+        connection.execute(text("ANALYZE bench_paginacao"))
+
+        for depth in (0, 1_000, 10_000, 100_000, 500_000, total - page_size):
+            offset_ms, offset_rows = timed(connection, ordered.offset(depth).limit(page_size))
+
+            # Cursor da página anterior, como o cliente receberia (encode -> decode)
+            keyset = ordered.limit(page_size)
+            if depth:
+                previous = connection.execute(ordered.offset(depth - 1).limit(1)).first()
+                values = decode_cursor(encode_cursor(previous), REVIEW_CURSOR)
+                keyset = keyset.where(tuple_(bench.c.criado_em, bench.c.id) < tuple_(*values))
+            cursor_ms, cursor_rows = timed(connection, keyset)
+
+            assert cursor_rows == offset_rows
+            print(f"profundidade {depth:>9,}: OFFSET {offset_ms:8.2f} ms | cursor {cursor_ms:6.3f} ms")
+        connection.rollback()
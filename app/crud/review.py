@@ -1,51 +1,71 @@
 # app/crud/review.py
 from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import and_, func, desc
+from sqlalchemy import Index, and_, exists, func, desc, literal, select, tuple_
+from sqlalchemy.dialects.postgresql import insert
 from app.models.review import Review
 from app.models.user import User
 from app.models.booking import Booking, BookingStatus
+from app.models.car_wash_rating_stats import CarWashRatingStats
 from app.schemas.review import ReviewCreate
+from app.crud.pagination import REVIEW_CURSOR, decode_cursor
+from app.services.recent_reviews import recent_reviews_feed
+from app.services.review_stats_cache import RATING_STARS, rating_stats_payload, review_stats_cache
 from typing import List, Optional
 
+# Índices compostos que sustentam as listagens paginadas por cursor
+Index("ix_reviews_car_wash_criado_em_id", Review.car_wash_id, Review.criado_em, Review.id)
+Index("ix_reviews_user_criado_em_id", Review.user_id, Review.criado_em, Review.id)
+
+# Uma avaliação por usuário e lava-jato (alvo do ON CONFLICT em create_review)
+Index("ux_reviews_user_car_wash", Review.user_id, Review.car_wash_id, unique=True)
+
+
+def review_sort_key(review: Review) -> tuple:
+    return review.criado_em, review.id
+
+
+def _completed_booking_exists(user_id: str, car_wash_id, booking_id=None):
+    """EXISTS de agendamento concluído do usuário no lava-jato (o booking informado, se houver)"""
+    conditions = [
+        Booking.user_id == user_id,
+        Booking.car_wash_id == car_wash_id,
+        Booking.status == BookingStatus.CONCLUIDO
+    ]
+    if booking_id:
+        conditions.append(Booking.id == booking_id)
+    return exists().where(and_(*conditions))
+
 
 def create_review(db: Session, review: ReviewCreate, user_id: str) -> Optional[Review]:
-    """Cria uma nova avaliação"""
-    # Verifica se o usuário já avaliou este lava-jato
-    existing_review = db.query(Review).filter(
-        and_(
-            Review.user_id == user_id,
-            Review.car_wash_id == review.car_wash_id
-        )
-    ).first()
-
-    if existing_review:
-        return None  # Usuário já avaliou
-
-    # Se foi especificado um booking, verifica se pertence ao usuário e está concluído
-    if review.booking_id:
-        booking = db.query(Booking).filter(
-            and_(
-                Booking.id == review.booking_id,
-                Booking.user_id == user_id,
-                Booking.status == BookingStatus.CONCLUIDO
-            )
-        ).first()
-
-        if not booking:
-            return None  # Booking inválido
-
-    db_review = Review(
-        user_id=user_id,
-        **review.dict()
-    )
-    db.add(db_review)
-    db.commit()
-    db.refresh(db_review)
+    """
+    Cria uma nova avaliação
+    Um único INSERT ... SELECT ... WHERE EXISTS só insere se o usuário tem agendamento
+    concluído no lava-jato; avaliação repetida é barrada pelo índice único
+    (user_id, car_wash_id) com ON CONFLICT DO NOTHING. Sem linha no RETURNING, o
+    usuário já avaliou ou não tem agendamento concluído.
+    """
+    values = {"user_id": user_id, **review.dict()}
+    new_review = select(*[
+        literal(value, type_=Review.__table__.c[column].type) for column, value in values.items()
+    ]).where(_completed_booking_exists(user_id, review.car_wash_id, review.booking_id))
+
+    db_review = db.execute(
+        insert(Review).from_select(list(values), new_review).on_conflict_do_nothing(
+            index_elements=[Review.user_id, Review.car_wash_id]
+        ).returning(Review)
+    ).scalars().first()
+
+    if not db_review:
+        db.rollback()
+        return None
 
-    # Atualiza a nota média do lava-jato
-    from app.crud.car_wash import update_car_wash_rating
-    update_car_wash_rating(db, str(review.car_wash_id))
+    # Atualiza os agregados de avaliação na mesma transação
+    from app.crud.car_wash import apply_rating_delta, publish_rating_summary
+    rating_summary = apply_rating_delta(db, str(review.car_wash_id), added_nota=db_review.nota)
+    db.commit()
 
+    recent_reviews_feed.push(db_review)
+    publish_rating_summary(rating_summary)
     return db_review
 
 
@@ -60,114 +80,134 @@ def get_car_wash_reviews(
         db: Session,
         car_wash_id: str,
         skip: int = 0,
-        limit: int = 100
+        limit: int = 100,
+        cursor: Optional[str] = None
 ) -> List[Review]:
     """Busca avaliações de um lava-jato"""
-    return db.query(Review).options(
+    query = db.query(Review).options(
         joinedload(Review.user)
-    ).filter(Review.car_wash_id == car_wash_id).order_by(desc(Review.criado_em)).offset(skip).limit(limit).all()
+    ).filter(Review.car_wash_id == car_wash_id).order_by(desc(Review.criado_em), desc(Review.id))
+
+    if cursor:
+        query = query.filter(
+            tuple_(Review.criado_em, Review.id) < tuple_(*decode_cursor(cursor, REVIEW_CURSOR))
+        )
+        return query.limit(limit).all()
+
+    return query.offset(skip).limit(limit).all()
 
 
 def get_user_reviews(
         db: Session,
         user_id: str,
         skip: int = 0,
-        limit: int = 100
+        limit: int = 100,
+        cursor: Optional[str] = None
 ) -> List[Review]:
     """Busca avaliações de um usuário"""
-    return db.query(Review).options(
+    query = db.query(Review).options(
         joinedload(Review.car_wash)
-    ).filter(Review.user_id == user_id).order_by(desc(Review.criado_em)).offset(skip).limit(limit).all()
+    ).filter(Review.user_id == user_id).order_by(desc(Review.criado_em), desc(Review.id))
+
+    if cursor:
+        query = query.filter(
+            tuple_(Review.criado_em, Review.id) < tuple_(*decode_cursor(cursor, REVIEW_CURSOR))
+        )
+        return query.limit(limit).all()
+
+    return query.offset(skip).limit(limit).all()
 
 
 def get_review_stats(db: Session, car_wash_id: str) -> dict:
-    """Retorna estatísticas detalhadas das avaliações"""
-    stats = db.query(
-        func.avg(Review.nota).label('nota_media'),
-        func.count(Review.id).label('total_avaliacoes'),
-        func.sum(func.case((Review.nota == 5, 1), else_=0)).label('nota_5'),
-        func.sum(func.case((Review.nota == 4, 1), else_=0)).label('nota_4'),
-        func.sum(func.case((Review.nota == 3, 1), else_=0)).label('nota_3'),
-        func.sum(func.case((Review.nota == 2, 1), else_=0)).label('nota_2'),
-        func.sum(func.case((Review.nota == 1, 1), else_=0)).label('nota_1'),
-    ).filter(Review.car_wash_id == car_wash_id).first()
-
-    return {
-        'nota_media': round(float(stats.nota_media or 0), 1),
-        'total_avaliacoes': int(stats.total_avaliacoes or 0),
-        'distribuicao': {
-            '5': int(stats.nota_5 or 0),
-            '4': int(stats.nota_4 or 0),
-            '3': int(stats.nota_3 or 0),
-            '2': int(stats.nota_2 or 0),
-            '1': int(stats.nota_1 or 0),
-        }
-    }
+    """
+    Retorna estatísticas detalhadas das avaliações
+    Vem do cache do processo ou da linha de agregados (busca por chave primária),
+    então o custo não depende do número de avaliações do lava-jato.
+    """
+    cached = review_stats_cache.get(car_wash_id)
+    if cached is not None:
+        return cached
+
+    stats = db.query(CarWashRatingStats).filter(CarWashRatingStats.car_wash_id == car_wash_id).first()
+    if stats is None:
+        # Lava-jato ainda sem agregados (avaliações anteriores à tabela): calcula direto
+        stats = db.query(
+            func.coalesce(func.sum(Review.nota), 0).label('soma_notas'),
+            func.count(Review.id).label('total_avaliacoes'),
+            *[func.count(Review.id).filter(Review.nota == star).label(f'nota_{star}') for star in RATING_STARS]
+        ).filter(Review.car_wash_id == car_wash_id).first()
+        version = -1
+    else:
+        version = stats.versao
+
+    payload = rating_stats_payload(stats)
+    review_stats_cache.put(car_wash_id, version, payload)
+    return payload
 
 
 def update_review(db: Session, review_id: str, user_id: str, nota: int, comentario: str = None) -> Optional[Review]:
-    """Atualiza uma avaliação"""
+    """
+    Atualiza uma avaliação
+    A linha fica travada (FOR UPDATE) até o commit: com duas edições simultâneas, a
+    segunda lê a nota já gravada pela primeira e o delta dos agregados fica certo.
+    """
     review = db.query(Review).filter(
         and_(Review.id == review_id, Review.user_id == user_id)
-    ).first()
+    ).with_for_update().populate_existing().first()
 
     if not review:
         return None
 
+    previous_nota = review.nota
     review.nota = nota
     if comentario is not None:
         review.comentario = comentario
+    db.flush()
 
+    # Atualiza os agregados de avaliação na mesma transação
+    from app.crud.car_wash import apply_rating_delta, publish_rating_summary
+    rating_summary = apply_rating_delta(
+        db, str(review.car_wash_id), removed_nota=previous_nota, added_nota=nota
+    )
     db.commit()
     db.refresh(review)
 
-    # Atualiza a nota média do lava-jato
-    from app.crud.car_wash import update_car_wash_rating
-    update_car_wash_rating(db, str(review.car_wash_id))
-
+    recent_reviews_feed.push(review)
+    publish_rating_summary(rating_summary)
     return review
 
 
 def delete_review(db: Session, review_id: str, user_id: str) -> bool:
-    """Remove uma avaliação"""
+    """Remove uma avaliação (linha travada até o commit, como em update_review)"""
     review = db.query(Review).filter(
         and_(Review.id == review_id, Review.user_id == user_id)
-    ).first()
+    ).with_for_update().populate_existing().first()
 
     if not review:
         return False
 
     car_wash_id = review.car_wash_id
     db.delete(review)
-    db.commit()
+    db.flush()
 
-    # Atualiza a nota média do lava-jato
-    from app.crud.car_wash import update_car_wash_rating
-    update_car_wash_rating(db, str(car_wash_id))
+    # Atualiza os agregados de avaliação na mesma transação
+    from app.crud.car_wash import apply_rating_delta, publish_rating_summary
+    rating_summary = apply_rating_delta(db, str(car_wash_id), removed_nota=review.nota)
+    db.commit()
 
+    recent_reviews_feed.remove(review_id)
+    publish_rating_summary(rating_summary)
     return True
 
 
 def can_user_review(db: Session, user_id: str, car_wash_id: str) -> bool:
-    """Verifica se o usuário pode avaliar o lava-jato"""
-    # Verifica se já não avaliou
-    existing_review = db.query(Review).filter(
+    """Verifica se o usuário pode avaliar o lava-jato (ainda não avaliou e tem agendamento concluído)"""
+    already_reviewed = exists().where(
         and_(Review.user_id == user_id, Review.car_wash_id == car_wash_id)
-    ).first()
-
-    if existing_review:
-        return False
-
-    # Verifica se tem pelo menos um agendamento concluído
-    completed_booking = db.query(Booking).filter(
-        and_(
-            Booking.user_id == user_id,
-            Booking.car_wash_id == car_wash_id,
-            Booking.status == BookingStatus.CONCLUIDO
-        )
-    ).first()
-
-    return completed_booking is not None
+    )
+    return db.query(
+        and_(~already_reviewed, _completed_booking_exists(user_id, car_wash_id))
+    ).scalar()
 
 
 def get_recent_reviews(db: Session, limit: int = 10) -> List[Review]:
@@ -175,4 +215,4 @@ def get_recent_reviews(db: Session, limit: int = 10) -> List[Review]:
     return db.query(Review).options(
         joinedload(Review.user),
         joinedload(Review.car_wash)
-    ).order_by(desc(Review.criado_em)).limit(limit).all()
\ No newline at end of file
+    ).order_by(desc(Review.criado_em), desc(Review.id)).limit(limit).all()
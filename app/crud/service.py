@@ -1,9 +1,22 @@
 # app/crud/service.py
 from sqlalchemy.orm import Session
-from sqlalchemy import and_
+from sqlalchemy import Index, and_, desc, func, null, or_, select, true
+from app.models.car_wash import CarWash
 from app.models.service import Service
 from app.schemas.service import ServiceCreate
-from typing import List, Optional
+from app.crud.car_wash import bounding_box_filter, distance_km_column
+from app.crud.search import matches_search, prefix_tsquery, search_document, search_rank
+from app.services.suggest import suggest_index
+from datetime import datetime
+from typing import Dict, List, Optional
+
+# Busca textual em português (nome com peso A, descrição com peso B), sem acentos
+Index(
+    "ix_services_busca",
+    search_document(Service.nome, Service.descricao),
+    postgresql_using="gin",
+    postgresql_where=Service.ativo == True
+)
 
 
 def create_service(db: Session, service: ServiceCreate) -> Service:
@@ -11,6 +24,7 @@ def create_service(db: Session, service: ServiceCreate) -> Service:
     db.add(db_service)
     db.commit()
     db.refresh(db_service)
+    suggest_index.add_service(db_service)
     return db_service
 
 
@@ -41,6 +55,7 @@ def update_service(db: Session, service_id: str, service_data: dict) -> Optional
 
     db.commit()
     db.refresh(db_service)
+    suggest_index.add_service(db_service)
     return db_service
 
 
@@ -51,19 +66,21 @@ def deactivate_service(db: Session, service_id: str) -> bool:
 
     db_service.ativo = False
     db.commit()
+    suggest_index.remove_service(db_service.id)
     return True
 
 
 def search_services(db: Session, query: str, skip: int = 0, limit: int = 100) -> List[Service]:
-    """Busca serviços por nome ou descrição"""
-    from sqlalchemy import func
+    """Busca serviços por nome ou descrição, ordenados por relevância"""
+    tsquery = prefix_tsquery(query)
+    if tsquery is None:
+        return []
 
+    document = search_document(Service.nome, Service.descricao)
     return db.query(Service).filter(
-        and_(
-            Service.ativo == True,
-            func.lower(Service.nome).contains(query.lower()) |
-            func.lower(Service.descricao).contains(query.lower())
-        )
+        and_(Service.ativo == True, matches_search(document, tsquery))
+    ).order_by(
+        desc(search_rank(document, tsquery)), Service.nome, Service.id
     ).offset(skip).limit(limit).all()
 
 
@@ -83,4 +100,154 @@ def get_services_by_price_range(
     if max_price is not None:
         query = query.filter(Service.preco <= max_price)
 
-    return query.offset(skip).limit(limit).all()
\ No newline at end of file
+    return query.offset(skip).limit(limit).all()
+
+
+# Faixas das facetas: preço em [mínimo, máximo) e nota mínima acumulada
+PRICE_BUCKETS = [(0, 30), (30, 50), (50, 100), (100, None)]
+RATING_THRESHOLDS = [4.5, 4, 3, 2]
+SEARCH_ORDERINGS = ("relevancia", "distancia", "preco", "nota")
+
+
+def _search_ordering(columns, ordering: str) -> list:
+    if ordering == "relevancia":
+        return [columns.relevancia.desc(), columns.car_wash_nota.desc(), columns.service_id]
+    if ordering == "distancia":
+        return [columns.distancia, columns.service_preco, columns.service_id]
+    if ordering == "nota":
+        return [columns.car_wash_nota.desc(), columns.car_wash_total_avaliacoes.desc(), columns.service_id]
+    return [columns.service_preco, columns.car_wash_nota.desc(), columns.service_id]
+
+
+def _build_facets(counts) -> Dict:
+    """Monta as facetas a partir das colunas preco_N / nota_N (0 quando ausentes)"""
+    return {
+        "preco": [
+            {
+                "faixa": f"{low}-{high}" if high is not None else f"{low}+",
+                "minimo": low,
+                "maximo": high,
+                "total": counts.get(f'preco_{position}', 0)
+            }
+            for position, (low, high) in enumerate(PRICE_BUCKETS)
+        ],
+        "nota": [
+            {"faixa": f"{threshold}+", "minimo": threshold, "maximo": None, "total": counts.get(f'nota_{position}', 0)}
+            for position, threshold in enumerate(RATING_THRESHOLDS)
+        ]
+    }
+
+
+def faceted_search(
+        db: Session,
+        query: Optional[str] = None,
+        min_price: float = None,
+        max_price: float = None,
+        max_duration: int = None,
+        min_rating: float = None,
+        user_lat: float = None,
+        user_lon: float = None,
+        radius_km: float = None,
+        open_now: bool = False,
+        ordering: Optional[str] = None,
+        skip: int = 0,
+        limit: int = 20
+) -> Dict:
+    """
+    Busca serviços de lava-jatos ativos combinando texto, preço, duração, nota, distância
+    e horário de funcionamento em uma única consulta
+    Os filtros formam uma CTE; a mesma CTE alimenta a página pedida e as contagens das
+    facetas (COUNT ... FILTER), então o banco planeja e varre uma vez só.
+    """
+    conditions = [Service.ativo == True, CarWash.ativo == True]
+
+    relevance = null()
+    if query:
+        tsquery = prefix_tsquery(query)
+        if tsquery is None:
+            return {"total": 0, "resultados": [], "facetas": _build_facets({})}
+        service_document = search_document(Service.nome, Service.descricao)
+        car_wash_document = search_document(CarWash.nome, CarWash.descricao)
+        conditions.append(or_(
+            matches_search(service_document, tsquery),
+            matches_search(car_wash_document, tsquery)
+        ))
+        # O serviço pesa mais que o lava-jato ("cera" no nome do serviço > no nome da loja)
+        relevance = search_rank(service_document, tsquery) + search_rank(car_wash_document, tsquery) / 2
+
+    if min_price is not None:
+        conditions.append(Service.preco >= min_price)
+    if max_price is not None:
+        conditions.append(Service.preco <= max_price)
+    if max_duration is not None:
+        conditions.append(Service.duracao_minutos <= max_duration)
+    if min_rating is not None:
+        conditions.append(CarWash.nota >= min_rating)
+
+    distance = null()
+    if user_lat is not None and user_lon is not None:
+        distance = distance_km_column(user_lat, user_lon)
+        if radius_km is not None:
+            conditions.extend([
+                bounding_box_filter(user_lat, user_lon, radius_km),
+                distance <= radius_km
+            ])
+
+    if open_now:
+        now = datetime.now().time()
+        conditions.append(or_(
+            and_(CarWash.aberto_de <= CarWash.aberto_ate, CarWash.aberto_de <= now, CarWash.aberto_ate > now),
+            # Funcionamento que passa da meia-noite (ex.: 18:00 às 02:00)
+            and_(CarWash.aberto_de > CarWash.aberto_ate, or_(CarWash.aberto_de <= now, CarWash.aberto_ate > now))
+        ))
+
+    filtered = select(
+        Service.id.label('service_id'),
+        Service.nome.label('service_nome'),
+        Service.preco.label('service_preco'),
+        Service.duracao_minutos.label('service_duracao_minutos'),
+        CarWash.id.label('car_wash_id'),
+        CarWash.nome.label('car_wash_nome'),
+        CarWash.endereco.label('car_wash_endereco'),
+        CarWash.nota.label('car_wash_nota'),
+        CarWash.total_avaliacoes.label('car_wash_total_avaliacoes'),
+        distance.label('distancia'),
+        relevance.label('relevancia')
+    ).join(CarWash, CarWash.id == Service.car_wash_id).where(and_(*conditions)).cte('filtrados')
+
+    facet_columns = [func.count().label('total')]
+    for position, (low, high) in enumerate(PRICE_BUCKETS):
+        bucket = filtered.c.service_preco >= low
+        if high is not None:
+            bucket = and_(bucket, filtered.c.service_preco < high)
+        facet_columns.append(func.count().filter(bucket).label(f'preco_{position}'))
+    for position, threshold in enumerate(RATING_THRESHOLDS):
+        facet_columns.append(func.count().filter(filtered.c.car_wash_nota >= threshold).label(f'nota_{position}'))
+    facets = select(*facet_columns).select_from(filtered).cte('facetas')
+
+    if ordering is None:
+        ordering = "relevancia" if query else "distancia" if user_lat is not None and user_lon is not None else "preco"
+
+    page = select(filtered).order_by(
+        *_search_ordering(filtered.c, ordering)
+    ).offset(skip).limit(limit).subquery('pagina')
+
+    # LEFT JOIN garante a linha das facetas mesmo com a página vazia
+    rows = db.execute(
+        select(facets, page).select_from(facets.outerjoin(page, true())).order_by(
+            *_search_ordering(page.c, ordering)
+        )
+    ).all()
+
+    first = rows[0]._mapping
+    return {
+        "total": first['total'],
+        "resultados": [
+            {
+                column: row._mapping[column]
+                for column in filtered.c.keys()
+            }
+            for row in rows if row._mapping['service_id'] is not None
+        ],
+        "facetas": _build_facets(first)
+    }
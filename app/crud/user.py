@@ -3,13 +3,20 @@ from sqlalchemy.orm import Session
 from sqlalchemy import and_
 from app.models.user import User
 from app.schemas.user import UserCreate, UserUpdate
-from app.services.core.security import get_password_hash, verify_password
+from app.services.core.security import (
+    get_password_hash,
+    verify_and_update_password,
+    verify_and_update_password_async
+)
+from app.services.notification import NotificationType
+from app.crud.notification import enqueue_notification
+from app.services.principal_cache import principal_cache
 from typing import Optional
 
 
-def create_user(db: Session, user: UserCreate) -> User:
-    # Hash da senha
-    hashed_password = get_password_hash(user.senha)
+def create_user(db: Session, user: UserCreate, senha_hash: Optional[str] = None) -> User:
+    # Hash da senha (rotas async passam o hash já calculado no pool de bcrypt)
+    hashed_password = senha_hash or get_password_hash(user.senha)
 
     db_user = User(
         nome=user.nome,
@@ -18,6 +25,7 @@ def create_user(db: Session, user: UserCreate) -> User:
         telefone=user.telefone
     )
     db.add(db_user)
+    enqueue_notification(db, NotificationType.WELCOME, to_email=user.email, data={'user_name': user.nome})
     db.commit()
     db.refresh(db_user)
     return db_user
@@ -32,11 +40,28 @@ def get_user_by_id(db: Session, user_id: str) -> Optional[User]:
 
 
 def authenticate_user(db: Session, email: str, password: str) -> Optional[User]:
+    """Autentica e, se o hash usa outro custo do bcrypt, regrava com o custo atual"""
     user = get_user_by_email(db, email)
     if not user:
         return None
-    if not verify_password(password, user.senha_hash):
+    verified, new_hash = verify_and_update_password(password, user.senha_hash)
+    if not verified:
         return None
+    if new_hash:
+        update_user_password(db, user, new_hash)
+    return user
+
+
+async def authenticate_user_async(db: Session, email: str, password: str) -> Optional[User]:
+    """authenticate_user com a verificação (e o rehash) do bcrypt no pool dedicado"""
+    user = get_user_by_email(db, email)
+    if not user:
+        return None
+    verified, new_hash = await verify_and_update_password_async(password, user.senha_hash)
+    if not verified:
+        return None
+    if new_hash:
+        update_user_password(db, user, new_hash)
     return user
 
 
@@ -45,12 +70,14 @@ def update_user(db: Session, user_id: str, user_update: UserUpdate) -> Optional[
     if not db_user:
         return None
 
+    previous_email = db_user.email
     update_data = user_update.dict(exclude_unset=True)
     for field, value in update_data.items():
         setattr(db_user, field, value)
 
     db.commit()
     db.refresh(db_user)
+    principal_cache.invalidate(previous_email, db_user.email)
     return db_user
 
 
@@ -63,6 +90,7 @@ def update_user_location(db: Session, user_id: str, latitude: float, longitude:
     db_user.longitude = longitude
     db.commit()
     db.refresh(db_user)
+    principal_cache.invalidate(db_user.email)
     return db_user
 
 
@@ -73,8 +101,17 @@ def deactivate_user(db: Session, user_id: str) -> bool:
 
     db_user.ativo = False
     db.commit()
+    principal_cache.invalidate(db_user.email)
     return True
 
 
+def update_user_password(db: Session, db_user: User, senha_hash: str) -> User:
+    """Grava um novo hash de senha e tira o usuário do cache de principals"""
+    db_user.senha_hash = senha_hash
+    db.commit()
+    principal_cache.invalidate(db_user.email)
+    return db_user
+
+
 def get_users(db: Session, skip: int = 0, limit: int = 100):
     return db.query(User).filter(User.ativo == True).offset(skip).limit(limit).all()
\ No newline at end of file
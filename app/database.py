@@ -1,6 +1,7 @@
 # app/database.py
 import logging
 from sqlalchemy import create_engine, event, text
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from sqlalchemy.pool import QueuePool
@@ -46,6 +47,18 @@ SessionLocal = sessionmaker(
 # Base para os modelos
 Base = declarative_base()
 
+# Configuração de busca textual: stemmer português aplicado depois do unaccent
+TEXT_SEARCH_CONFIG = "portuguese_unaccent"
+
+# Índices únicos adicionados a tabelas existentes -> migração que remove as repetições
+UNIQUE_INDEX_MIGRATIONS = {
+    "ux_reviews_user_car_wash": "python -m app.services.review_dedupe",
+}
+
+
+class SchemaMigrationRequired(RuntimeError):
+    """O banco precisa de uma migração manual antes de a aplicação subir"""
+
 
 # Eventos do SQLAlchemy para logging
 @event.listens_for(engine, "connect")
@@ -61,6 +74,13 @@ def set_sqlite_pragma(dbapi_connection, connection_record):
             except Exception as e:
                 logger.warning(f"Não foi possível criar extensão uuid-ossp: {e}")
 
+            # btree_gist permite "car_wash_id WITH =" na exclusion constraint dos agendamentos
+            try:
+                cursor.execute("CREATE EXTENSION IF NOT EXISTS btree_gist;")
+                dbapi_connection.commit()
+            except Exception as e:
+                logger.warning(f"Não foi possível criar extensão btree_gist: {e}")
+
 
 @event.listens_for(engine, "first_connect")
 def receive_first_connect(dbapi_connection, connection_record):
@@ -88,13 +108,80 @@ def create_tables():
     """Cria todas as tabelas no banco de dados"""
     try:
         logger.info("Criando tabelas no banco de dados...")
+        create_text_search_configuration()
         Base.metadata.create_all(bind=engine)
+        create_missing_indexes()
+        backfill_booking_intervals()
         logger.info("Tabelas criadas com sucesso!")
     except Exception as e:
         logger.error(f"Erro ao criar tabelas: {e}")
         raise
 
 
+def create_text_search_configuration():
+    """
+    Cria a configuração TEXT_SEARCH_CONFIG (cópia de 'portuguese' com unaccent antes do stemmer)
+    Os índices GIN de busca usam to_tsvector com essa configuração, então ela precisa
+    existir antes de create_all/create_missing_indexes.
+    """
+    if 'postgresql' not in str(engine.url):
+        return
+
+    with engine.begin() as connection:
+        connection.execute(text("CREATE EXTENSION IF NOT EXISTS unaccent;"))
+        connection.execute(text(f"""
+            DO $$
+            BEGIN
+                IF NOT EXISTS (SELECT 1 FROM pg_ts_config WHERE cfgname = '{TEXT_SEARCH_CONFIG}') THEN
+                    CREATE TEXT SEARCH CONFIGURATION {TEXT_SEARCH_CONFIG} (COPY = portuguese);
+                    ALTER TEXT SEARCH CONFIGURATION {TEXT_SEARCH_CONFIG}
+                        ALTER MAPPING FOR hword, hword_part, word WITH unaccent, portuguese_stem;
+                END IF;
+            END
+            $$;
+        """))
+
+
+def create_missing_indexes():
+    """
+    Cria índices declarados com Index() em tabelas que já existem
+    create_all só cria índices junto com tabelas novas. Um índice único que não
+    pode ser criado por causa de linhas repetidas interrompe o startup com
+    SchemaMigrationRequired: os dados não são alterados aqui.
+    """
+    for table in Base.metadata.sorted_tables:
+        for index in table.indexes:
+            try:
+                index.create(bind=engine, checkfirst=True)
+            except IntegrityError as e:
+                migration = UNIQUE_INDEX_MIGRATIONS.get(index.name, "remova as linhas repetidas")
+                raise SchemaMigrationRequired(
+                    f"Não foi possível criar o índice único {index.name}: a tabela {table.name} "
+                    f"tem linhas repetidas. Antes de iniciar a API: {migration}"
+                ) from e
+
+
+def backfill_booking_intervals():
+    """
+    Popula booking_intervals a partir dos agendamentos ativos quando a tabela está vazia
+    Bases anteriores aos períodos materializados não têm nenhuma linha ali, e sem
+    elas a exclusion constraint e o cálculo de disponibilidade não enxergam os
+    agendamentos existentes. Com a tabela já populada não faz nada.
+    """
+    from app.crud.booking import rebuild_booking_intervals
+    from app.models.booking_interval import BookingInterval
+
+    db = SessionLocal()
+    try:
+        if db.query(BookingInterval.booking_id).first() is not None:
+            return
+        created = rebuild_booking_intervals(db)
+        if created:
+            logger.info(f"Períodos de agendamento materializados: {created}")
+    finally:
+        db.close()
+
+
 def drop_tables():
     """Remove todas as tabelas do banco de dados"""
     try:
@@ -0,0 +1,39 @@
+# app/models/booking_interval.py
+from sqlalchemy import Column, DateTime, ForeignKey, Computed
+from sqlalchemy.dialects.postgresql import UUID, TSRANGE, ExcludeConstraint
+from app.database import Base
+from app.models.booking import Booking
+from app.models.car_wash import CarWash
+
+
+class BookingInterval(Base):
+    """
+    Período materializado de um agendamento ativo (pendente ou confirmado)
+    O fim já vem calculado a partir da duração do serviço, então a checagem de
+    conflito não precisa juntar Service; a exclusion constraint (GiST) impede
+    sobreposições no próprio banco.
+    """
+    __tablename__ = "booking_intervals"
+
+    booking_id = Column(
+        UUID(as_uuid=True),
+        ForeignKey(Booking.id, ondelete="CASCADE"),
+        primary_key=True
+    )
+    car_wash_id = Column(
+        UUID(as_uuid=True),
+        ForeignKey(CarWash.id, ondelete="CASCADE"),
+        nullable=False
+    )
+    inicio = Column(DateTime, nullable=False)
+    fim = Column(DateTime, nullable=False)
+    periodo = Column(TSRANGE, Computed("tsrange(inicio, fim, '[)')", persisted=True))
+
+    __table_args__ = (
+        ExcludeConstraint(
+            ("car_wash_id", "="),
+            ("periodo", "&&"),
+            name="excl_booking_intervals_sobreposicao",
+            using="gist"
+        ),
+    )
@@ -0,0 +1,32 @@
+# app/models/car_wash_rating_stats.py
+from sqlalchemy import Column, BigInteger, Integer, DateTime, ForeignKey, func
+from sqlalchemy.dialects.postgresql import UUID
+from app.database import Base
+from app.models.car_wash import CarWash
+
+
+class CarWashRatingStats(Base):
+    """
+    Agregados das avaliações de um lava-jato (soma, total e histograma por estrela)
+    Mantidos por delta na mesma transação da avaliação criada/alterada/removida, em
+    vez de refazer AVG/COUNT sobre todas as avaliações. car_washes.nota e
+    car_washes.total_avaliacoes são derivados daqui; rebuild_rating_stats recalcula
+    tudo a partir das avaliações se os agregados divergirem. `versao` permite que os
+    caches por processo descartem estatísticas antigas sem consultar o banco.
+    """
+    __tablename__ = "car_wash_rating_stats"
+
+    car_wash_id = Column(
+        UUID(as_uuid=True),
+        ForeignKey(CarWash.id, ondelete="CASCADE"),
+        primary_key=True
+    )
+    soma_notas = Column(BigInteger, nullable=False, default=0)
+    total_avaliacoes = Column(Integer, nullable=False, default=0)
+    nota_1 = Column(Integer, nullable=False, default=0)
+    nota_2 = Column(Integer, nullable=False, default=0)
+    nota_3 = Column(Integer, nullable=False, default=0)
+    nota_4 = Column(Integer, nullable=False, default=0)
+    nota_5 = Column(Integer, nullable=False, default=0)
+    versao = Column(BigInteger, nullable=False, default=0)  # Incrementada a cada alteração dos agregados
+    atualizado_em = Column(DateTime, nullable=False, server_default=func.now(), onupdate=func.now())
@@ -0,0 +1,40 @@
+# app/models/notification_outbox.py
+from enum import Enum
+from sqlalchemy import Column, BigInteger, Integer, String, Text, DateTime, Index, func, text
+from sqlalchemy.dialects.postgresql import UUID, JSONB
+from app.database import Base
+
+
+class OutboxStatus(str, Enum):
+    PENDENTE = "pendente"
+    ENVIADO = "enviado"
+    FALHOU = "falhou"
+
+
+class NotificationOutbox(Base):
+    """
+    Notificação pendente gravada na mesma transação da alteração que a originou
+    Os workers reservam linhas empurrando `disponivel_em` para frente (lease), então
+    uma linha de um worker que morreu volta a ficar disponível sozinha.
+    """
+    __tablename__ = "notification_outbox"
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    tipo = Column(String(50), nullable=False)
+    destinatario = Column(String(255), nullable=True)  # None: resolvido pelo booking_id no envio
+    booking_id = Column(UUID(as_uuid=True), nullable=True)
+    dados = Column(JSONB, nullable=False, default=dict)
+    status = Column(String(20), nullable=False, default=OutboxStatus.PENDENTE.value)
+    tentativas = Column(Integer, nullable=False, default=0)
+    disponivel_em = Column(DateTime, nullable=False, server_default=func.now())
+    ultimo_erro = Column(Text, nullable=True)
+    criado_em = Column(DateTime, nullable=False, server_default=func.now())
+    enviado_em = Column(DateTime, nullable=True)
+
+    __table_args__ = (
+        Index(
+            "ix_notification_outbox_pendentes",
+            "disponivel_em",
+            postgresql_where=text("status = 'pendente'")
+        ),
+    )
@@ -6,16 +6,16 @@ from sqlalchemy.orm import Session
 from app.database import get_db
 from app.schemas.auth import UserLogin, Token
 from app.schemas.user import UserCreate, User as UserSchema
-from app.crud.user import create_user, get_user_by_email, authenticate_user
+from app.crud.user import create_user, get_user_by_email, authenticate_user_async, update_user_password
 from app.services.core.security import (
     create_access_token,
     create_refresh_token,
     verify_refresh_token,
     generate_password_reset_token,
     verify_password_reset_token,
-    get_password_hash,
+    get_password_hash_async,
     validate_password_strength,
-    verify_password
+    verify_password_async
 )
 from app.services.core.config import settings
 from app.services.core.dependencies import get_current_user
@@ -44,9 +44,12 @@ async def register(user_data: UserCreate, db: Session = Depends(get_db)):
             detail=message
         )
 
+    # Hash no pool de bcrypt (fila cheia vira 503, não erro interno)
+    senha_hash = await get_password_hash_async(user_data.senha)
+
     # Cria usuário
     try:
-        user = create_user(db, user_data)
+        user = create_user(db, user_data, senha_hash=senha_hash)
         return user
     except Exception as e:
         raise HTTPException(
@@ -60,7 +63,7 @@ async def login(login_data: UserLogin, db: Session = Depends(get_db)):
     """Autentica usuário e retorna tokens"""
 
     # Autentica usuário
-    user = authenticate_user(db, login_data.email, login_data.senha)
+    user = await authenticate_user_async(db, login_data.email, login_data.senha)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -171,8 +174,7 @@ async def reset_password(token: str, new_password: str, db: Session = Depends(ge
         )
 
     # Atualiza senha
-    user.senha_hash = get_password_hash(new_password)
-    db.commit()
+    update_user_password(db, user, await get_password_hash_async(new_password))
 
     return {"message": "Senha redefinida com sucesso"}
 
@@ -186,8 +188,11 @@ async def change_password(
 ):
     """Altera senha do usuário logado"""
 
+    # Recarrega do banco: o usuário do token pode vir do cache de principals com hash antigo
+    db.refresh(current_user)
+
     # Verifica senha atual
-    if not verify_password(current_password, current_user.senha_hash):
+    if not await verify_password_async(current_password, current_user.senha_hash):
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="Senha atual incorreta"
@@ -202,8 +207,7 @@ async def change_password(
         )
 
     # Atualiza senha
-    current_user.senha_hash = get_password_hash(new_password)
-    db.commit()
+    update_user_password(db, current_user, await get_password_hash_async(new_password))
 
     return {"message": "Senha alterada com sucesso"}
 
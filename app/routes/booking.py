@@ -1,18 +1,23 @@
 # app/routes/booking.py
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response, Header
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from datetime import date, time
-from app.database import get_db
+import json
+from app.database import get_db, SessionLocal
 from app.schemas.booking import (
     Booking as BookingSchema,
     BookingCreate,
     BookingUpdate,
-    BookingWithDetails
+    BookingWithDetails,
+    NextAvailableSlot
 )
 from app.models.booking import BookingStatus
 from app.crud.booking import (
-    create_booking,
+    BookingConflict,
+    reserve_booking,
+    booking_sort_key,
     get_booking_by_id,
     get_user_bookings,
     get_car_wash_bookings,
@@ -21,14 +26,22 @@ from app.crud.booking import (
     update_booking,
     check_availability,
     get_available_times,
+    get_availability_calendar,
+    iter_availability_calendar,
+    find_next_available_car_washes,
     cancel_booking,
-    get_upcoming_bookings
+    get_user_upcoming_bookings,
+    get_user_upcoming_version
 )
+from app.crud.service import get_service_by_id
+from app.crud.pagination import next_cursor
 from app.services.core.dependencies import get_current_user
 from app.models.user import User
 
 router = APIRouter()
 
+MAX_CALENDAR_DAYS = 92
+
 
 @router.post("/", response_model=BookingSchema, status_code=status.HTTP_201_CREATED)
 async def create_booking_endpoint(
@@ -38,55 +51,62 @@ async def create_booking_endpoint(
 ):
     """Cria um novo agendamento"""
 
-    # Verifica disponibilidade do horário
-    is_available = check_availability(
-        db,
-        car_wash_id=str(booking_data.car_wash_id),
-        service_id=str(booking_data.service_id),
-        target_date=booking_data.data,
-        target_time=booking_data.hora
-    )
-
-    if not is_available:
+    # Verificação e gravação acontecem na mesma transação, sob lock do dia
+    booking = reserve_booking(db, booking_data, str(current_user.id))
+    if not booking:
         raise HTTPException(
             status_code=status.HTTP_409_CONFLICT,
             detail="Horário não disponível"
         )
-
-    booking = create_booking(db, booking_data, str(current_user.id))
     return booking
 
 
 @router.get("/me", response_model=List[BookingSchema])
 async def get_my_bookings(
+        response: Response,
         status_filter: Optional[BookingStatus] = Query(None, description="Filtrar por status"),
         skip: int = Query(0, ge=0),
         limit: int = Query(100, ge=1, le=100),
+        cursor: Optional[str] = Query(None, description="Cursor da próxima página (ignora skip)"),
         db: Session = Depends(get_db),
         current_user: User = Depends(get_current_user)
 ):
     """Lista agendamentos do usuário logado"""
-    bookings = get_user_bookings(
-        db,
-        user_id=str(current_user.id),
-        status=status_filter,
-        skip=skip,
-        limit=limit
-    )
+    try:
+        bookings = get_user_bookings(
+            db,
+            user_id=str(current_user.id),
+            status=status_filter,
+            skip=skip,
+            limit=limit,
+            cursor=cursor
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    cursor_token = next_cursor(bookings, booking_sort_key, limit)
+    if cursor_token:
+        response.headers["X-Next-Cursor"] = cursor_token
     return bookings
 
 
 @router.get("/upcoming", response_model=List[BookingSchema])
 async def get_upcoming_bookings_endpoint(
+        response: Response,
         days_ahead: int = Query(7, ge=1, le=30, description="Dias à frente para buscar"),
+        if_none_match: Optional[str] = Header(None),
         db: Session = Depends(get_db),
         current_user: User = Depends(get_current_user)
 ):
-    """Busca agendamentos próximos (para notificações)"""
-    bookings = get_upcoming_bookings(db, days_ahead=days_ahead)
-    # Filtra apenas os agendamentos do usuário atual
-    user_bookings = [b for b in bookings if str(b.user_id) == str(current_user.id)]
-    return user_bookings
+    """Busca agendamentos próximos do usuário (para notificações)"""
+    etag = f'"{get_user_upcoming_version(db, str(current_user.id), days_ahead=days_ahead)}"'
+
+    # Polling barato: sem mudanças desde o último token, responde 304 sem corpo
+    if if_none_match and etag in [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+    response.headers["ETag"] = etag
+    return get_user_upcoming_bookings(db, str(current_user.id), days_ahead=days_ahead)
 
 
 @router.get("/availability/{car_wash_id}")
@@ -120,6 +140,7 @@ async def get_available_times_endpoint(
         car_wash_id: str,
         target_date: date = Query(..., description="Data desejada"),
         service_duration: int = Query(60, ge=30, le=240, description="Duração do serviço em minutos"),
+        step: int = Query(30, ge=5, le=120, description="Intervalo entre horários em minutos"),
         db: Session = Depends(get_db)
 ):
     """Obtém horários disponíveis para uma data específica"""
@@ -127,7 +148,8 @@ async def get_available_times_endpoint(
         db,
         car_wash_id=car_wash_id,
         target_date=target_date,
-        service_duration=service_duration
+        service_duration=service_duration,
+        step_minutes=step
     )
 
     return {
@@ -137,6 +159,98 @@ async def get_available_times_endpoint(
     }
 
 
+@router.get("/availability-calendar/{car_wash_id}")
+async def get_availability_calendar_endpoint(
+        car_wash_id: str,
+        from_date: date = Query(..., alias="from", description="Data inicial"),
+        to_date: date = Query(..., alias="to", description="Data final (inclusive)"),
+        service_id: Optional[str] = Query(None, description="ID do serviço (define a duração)"),
+        service_duration: int = Query(60, ge=30, le=240, description="Duração do serviço em minutos"),
+        step: int = Query(30, ge=5, le=120, description="Intervalo entre horários em minutos"),
+        stream: bool = Query(False, description="Transmite um dia por linha (NDJSON)"),
+        db: Session = Depends(get_db)
+):
+    """Obtém horários disponíveis de vários dias com uma única consulta"""
+    if to_date < from_date:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Data final deve ser maior ou igual à data inicial"
+        )
+
+    if (to_date - from_date).days + 1 > MAX_CALENDAR_DAYS:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Intervalo máximo de {MAX_CALENDAR_DAYS} dias"
+        )
+
+    if service_id:
+        service = get_service_by_id(db, service_id)
+        if not service:
+            raise HTTPException(
+                status_code=status.HTTP_404_NOT_FOUND,
+                detail="Serviço não encontrado"
+            )
+        service_duration = service.duracao_minutos
+
+    if stream:
+        # A sessão da dependência é fechada antes do corpo ser enviado,
+        # então o gerador abre a sua própria
+        def generate_days():
+            stream_db = SessionLocal()
+            try:
+                for day, times in iter_availability_calendar(
+                        stream_db, car_wash_id, from_date, to_date, service_duration, step
+                ):
+                    yield json.dumps({"date": day.isoformat(), "available_times": times}) + "\n"
+            finally:
+                stream_db.close()
+
+        return StreamingResponse(generate_days(), media_type="application/x-ndjson")
+
+    days = get_availability_calendar(
+        db,
+        car_wash_id=car_wash_id,
+        start_date=from_date,
+        end_date=to_date,
+        service_duration=service_duration,
+        step_minutes=step
+    )
+
+    return {
+        "car_wash_id": car_wash_id,
+        "from": from_date,
+        "to": to_date,
+        "service_duration": service_duration,
+        "days": days
+    }
+
+
+@router.get("/next-available", response_model=List[NextAvailableSlot])
+async def find_next_available_endpoint(
+        latitude: float = Query(..., description="Latitude do usuário"),
+        longitude: float = Query(..., description="Longitude do usuário"),
+        radius: float = Query(10, ge=1, le=50, description="Raio de busca em km"),
+        target_date: Optional[date] = Query(None, description="Data desejada (padrão: hoje)"),
+        service_duration: int = Query(60, ge=30, le=240, description="Duração do serviço em minutos"),
+        step: int = Query(30, ge=5, le=120, description="Intervalo entre horários em minutos"),
+        minutes_per_km: float = Query(3.0, ge=0, le=30, description="Peso da distância (minutos por km)"),
+        limit: int = Query(10, ge=1, le=50),
+        db: Session = Depends(get_db)
+):
+    """Busca os lava-jatos próximos que podem atender mais cedo"""
+    return find_next_available_car_washes(
+        db,
+        user_lat=latitude,
+        user_lon=longitude,
+        radius_km=radius,
+        target_date=target_date,
+        service_duration=service_duration,
+        step_minutes=step,
+        minutes_per_km=minutes_per_km,
+        limit=limit
+    )
+
+
 @router.get("/{booking_id}", response_model=BookingSchema)
 async def get_booking_details(
         booking_id: str,
@@ -185,7 +299,13 @@ async def update_booking_endpoint(
         current_user: User = Depends(get_current_user)
 ):
     """Atualiza um agendamento"""
-    booking = update_booking(db, booking_id, booking_update, str(current_user.id))
+    try:
+        booking = update_booking(db, booking_id, booking_update, str(current_user.id))
+    except BookingConflict:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Horário não disponível"
+        )
     if not booking:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -202,7 +322,13 @@ async def update_booking_status_endpoint(
         current_user: User = Depends(get_current_user)
 ):
     """Atualiza status de um agendamento"""
-    booking = update_booking_status(db, booking_id, new_status, str(current_user.id))
+    try:
+        booking = update_booking_status(db, booking_id, new_status, str(current_user.id))
+    except BookingConflict:
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Horário não disponível"
+        )
     if not booking:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -230,21 +356,31 @@ async def cancel_booking_endpoint(
 @router.get("/car-wash/{car_wash_id}", response_model=List[BookingSchema])
 async def get_car_wash_bookings_endpoint(
         car_wash_id: str,
+        response: Response,
         target_date: Optional[date] = Query(None, description="Data específica"),
         status_filter: Optional[BookingStatus] = Query(None, description="Filtrar por status"),
         skip: int = Query(0, ge=0),
         limit: int = Query(100, ge=1, le=100),
+        cursor: Optional[str] = Query(None, description="Cursor da próxima página (ignora skip)"),
         db: Session = Depends(get_db),
         current_user: User = Depends(get_current_user)
 ):
     """Lista agendamentos de um lava-jato (administrativo)"""
     # TODO: Verificar se usuário tem permissão para ver agendamentos deste lava-jato
-    bookings = get_car_wash_bookings(
-        db,
-        car_wash_id=car_wash_id,
-        target_date=target_date,
-        status=status_filter,
-        skip=skip,
-        limit=limit
-    )
+    try:
+        bookings = get_car_wash_bookings(
+            db,
+            car_wash_id=car_wash_id,
+            target_date=target_date,
+            status=status_filter,
+            skip=skip,
+            limit=limit,
+            cursor=cursor
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    cursor_token = next_cursor(bookings, booking_sort_key, limit)
+    if cursor_token:
+        response.headers["X-Next-Cursor"] = cursor_token
     return bookings
\ No newline at end of file
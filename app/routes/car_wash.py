@@ -3,18 +3,25 @@ from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.orm import Session
 from typing import List, Optional
 from app.database import get_db
-from app.schemas.car_wash import CarWash as CarWashSchema, CarWashCreate, CarWashWithServices
+from app.schemas.car_wash import (
+    CarWash as CarWashSchema,
+    CarWashCreate,
+    CarWashLocationUpdate,
+    CarWashWithServices
+)
 from app.crud.car_wash import (
     create_car_wash,
     get_car_wash_by_id,
     get_car_washes,
     get_nearby_car_washes,
+    get_nearest_car_washes,
     search_car_washes,
     get_car_wash_with_services,
     update_car_wash_rating,
+    update_car_wash_location,
     deactivate_car_wash
 )
-from app.services.core.dependencies import get_current_user, get_optional_current_user
+from app.services.core.dependencies import get_current_admin_user, get_current_user, get_optional_current_user
 from app.models.user import User
 
 router = APIRouter()
@@ -49,6 +56,22 @@ async def get_nearby_car_washes_endpoint(
     )
     return car_washes
 
+@router.get("/nearest", response_model=List[CarWashSchema])
+async def get_nearest_car_washes_endpoint(
+    latitude: float = Query(..., ge=-90, le=90, description="Latitude do usuário"),
+    longitude: float = Query(..., ge=-180, le=180, description="Longitude do usuário"),
+    k: int = Query(10, ge=1, le=50, description="Quantidade de lava-jatos mais próximos"),
+    db: Session = Depends(get_db)
+):
+    """Retorna os k lava-jatos mais próximos, com distância, sem limite de raio"""
+    car_washes = get_nearest_car_washes(
+        db,
+        user_lat=latitude,
+        user_lon=longitude,
+        k=k
+    )
+    return car_washes
+
 @router.get("/search", response_model=List[CarWashSchema])
 async def search_car_washes_endpoint(
     q: str = Query(..., min_length=2, description="Termo de busca"),
@@ -114,6 +137,28 @@ async def update_car_wash_rating_endpoint(
         )
     return car_wash
 
+@router.put("/{car_wash_id}/location", response_model=CarWashSchema)
+async def update_car_wash_location_endpoint(
+    car_wash_id: str,
+    location_data: CarWashLocationUpdate,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_admin_user)
+):
+    """Atualiza a localização (e opcionalmente o endereço) do lava-jato (requer administrador)"""
+    car_wash = update_car_wash_location(
+        db,
+        car_wash_id,
+        latitude=location_data.latitude,
+        longitude=location_data.longitude,
+        endereco=location_data.endereco
+    )
+    if not car_wash:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Lava-jato não encontrado"
+        )
+    return car_wash
+
 @router.delete("/{car_wash_id}", status_code=status.HTTP_204_NO_CONTENT)
 async def deactivate_car_wash_endpoint(
     car_wash_id: str,
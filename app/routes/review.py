@@ -1,7 +1,7 @@
 # app/routes/review.py
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Response, Header
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Optional
 from app.database import get_db
 from app.schemas.review import Review as ReviewSchema, ReviewCreate
 from app.crud.review import (
@@ -13,8 +13,10 @@ from app.crud.review import (
     update_review,
     delete_review,
     can_user_review,
-    get_recent_reviews
+    review_sort_key
 )
+from app.crud.pagination import next_cursor
+from app.services.recent_reviews import recent_reviews_feed
 from app.services.core.dependencies import get_current_user, get_optional_current_user
 from app.models.user import User
 
@@ -27,56 +29,73 @@ async def create_review_endpoint(
         db: Session = Depends(get_db),
         current_user: User = Depends(get_current_user)
 ):
-    """Cria uma nova avaliação"""
-
-    # Verifica se usuário pode avaliar
-    can_review = can_user_review(db, str(current_user.id), str(review_data.car_wash_id))
-    if not can_review:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Você já avaliou este lava-jato ou não possui agendamentos concluídos"
-        )
-
+    """Cria uma nova avaliação (exige agendamento concluído no lava-jato)"""
     review = create_review(db, review_data, str(current_user.id))
     if not review:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Não foi possível criar a avaliação"
+            detail="Você já avaliou este lava-jato ou não possui agendamentos concluídos"
         )
     return review
 
 
 @router.get("/me", response_model=List[ReviewSchema])
 async def get_my_reviews(
+        response: Response,
         skip: int = Query(0, ge=0),
         limit: int = Query(100, ge=1, le=100),
+        cursor: Optional[str] = Query(None, description="Cursor da próxima página (ignora skip)"),
         db: Session = Depends(get_db),
         current_user: User = Depends(get_current_user)
 ):
     """Lista avaliações do usuário logado"""
-    reviews = get_user_reviews(db, str(current_user.id), skip=skip, limit=limit)
+    try:
+        reviews = get_user_reviews(db, str(current_user.id), skip=skip, limit=limit, cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    cursor_token = next_cursor(reviews, review_sort_key, limit)
+    if cursor_token:
+        response.headers["X-Next-Cursor"] = cursor_token
     return reviews
 
 
 @router.get("/recent", response_model=List[ReviewSchema])
 async def get_recent_reviews_endpoint(
         limit: int = Query(10, ge=1, le=50, description="Número de avaliações recentes"),
+        if_none_match: Optional[str] = Header(None),
         db: Session = Depends(get_db)
 ):
-    """Obtém avaliações mais recentes (feed público)"""
-    reviews = get_recent_reviews(db, limit=limit)
-    return reviews
+    """Obtém avaliações mais recentes (feed público, servido do feed em memória)"""
+    recent_reviews_feed.ensure_loaded(db)
+    body, etag = recent_reviews_feed.page(limit)
+
+    # Polling barato: sem mudanças desde o último token, responde 304 sem corpo
+    if if_none_match and etag in [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+
+    # Corpo já serializado no feed: não passa de novo pela validação do response_model
+    return Response(content=body, media_type="application/json", headers={"ETag": etag})
 
 
 @router.get("/car-wash/{car_wash_id}", response_model=List[ReviewSchema])
 async def get_car_wash_reviews_endpoint(
         car_wash_id: str,
+        response: Response,
         skip: int = Query(0, ge=0),
         limit: int = Query(100, ge=1, le=100),
+        cursor: Optional[str] = Query(None, description="Cursor da próxima página (ignora skip)"),
         db: Session = Depends(get_db)
 ):
     """Lista avaliações de um lava-jato específico"""
-    reviews = get_car_wash_reviews(db, car_wash_id, skip=skip, limit=limit)
+    try:
+        reviews = get_car_wash_reviews(db, car_wash_id, skip=skip, limit=limit, cursor=cursor)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+
+    cursor_token = next_cursor(reviews, review_sort_key, limit)
+    if cursor_token:
+        response.headers["X-Next-Cursor"] = cursor_token
     return reviews
 
 
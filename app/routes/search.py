@@ -0,0 +1,89 @@
+# app/routes/search.py
+import asyncio
+from fastapi import APIRouter, Depends, HTTPException, status, Query
+from sqlalchemy.orm import Session
+from typing import List, Optional
+from app.database import get_db
+from app.crud.service import faceted_search, SEARCH_ORDERINGS
+from app.schemas.search import FacetedSearchResponse, SearchSuggestion
+from app.services.suggest import prime_suggest_index, suggest_index
+
+router = APIRouter()
+
+# Recarga do índice de autocomplete em andamento (no máximo uma por worker)
+_suggest_reload: Optional[asyncio.Task] = None
+
+
+@router.get("/", response_model=FacetedSearchResponse)
+async def faceted_search_endpoint(
+        q: Optional[str] = Query(None, description="Texto de busca (nome/descrição do serviço ou do lava-jato)"),
+        min_price: Optional[float] = Query(None, ge=0, description="Preço mínimo do serviço"),
+        max_price: Optional[float] = Query(None, ge=0, description="Preço máximo do serviço"),
+        max_duration: Optional[int] = Query(None, ge=1, description="Duração máxima em minutos"),
+        min_rating: Optional[float] = Query(None, ge=0, le=5, description="Nota mínima do lava-jato"),
+        latitude: Optional[float] = Query(None, ge=-90, le=90, description="Latitude do usuário"),
+        longitude: Optional[float] = Query(None, ge=-180, le=180, description="Longitude do usuário"),
+        radius: Optional[float] = Query(None, ge=1, le=50, description="Raio de busca em km"),
+        open_now: bool = Query(False, description="Só lava-jatos abertos agora"),
+        ordering: Optional[str] = Query(
+            None,
+            pattern=f"^({'|'.join(SEARCH_ORDERINGS)})$",
+            description="Ordenação; padrão: relevância com texto, distância com localização, senão preço"
+        ),
+        skip: int = Query(0, ge=0),
+        limit: int = Query(20, ge=1, le=100),
+        db: Session = Depends(get_db)
+):
+    """Busca serviços combinando texto, preço, duração, nota, distância e horário, com facetas"""
+    if min_price is not None and max_price is not None and max_price < min_price:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Preço máximo menor que o preço mínimo"
+        )
+
+    if (latitude is None) != (longitude is None) or (radius is not None and latitude is None):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Informe latitude e longitude juntas (obrigatórias para usar o raio)"
+        )
+
+    return faceted_search(
+        db,
+        query=q,
+        min_price=min_price,
+        max_price=max_price,
+        max_duration=max_duration,
+        min_rating=min_rating,
+        user_lat=latitude,
+        user_lon=longitude,
+        radius_km=radius,
+        open_now=open_now,
+        ordering=ordering,
+        skip=skip,
+        limit=limit
+    )
+
+
+def _schedule_suggest_reload():
+    """
+    Recarrega o índice numa thread, sem bloquear o event loop
+    A carga completa leva segundos com cadastros grandes; no event loop ela (ou a
+    espera pelo _load_lock durante a carga do startup) travaria o worker inteiro.
+    """
+    global _suggest_reload
+    if _suggest_reload is not None and not _suggest_reload.done():
+        return
+    _suggest_reload = asyncio.create_task(asyncio.to_thread(prime_suggest_index))
+
+
+@router.get("/suggest", response_model=List[SearchSuggestion])
+async def suggest_endpoint(
+        q: str = Query(..., min_length=1, description="Texto digitado"),
+        limit: int = Query(10, ge=1, le=20),
+        tipo: Optional[str] = Query(None, pattern="^(car_wash|service)$", description="Filtra por tipo")
+):
+    """Sugestões de nomes de lava-jatos e serviços para autocomplete"""
+    # Responde com o índice atual (mesmo vencido) enquanto a recarga roda em segundo plano
+    if suggest_index.is_stale() and not suggest_index.is_loading():
+        _schedule_suggest_reload()
+    return suggest_index.suggest(q, limit=limit, tipo=tipo)
@@ -5,6 +5,7 @@ from datetime import date, time, datetime
 from uuid import UUID
 from decimal import Decimal
 from app.models.booking import BookingStatus
+from app.schemas.car_wash import CarWash
 
 class BookingBase(BaseModel):
     data: date
@@ -35,4 +36,11 @@ class BookingWithDetails(Booking):
     car_wash_nome: str
     service_nome: str
     service_preco: Decimal
-    user_nome: Optional[str] = None
\ No newline at end of file
+    user_nome: Optional[str] = None
+
+class NextAvailableSlot(BaseModel):
+    car_wash: CarWash
+    data: date
+    horario: str
+    espera_minutos: int
+    pontuacao: float
@@ -1,5 +1,5 @@
 # ===== app/schemas/car_wash.py =====
-from pydantic import BaseModel
+from pydantic import BaseModel, validator
 from typing import Optional, List
 from datetime import time, datetime
 from uuid import UUID
@@ -19,6 +19,23 @@ class CarWashBase(BaseModel):
 class CarWashCreate(CarWashBase):
     pass
 
+class CarWashLocationUpdate(BaseModel):
+    latitude: float
+    longitude: float
+    endereco: Optional[str] = None
+
+    @validator('latitude')
+    def validate_latitude(cls, v):
+        if v < -90 or v > 90:
+            raise ValueError('Latitude deve estar entre -90 e 90')
+        return v
+
+    @validator('longitude')
+    def validate_longitude(cls, v):
+        if v < -180 or v > 180:
+            raise ValueError('Longitude deve estar entre -180 e 180')
+        return v
+
 class CarWash(CarWashBase):
     id: UUID
     nota: float
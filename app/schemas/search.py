@@ -0,0 +1,45 @@
+# ===== app/schemas/search.py =====
+from pydantic import BaseModel
+from typing import List, Optional
+from decimal import Decimal
+from uuid import UUID
+
+class SearchSuggestion(BaseModel):
+    tipo: str  # "car_wash" ou "service"
+    id: str  # id do lava-jato; para serviços, o nome normalizado
+    nome: str
+    popularidade: float  # avaliações do lava-jato / lava-jatos que oferecem o serviço
+
+    class Config:
+        from_attributes = True
+
+class SearchResult(BaseModel):
+    service_id: UUID
+    service_nome: str
+    service_preco: Decimal
+    service_duracao_minutos: int
+    car_wash_id: UUID
+    car_wash_nome: str
+    car_wash_endereco: Optional[str] = None
+    car_wash_nota: float
+    car_wash_total_avaliacoes: int
+    distancia: Optional[float] = None  # km, só quando a localização é informada
+    relevancia: Optional[float] = None  # só quando há texto de busca
+
+    class Config:
+        from_attributes = True
+
+class FacetBucket(BaseModel):
+    faixa: str
+    minimo: float
+    maximo: Optional[float] = None
+    total: int
+
+class SearchFacets(BaseModel):
+    preco: List[FacetBucket]
+    nota: List[FacetBucket]
+
+class FacetedSearchResponse(BaseModel):
+    total: int
+    resultados: List[SearchResult]
+    facetas: SearchFacets
@@ -0,0 +1,172 @@
+# app/services/availability.py
+from datetime import time
+from typing import Iterable, List, Optional, Sequence, Tuple
+
+Interval = Tuple[int, int]  # (início, fim) em minutos desde 00:00, fim exclusivo
+
+DEFAULT_STEP_MINUTES = 30
+
+
+def time_to_minutes(value: time) -> int:
+    """Converte um horário em minutos desde a meia-noite"""
+    return value.hour * 60 + value.minute
+
+
+def minutes_to_label(minutes: int) -> str:
+    """Formata minutos desde a meia-noite como HH:MM"""
+    return f"{minutes // 60:02d}:{minutes % 60:02d}"
+
+
+def merge_intervals(intervals: Iterable[Interval]) -> List[Interval]:
+    """
+    Ordena e funde intervalos ocupados que se sobrepõem ou se tocam
+    Retorna uma lista ordenada de intervalos disjuntos
+    """
+    merged: List[Interval] = []
+    for start, end in sorted(intervals):
+        if end <= start:
+            continue
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1] = (merged[-1][0], end)
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def iter_free_slots(
+        open_minute: int,
+        close_minute: int,
+        busy: Sequence[Interval],
+        duration: int,
+        step: int = DEFAULT_STEP_MINUTES,
+        not_before: Optional[int] = None
+):
+    """
+    Percorre os horários livres de um dia em uma única passada
+    `busy` deve estar ordenado e sem sobreposições (ver merge_intervals).
+    Os candidatos seguem a grade open_minute + k * step, como no agendamento original.
+    """
+    if duration <= 0 or step <= 0:
+        return
+
+    index = 0
+    total = len(busy)
+    current = open_minute
+
+    if not_before is not None and not_before > current:
+        # Alinha ao próximo ponto da grade a partir do horário mínimo
+        current += -(-(not_before - current) // step) * step
+
+    while current + duration <= close_minute:
+        # Descarta intervalos que terminam antes do candidato atual
+        while index < total and busy[index][1] <= current:
+            index += 1
+
+        if index < total and busy[index][0] < current + duration:
+            # Conflito: salta direto para o primeiro ponto da grade após o fim do intervalo
+            blocked_until = busy[index][1]
+            current += -(-(blocked_until - current) // step) * step
+            continue
+
+        yield current
+        current += step
+
+
+def compute_free_slots(
+        open_time: time,
+        close_time: time,
+        busy: Iterable[Interval],
+        duration: int,
+        step: int = DEFAULT_STEP_MINUTES,
+        not_before: Optional[int] = None
+) -> List[str]:
+    """Calcula os horários livres (HH:MM) de um dia a partir dos intervalos ocupados"""
+    return [
+        minutes_to_label(slot)
+        for slot in iter_free_slots(
+            time_to_minutes(open_time),
+            time_to_minutes(close_time),
+            merge_intervals(busy),
+            duration,
+            step,
+            not_before
+        )
+    ]
+
+
+def first_free_slot(
+        open_time: time,
+        close_time: time,
+        busy: Iterable[Interval],
+        duration: int,
+        step: int = DEFAULT_STEP_MINUTES,
+        not_before: Optional[int] = None
+) -> Optional[int]:
+    """Retorna o primeiro horário livre (em minutos) ou None se o dia estiver cheio"""
+    return next(
+        iter_free_slots(
+            time_to_minutes(open_time),
+            time_to_minutes(close_time),
+            merge_intervals(busy),
+            duration,
+            step,
+            not_before
+        ),
+        None
+    )
+
+
+if __name__ == "__main__":
+    # Benchmark: motor de intervalos vs. laço original (slots x agendamentos)
+    import random
+    import timeit
+    from datetime import date, datetime, timedelta
+
+    def legacy_available_times(day, open_time, close_time, bookings, service_duration):
+        available = []
+        current_time = open_time
+        while current_time < close_time:
+            is_available = True
+            service_end = (datetime.combine(day, current_time) +
+                           timedelta(minutes=service_duration)).time()
+            if service_end > close_time:
+                break
+            for booking_start, booking_duration in bookings:
+                booking_end = (datetime.combine(day, booking_start) +
+                               timedelta(minutes=booking_duration)).time()
+                if current_time < booking_end and service_end > booking_start:
+                    is_available = False
+                    break
+            if is_available:
+                available.append(current_time.strftime("%H:%M"))
+            current_time = (datetime.combine(day, current_time) +
+                            timedelta(minutes=30)).time()
+        return available
+
+    random.seed(42)
+    day = date.today()
+    open_time, close_time = time(6, 0), time(22, 0)
+    span = time_to_minutes(close_time) - time_to_minutes(open_time)
+
+    for count in (10, 100, 1000):
+        bookings = []
+        for _ in range(count):
+            start = time_to_minutes(open_time) + random.randrange(0, span - 30, 5)
+            bookings.append((time(start // 60, start % 60), random.choice((15, 30, 45, 60))))
+        intervals = [(time_to_minutes(h), time_to_minutes(h) + d) for h, d in bookings]
+
+        # Uma janela estreita (10 min) para que o dia não fique totalmente ocupado
+        legacy = legacy_available_times(day, open_time, close_time, bookings, 10)
+        engine = compute_free_slots(open_time, close_time, intervals, 10)
+        assert legacy == engine, "resultados divergentes"
+
+        runs = 20
+        legacy_s = timeit.timeit(
+            lambda: legacy_available_times(day, open_time, close_time, bookings, 10), number=runs
+        ) / runs
+        engine_s = timeit.timeit(
+            lambda: compute_free_slots(open_time, close_time, intervals, 10), number=runs
+        ) / runs
+        print(f"{count:>5} agendamentos: laço {legacy_s * 1000:8.3f} ms | "
+              f"motor {engine_s * 1000:8.3f} ms | {legacy_s / engine_s:6.1f}x")
@@ -1,4 +1,4 @@
-from decouple import config
+from decouple import Csv, config
 
 class Settings:
     SECRET_KEY: str = config('SECRET_KEY')
@@ -6,4 +6,49 @@ class Settings:
     ACCESS_TOKEN_EXPIRE_MINUTES: int = config('ACCESS_TOKEN_EXPIRE_MINUTES', default=30, cast=int)
     DATABASE_URL: str = config('DATABASE_URL')
 
-settings = Settings()
\ No newline at end of file
+    # E-mails (separados por vírgula) com acesso aos endpoints administrativos restritos
+    ADMIN_EMAILS: list = config(
+        'ADMIN_EMAILS', default='', cast=Csv(post_process=lambda emails: [email.lower() for email in emails])
+    )
+
+    # Email
+    SMTP_HOST: str = config('SMTP_HOST', default='localhost')
+    SMTP_PORT: int = config('SMTP_PORT', default=587, cast=int)
+    SMTP_USERNAME: str = config('SMTP_USERNAME', default='')
+    SMTP_PASSWORD: str = config('SMTP_PASSWORD', default='')
+    SMTP_USE_TLS: bool = config('SMTP_USE_TLS', default=True, cast=bool)
+
+    # Outbox de notificações
+    OUTBOX_WORKERS: int = config('OUTBOX_WORKERS', default=2, cast=int)
+    OUTBOX_BATCH_SIZE: int = config('OUTBOX_BATCH_SIZE', default=50, cast=int)
+    OUTBOX_SMTP_POOL_SIZE: int = config('OUTBOX_SMTP_POOL_SIZE', default=2, cast=int)
+    OUTBOX_MAX_ATTEMPTS: int = config('OUTBOX_MAX_ATTEMPTS', default=5, cast=int)
+
+    # Busca por proximidade: "database" (bounding box + Haversine no SQL) ou "memory" (grade em memória)
+    NEARBY_SEARCH_BACKEND: str = config('NEARBY_SEARCH_BACKEND', default='database')
+    # Cache de buscas por proximidade (0 entradas desativa)
+    NEARBY_CACHE_MAX_ENTRIES: int = config('NEARBY_CACHE_MAX_ENTRIES', default=2048, cast=int)
+    NEARBY_CACHE_TTL_SECONDS: int = config('NEARBY_CACHE_TTL_SECONDS', default=120, cast=int)
+
+    # Cache das estatísticas de avaliação por lava-jato (0 entradas desativa)
+    REVIEW_STATS_CACHE_MAX_ENTRIES: int = config('REVIEW_STATS_CACHE_MAX_ENTRIES', default=10000, cast=int)
+    REVIEW_STATS_CACHE_TTL_SECONDS: int = config('REVIEW_STATS_CACHE_TTL_SECONDS', default=300, cast=int)
+
+    # Cache dos usuários autenticados por token (0 entradas desativa). O TTL limita por
+    # quanto tempo outros processos ainda aceitam um usuário alterado/desativado
+    PRINCIPAL_CACHE_MAX_ENTRIES: int = config('PRINCIPAL_CACHE_MAX_ENTRIES', default=10000, cast=int)
+    PRINCIPAL_CACHE_TTL_SECONDS: int = config('PRINCIPAL_CACHE_TTL_SECONDS', default=60, cast=int)
+
+    # Pool dedicado de bcrypt: threads e tamanho máximo da fila (acima disso responde 503)
+    PASSWORD_HASH_WORKERS: int = config('PASSWORD_HASH_WORKERS', default=2, cast=int)
+    PASSWORD_HASH_MAX_QUEUE: int = config('PASSWORD_HASH_MAX_QUEUE', default=64, cast=int)
+
+    # Custo do bcrypt: calibrado no startup para levar ~BCRYPT_TARGET_MS por hash, entre
+    # BCRYPT_MIN_ROUNDS e BCRYPT_MAX_ROUNDS. BCRYPT_ROUNDS > 0 fixa o custo (recomendado
+    # com máquinas diferentes na frota, para todos os workers usarem o mesmo valor)
+    BCRYPT_TARGET_MS: int = config('BCRYPT_TARGET_MS', default=250, cast=int)
+    BCRYPT_MIN_ROUNDS: int = config('BCRYPT_MIN_ROUNDS', default=10, cast=int)
+    BCRYPT_MAX_ROUNDS: int = config('BCRYPT_MAX_ROUNDS', default=16, cast=int)
+    BCRYPT_ROUNDS: int = config('BCRYPT_ROUNDS', default=0, cast=int)
+
+settings = Settings()
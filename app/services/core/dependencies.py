@@ -1,15 +1,40 @@
 # app/services/core/dependencies.py
 from fastapi import Depends, HTTPException, status
 from fastapi.security import HTTPBearer
-from sqlalchemy.orm import Session
+from sqlalchemy import inspect
+from sqlalchemy.orm import Session, make_transient_to_detached
+from typing import Optional
 from app.database import get_db
+from app.services.core.config import settings
 from app.services.core.security import verify_token
+from app.services.principal_cache import principal_cache
 from app.crud.user import get_user_by_email
 from app.models.user import User
 
 security = HTTPBearer()
 
 
+def resolve_principal(db: Session, email: str) -> Optional[User]:
+    """
+    Usuário do token, pelo cache de principals ou pelo banco
+    No acerto, a instância é remontada a partir das colunas guardadas e anexada à
+    sessão da requisição com merge(load=False), sem consulta; ela se comporta como
+    uma instância carregada (lazy loads e alterações com commit funcionam).
+    """
+    values = principal_cache.get(email)
+    if values is not None:
+        user = User(**values)
+        make_transient_to_detached(user)
+        return db.merge(user, load=False)
+
+    user = get_user_by_email(db, email=email)
+    if user is not None:
+        principal_cache.put(email, {
+            attribute.key: getattr(user, attribute.key) for attribute in inspect(User).column_attrs
+        })
+    return user
+
+
 async def get_current_user(
         token: str = Depends(security),
         db: Session = Depends(get_db)
@@ -25,7 +50,7 @@ async def get_current_user(
     if email is None:
         raise credentials_exception
 
-    user = get_user_by_email(db, email=email)
+    user = resolve_principal(db, email)
     if user is None:
         raise credentials_exception
 
@@ -38,6 +63,20 @@ async def get_current_user(
     return user
 
 
+def is_admin(user: User) -> bool:
+    return (user.email or "").lower() in settings.ADMIN_EMAILS
+
+
+async def get_current_admin_user(current_user: User = Depends(get_current_user)) -> User:
+    """Obtém o usuário atual, exigindo que esteja em ADMIN_EMAILS"""
+    if not is_admin(current_user):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Sem permissão para esta operação"
+        )
+    return current_user
+
+
 async def get_current_active_user(current_user: User = Depends(get_current_user)) -> User:
     """Obtém usuário ativo (redundante com get_current_user, mas mantido para compatibilidade)"""
     return current_user
@@ -56,7 +95,7 @@ def get_optional_current_user(
         if email is None:
             return None
 
-        user = get_user_by_email(db, email=email)
+        user = resolve_principal(db, email)
         if user is None or not user.ativo:
             return None
 
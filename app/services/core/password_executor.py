@@ -0,0 +1,161 @@
+# app/services/core/password_executor.py
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Optional, TypeVar
+
+from app.services.core.config import settings
+
+T = TypeVar("T")
+
+
+class PasswordHashingBusy(Exception):
+    """Fila de hashing cheia: a requisição deve ser recusada (503) em vez de esperar"""
+
+
+class PasswordHashExecutor:
+    """
+    Pool dedicado para bcrypt (hash e verificação), fora do event loop
+    Cada operação leva ~100-300 ms de CPU; chamada direto numa rota async ela trava
+    todas as outras requisições do worker. Aqui ela roda em threads (o bcrypt libera
+    o GIL durante o cálculo) e a rota só aguarda o resultado.
+
+    A fila é limitada: com `max_workers` operações rodando e `max_queue` esperando,
+    novas chamadas falham na hora com PasswordHashingBusy. Assim uma enxurrada de
+    logins não acumula espera sem fim nem memória.
+    """
+
+    def __init__(self, max_workers: int = 2, max_queue: int = 64):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._pending = 0  # Aguardando + rodando
+        self._running = 0
+        self.completed = 0
+        self.rejected = 0
+        self.max_queue_depth = 0
+        self._total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="bcrypt")
+            return self._executor
+
+    async def run(self, function: Callable[..., T], *args) -> T:
+        """Executa `function(*args)` no pool e aguarda sem bloquear o event loop"""
+        with self._lock:
+            if self._pending >= self.max_workers + self.max_queue:
+                self.rejected += 1
+                raise PasswordHashingBusy()
+            self._pending += 1
+            self.max_queue_depth = max(self.max_queue_depth, self._pending - self._running)
+        submitted_at = time.perf_counter()
+
+        def task():
+            waited = time.perf_counter() - submitted_at
+            with self._lock:
+                self._running += 1
+                self._total_wait_seconds += waited
+                self.max_wait_seconds = max(self.max_wait_seconds, waited)
+            try:
+                return function(*args)
+            finally:
+                with self._lock:
+                    self._running -= 1
+                    self.completed += 1
+
+        try:
+            return await asyncio.wrap_future(self._get_executor().submit(task))
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def stats(self) -> Dict:
+        with self._lock:
+            return {
+                "max_workers": self.max_workers,
+                "max_queue": self.max_queue,
+                "running": self._running,
+                "queue_depth": self._pending - self._running,
+                "max_queue_depth": self.max_queue_depth,
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "avg_wait_ms": round(self._total_wait_seconds * 1000 / self.completed, 2) if self.completed else 0.0,
+                "max_wait_ms": round(self.max_wait_seconds * 1000, 2)
+            }
+
+
+# Pool global de hashing de senhas (um por processo)
+password_executor = PasswordHashExecutor(
+    max_workers=settings.PASSWORD_HASH_WORKERS,
+    max_queue=settings.PASSWORD_HASH_MAX_QUEUE
+)
+
+
+if __name__ == "__main__":
+    # Benchmark: latência (p50/p99) de um endpoint "leve" sem relação com autenticação
+    # durante uma enxurrada de logins, com bcrypt no loop vs. no pool dedicado
+    import statistics
+    from app.services.core.security import pwd_context
+
+    storm_size = 20
+    tick_seconds = 0.005
+    stored_hash = pwd_context.hash("Senha@123")
+
+    async def light_endpoint(latencies, stop: asyncio.Event):
+        # Requisições baratas chegando a cada 5 ms; latência = atendimento - chegada.
+        # Chegadas durante um bloqueio do loop esperam até ele liberar.
+        next_arrival = time.perf_counter()
+        while not stop.is_set():
+            await asyncio.sleep(max(0.0, next_arrival - time.perf_counter()))
+            now = time.perf_counter()
+            while next_arrival <= now:
+                latencies.append((now - next_arrival) * 1000)
+                next_arrival += tick_seconds
+
+    async def blocking_login():
+        pwd_context.verify("Senha@123", stored_hash)
+
+    async def offloaded_login(executor: PasswordHashExecutor):
+        await executor.run(pwd_context.verify, "Senha@123", stored_hash)
+
+    async def scenario(make_login) -> Dict:
+        latencies = []
+        stop = asyncio.Event()
+        ticker = asyncio.create_task(light_endpoint(latencies, stop))
+        await asyncio.sleep(0)
+        started = time.perf_counter()
+        await asyncio.gather(*[make_login() for _ in range(storm_size)])
+        elapsed = time.perf_counter() - started
+        stop.set()
+        await ticker
+        latencies.sort()
+        return {
+            "logins_por_s": storm_size / elapsed,
+            "p50": statistics.median(latencies),
+            "p99": latencies[int(len(latencies) * 0.99) - 1],
+            "max": latencies[-1]
+        }
+
+    async def main():
+        results = {"bcrypt no event loop": await scenario(blocking_login)}
+        executor = PasswordHashExecutor(max_workers=2, max_queue=storm_size)
+        results["bcrypt no pool (2 threads)"] = await scenario(lambda: offloaded_login(executor))
+        executor.shutdown()
+        for name, result in results.items():
+            print(
+                f"{name:28} atraso do endpoint leve p50 {result['p50']:7.1f} ms | p99 {result['p99']:7.1f} ms | "
+                f"máx {result['max']:7.1f} ms | {result['logins_por_s']:.1f} logins/s"
+            )
+
+    asyncio.run(main())
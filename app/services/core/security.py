@@ -1,9 +1,13 @@
 # app/services/core/security.py
+import math
+import statistics
+import time
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Tuple
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from app.services.core.config import settings
+from app.services.core.password_executor import password_executor
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
@@ -18,6 +22,71 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
+def verify_and_update_password(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """
+    Verifica a senha e, se o hash armazenado precisa de atualização (needs_update:
+    custo fora do exigido por configure_bcrypt_cost), devolve também o hash novo com o custo atual
+    """
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+
+async def verify_password_async(plain_password: str, hashed_password: str) -> bool:
+    """verify_password no pool de bcrypt, sem travar o event loop"""
+    return await password_executor.run(verify_password, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password: str) -> str:
+    """get_password_hash no pool de bcrypt, sem travar o event loop"""
+    return await password_executor.run(get_password_hash, password)
+
+
+async def verify_and_update_password_async(plain_password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """verify_and_update_password no pool de bcrypt, sem travar o event loop"""
+    return await password_executor.run(verify_and_update_password, plain_password, hashed_password)
+
+
+def calibrate_bcrypt_rounds(target_ms: float, min_rounds: int, max_rounds: int, samples: int = 3) -> int:
+    """
+    Maior custo do bcrypt cujo hash leva até `target_ms` nesta máquina
+    Mede a mediana de alguns hashes no custo mínimo e extrapola: cada round a mais
+    dobra o tempo.
+    """
+    handler = pwd_context.handler("bcrypt").using(rounds=min_rounds)
+    timings = []
+    for _ in range(samples):
+        started = time.perf_counter()
+        handler.hash("calibracao")
+        timings.append((time.perf_counter() - started) * 1000)
+
+    base_ms = statistics.median(timings)
+    extra_rounds = math.floor(math.log2(target_ms / base_ms)) if base_ms < target_ms else 0
+    return max(min_rounds, min(max_rounds, min_rounds + extra_rounds))
+
+
+def configure_bcrypt_cost() -> int:
+    """
+    Define o custo do bcrypt para hashes novos e quais hashes o login refaz
+    Com BCRYPT_ROUNDS o custo vale para toda a frota: min_rounds = max_rounds = custo,
+    e needs_update marca hashes com qualquer outro custo (inclusive para baixar o
+    custo de propósito). Calibrado, cada worker pode chegar a um valor diferente
+    (perto de uma potência de 2 ou em máquinas diferentes), então só min_rounds é
+    exigido: hashes mais fracos sobem de custo, mas nenhum é rebaixado, e dois
+    workers não ficam refazendo o hash do mesmo usuário a cada login.
+    """
+    if settings.BCRYPT_ROUNDS:
+        rounds = settings.BCRYPT_ROUNDS
+        pwd_context.update(bcrypt__default_rounds=rounds, bcrypt__min_rounds=rounds, bcrypt__max_rounds=rounds)
+        return rounds
+
+    rounds = calibrate_bcrypt_rounds(settings.BCRYPT_TARGET_MS, settings.BCRYPT_MIN_ROUNDS, settings.BCRYPT_MAX_ROUNDS)
+    pwd_context.update(bcrypt__default_rounds=rounds, bcrypt__min_rounds=rounds)
+    return rounds
+
+
+def current_bcrypt_rounds() -> int:
+    return pwd_context.handler("bcrypt").default_rounds
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
     """Cria token JWT para autenticação"""
     to_encode = data.copy()
@@ -0,0 +1,357 @@
+# app/services/geo_index.py
+import logging
+import math
+import threading
+import time
+from collections import defaultdict
+from typing import Dict, Hashable, Iterable, List, Optional, Tuple
+
+import numpy as np
+from sqlalchemy.orm import Session
+
+from app.services.geo_kernel import geo_kernel
+from app.services.location import get_bounding_box, longitude_ranges
+
+DEFAULT_CELL_SIZE_DEG = 0.05  # ≈ 5,5 km de latitude por célula
+DEFAULT_MAX_AGE_SECONDS = 300
+# Meia circunferência da Terra: nenhum ponto fica mais longe que isso
+MAX_DISTANCE_KM = math.pi * 6371
+
+Cell = Tuple[int, int]
+
+logger = logging.getLogger(__name__)
+
+
+class SpatialGridIndex:
+    """
+    Índice espacial em memória: grade regular de células em graus
+    Cada célula guarda os pontos (id -> lat, lon) que caem nela; uma busca por raio
+    visita só as células que cruzam o bounding box do círculo e calcula a distância
+    exata apenas para os pontos dessas células.
+
+    O índice é carregado do banco sob demanda (ensure_loaded) e mantido pelas
+    funções de CRUD. Como cada processo tem sua própria cópia, ele é recarregado
+    em segundo plano depois de `max_age_seconds` para absorver alterações feitas
+    por outros workers.
+    """
+
+    def __init__(
+            self,
+            cell_size_deg: float = DEFAULT_CELL_SIZE_DEG,
+            max_age_seconds: Optional[float] = DEFAULT_MAX_AGE_SECONDS
+    ):
+        self.cell_size_deg = cell_size_deg
+        self.max_age_seconds = max_age_seconds
+        self._cells: Dict[Cell, Dict[Hashable, Tuple[float, float]]] = defaultdict(dict)
+        self._points: Dict[Hashable, Tuple[float, float, Cell]] = {}
+        self._lock = threading.RLock()
+        self._load_lock = threading.Lock()
+        self._loaded_at: Optional[float] = None
+        # Durante uma carga: id -> (lat, lon) gravado ou None (removido) depois do início da consulta
+        self._changes_during_load: Optional[Dict[Hashable, Optional[Tuple[float, float]]]] = None
+
+    def __len__(self) -> int:
+        return len(self._points)
+
+    def __contains__(self, point_id: Hashable) -> bool:
+        return point_id in self._points
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded_at is not None
+
+    def _cell(self, latitude: float, longitude: float) -> Cell:
+        return (
+            math.floor(latitude / self.cell_size_deg),
+            math.floor(longitude / self.cell_size_deg)
+        )
+
+    def _record_change_unlocked(self, point_id: Hashable, coordinates: Optional[Tuple[float, float]]):
+        if self._changes_during_load is not None:
+            self._changes_during_load[point_id] = coordinates
+
+    def _add_unlocked(self, point_id: Hashable, latitude: float, longitude: float):
+        self._remove_unlocked(point_id)
+        cell = self._cell(latitude, longitude)
+        self._cells[cell][point_id] = (latitude, longitude)
+        self._points[point_id] = (latitude, longitude, cell)
+
+    def _remove_unlocked(self, point_id: Hashable) -> bool:
+        entry = self._points.pop(point_id, None)
+        if entry is None:
+            return False
+        cell = entry[2]
+        bucket = self._cells[cell]
+        bucket.pop(point_id, None)
+        if not bucket:
+            del self._cells[cell]
+        return True
+
+    def add(self, point_id: Hashable, latitude: Optional[float], longitude: Optional[float]):
+        """Adiciona (ou reposiciona) um ponto; pontos sem coordenadas são ignorados"""
+        if latitude is None or longitude is None:
+            return
+        with self._lock:
+            self._record_change_unlocked(point_id, (latitude, longitude))
+            self._add_unlocked(point_id, latitude, longitude)
+
+    def move(self, point_id: Hashable, latitude: Optional[float], longitude: Optional[float]):
+        """Atualiza a posição de um ponto (remove se as coordenadas forem apagadas)"""
+        with self._lock:
+            if latitude is None or longitude is None:
+                self._record_change_unlocked(point_id, None)
+                self._remove_unlocked(point_id)
+            else:
+                self._record_change_unlocked(point_id, (latitude, longitude))
+                self._add_unlocked(point_id, latitude, longitude)
+
+    def remove(self, point_id: Hashable) -> bool:
+        with self._lock:
+            self._record_change_unlocked(point_id, None)
+            return self._remove_unlocked(point_id)
+
+    def load(self, points: Iterable[Tuple[Hashable, Optional[float], Optional[float]]]):
+        """
+        Substitui todo o conteúdo do índice por `points` (id, latitude, longitude)
+        Inclusões, mudanças e remoções feitas enquanto a consulta de _load_from_database
+        rodava são reaplicadas por cima, já que o resultado do banco pode não incluí-las.
+        """
+        cells: Dict[Cell, Dict[Hashable, Tuple[float, float]]] = defaultdict(dict)
+        indexed: Dict[Hashable, Tuple[float, float, Cell]] = {}
+        for point_id, latitude, longitude in points:
+            if latitude is None or longitude is None:
+                continue
+            cell = self._cell(latitude, longitude)
+            cells[cell][point_id] = (latitude, longitude)
+            indexed[point_id] = (latitude, longitude, cell)
+
+        with self._lock:
+            self._cells = cells
+            self._points = indexed
+            changes = self._changes_during_load or {}
+            self._changes_during_load = None
+            for point_id, coordinates in changes.items():
+                if coordinates is None:
+                    self._remove_unlocked(point_id)
+                else:
+                    self._add_unlocked(point_id, *coordinates)
+            self._loaded_at = time.monotonic()
+
+    def invalidate(self):
+        """Força recarga do banco na próxima consulta"""
+        with self._lock:
+            self._loaded_at = None
+
+    def is_stale(self) -> bool:
+        if self._loaded_at is None:
+            return True
+        if self.max_age_seconds is None:
+            return False
+        return time.monotonic() - self._loaded_at > self.max_age_seconds
+
+    def is_loading(self) -> bool:
+        return self._load_lock.locked()
+
+    def _load_from_database(self, db: Session):
+        from app.models.car_wash import CarWash
+
+        with self._lock:
+            self._changes_during_load = {}
+        try:
+            rows = db.query(CarWash.id, CarWash.latitude, CarWash.longitude).filter(
+                CarWash.ativo == True
+            ).all()
+        except Exception:
+            with self._lock:
+                self._changes_during_load = None
+            raise
+        self.load(rows)
+
+    def ensure_loaded(self, db: Session):
+        """
+        Carrega os lava-jatos ativos do banco se o índice estiver vazio ou vencido
+        Só a primeira carga bloqueia quem consulta (uma por vez; quem chegou junto
+        espera e reaproveita o resultado). Vencido, o índice continua respondendo
+        enquanto a recarga roda em outra thread, como o autocomplete.
+        """
+        if not self.is_stale():
+            return
+        if self.loaded:
+            self.reload_in_background()
+            return
+        with self._load_lock:
+            if not self.is_stale():
+                return
+            self._load_from_database(db)
+
+    def reload_in_background(self) -> bool:
+        """Recarrega numa thread com sessão própria; retorna False se já há uma carga em andamento"""
+        if not self._load_lock.acquire(blocking=False):
+            return False
+
+        def reload():
+            from app.database import SessionLocal
+
+            db = SessionLocal()
+            try:
+                self._load_from_database(db)
+            except Exception as e:
+                logger.error(f"Erro ao recarregar o índice espacial: {e}")
+            finally:
+                db.close()
+                self._load_lock.release()
+
+        threading.Thread(target=reload, name="geo-index-reload", daemon=True).start()
+        return True
+
+    def query_radius_points(
+            self,
+            latitude: float,
+            longitude: float,
+            radius_km: float
+    ) -> List[Tuple[Hashable, float, float, float]]:
+        """
+        Retorna [(id, latitude, longitude, distância_km)] dos pontos dentro do raio, sem ordem
+        As distâncias dos pontos das células visitadas saem de uma chamada ao geo_kernel
+        (Haversine arredondado em 2 casas, a mesma implementação de calculate_distance_km).
+        """
+        min_lat, max_lat, min_lon, max_lon = get_bounding_box(latitude, longitude, radius_km)
+        min_row, max_row = self._cell(min_lat, 0)[0], self._cell(max_lat, 0)[0]
+        # Uma faixa de colunas, ou duas quando o círculo cruza o antimeridiano
+        col_ranges = [
+            (self._cell(0, low)[1], self._cell(0, high)[1]) for low, high in longitude_ranges(min_lon, max_lon)
+        ]
+
+        with self._lock:
+            cell_count = (max_row - min_row + 1) * sum(max_col - min_col + 1 for min_col, max_col in col_ranges)
+            if cell_count > len(self._cells):
+                # Raio enorme em relação à grade: mais barato percorrer só as células ocupadas
+                buckets = [
+                    bucket for (row, col), bucket in self._cells.items()
+                    if min_row <= row <= max_row and any(min_col <= col <= max_col for min_col, max_col in col_ranges)
+                ]
+            else:
+                buckets = [
+                    self._cells[(row, col)]
+                    for row in range(min_row, max_row + 1)
+                    for min_col, max_col in col_ranges
+                    for col in range(min_col, max_col + 1)
+                    if (row, col) in self._cells
+                ]
+            point_ids = [point_id for bucket in buckets for point_id in bucket]
+            coordinates = [point for bucket in buckets for point in bucket.values()]
+
+        if not point_ids:
+            return []
+
+        latitudes, longitudes = zip(*coordinates)
+        result = geo_kernel(latitude, longitude, latitudes, longitudes, radius_km=radius_km, with_bearings=False)
+        distances = result.distances_km
+        return [
+            (point_ids[i], latitudes[i], longitudes[i], float(distances[i]))
+            for i in np.flatnonzero(result.within_radius).tolist()
+        ]
+
+    def query_radius(
+            self,
+            latitude: float,
+            longitude: float,
+            radius_km: float
+    ) -> List[Tuple[Hashable, float]]:
+        """Retorna [(id, distância_km)] dos pontos dentro do raio, do mais próximo ao mais distante"""
+        matches = [
+            (point_id, distance)
+            for point_id, _, _, distance in self.query_radius_points(latitude, longitude, radius_km)
+        ]
+        matches.sort(key=lambda match: (match[1], str(match[0])))
+        return matches
+
+    def query_nearest(
+            self,
+            latitude: float,
+            longitude: float,
+            k: int,
+            initial_radius_km: Optional[float] = None
+    ) -> List[Tuple[Hashable, float]]:
+        """
+        Retorna os k pontos mais próximos [(id, distância_km)], sem raio fixo
+        Busca por raio começando em uma célula e dobrando até achar k pontos: se há k
+        pontos dentro do raio, nenhum ponto fora dele pode estar entre os k primeiros.
+        Em regiões densas resolve na primeira ou segunda rodada; em regiões vazias o
+        raio cresce geometricamente, então são poucas rodadas até cobrir o país.
+        """
+        if k <= 0 or not self._points:
+            return []
+
+        radius_km = initial_radius_km or self.cell_size_deg * 111.0
+        while True:
+            matches = self.query_radius(latitude, longitude, radius_km)
+            if len(matches) >= k or radius_km >= MAX_DISTANCE_KM:
+                return matches[:k]
+            radius_km = min(radius_km * 2, MAX_DISTANCE_KM)
+
+
+# Índice global dos lava-jatos ativos (um por processo)
+car_wash_index = SpatialGridIndex()
+
+
+if __name__ == "__main__":
+    # Benchmark: busca por raio na grade vs. varredura linear vetorizada de todos os pontos
+    import random
+
+    def linear_scan(points, latitude, longitude, radius_km):
+        # Todos os pontos passam pelo kernel, sem a grade
+        point_ids, latitudes, longitudes = zip(*points)
+        result = geo_kernel(latitude, longitude, latitudes, longitudes, radius_km=radius_km, with_bearings=False)
+        matches = [
+            (point_ids[i], float(result.distances_km[i])) for i in np.flatnonzero(result.within_radius).tolist()
+        ]
+        matches.sort(key=lambda match: (match[1], str(match[0])))
+        return matches
+
+    rng = random.Random(42)
+    # Região de ~1.100 km x 1.100 km no Sudeste
+    region = (-25.0, -15.0, -50.0, -40.0)
+    radius_km = 10
+
+    for total in (1_000, 100_000, 1_000_000):
+        points = [
+            (i, rng.uniform(region[0], region[1]), rng.uniform(region[2], region[3]))
+            for i in range(total)
+        ]
+        queries = [
+            (rng.uniform(region[0], region[1]), rng.uniform(region[2], region[3]))
+            for _ in range(200)
+        ]
+
+        index = SpatialGridIndex(max_age_seconds=None)
+        started = time.perf_counter()
+        index.load(points)
+        build_seconds = time.perf_counter() - started
+
+        started = time.perf_counter()
+        results = [index.query_radius(lat, lon, radius_km) for lat, lon in queries]
+        grid_ms = (time.perf_counter() - started) * 1000 / len(queries)
+
+        # Varredura linear é lenta demais para muitas consultas em 1M pontos
+        linear_queries = queries[:max(3, 20_000_000 // (total * 100))]
+        started = time.perf_counter()
+        for (lat, lon), expected in zip(linear_queries, results):
+            assert linear_scan(points, lat, lon, radius_km) == expected
+        linear_ms = (time.perf_counter() - started) * 1000 / len(linear_queries)
+
+        nearest_lat, nearest_lon = queries[0]
+        assert linear_scan(points, nearest_lat, nearest_lon, MAX_DISTANCE_KM)[:10] == index.query_nearest(
+            nearest_lat, nearest_lon, 10
+        )
+        started = time.perf_counter()
+        for lat, lon in queries:
+            index.query_nearest(lat, lon, 10)
+        nearest_ms = (time.perf_counter() - started) * 1000 / len(queries)
+
+        average_hits = sum(len(result) for result in results) / len(results)
+        print(
+            f"{total:>9,} lava-jatos: grade {grid_ms:8.3f} ms/consulta | linear {linear_ms:9.1f} ms/consulta | "
+            f"ganho {linear_ms / grid_ms:7.0f}x | montagem {build_seconds:.2f}s | {average_hits:.1f} resultados/consulta | "
+            f"10 mais próximos {nearest_ms:.3f} ms/consulta"
+        )
@@ -3,6 +3,10 @@ import math
 from typing import Tuple, List, Dict
 from dataclasses import dataclass
 
+import numpy as np
+
+from app.services.geo_kernel import DISTANCE_DECIMALS, EARTH_RADIUS_KM, bearing_deg, distance_km, geo_kernel
+
 
 @dataclass
 class Location:
@@ -16,25 +20,7 @@ def calculate_distance_km(lat1: float, lon1: float, lat2: float, lon2: float) ->
     Calcula a distância entre dois pontos geográficos usando a fórmula de Haversine
     Retorna a distância em quilômetros
     """
-    R = 6371  # Raio da Terra em km
-
-    # Converte graus para radianos
-    lat1_rad = math.radians(lat1)
-    lon1_rad = math.radians(lon1)
-    lat2_rad = math.radians(lat2)
-    lon2_rad = math.radians(lon2)
-
-    # Diferenças
-    dlat = lat2_rad - lat1_rad
-    dlon = lon2_rad - lon1_rad
-
-    # Fórmula de Haversine
-    a = (math.sin(dlat / 2) ** 2 +
-         math.cos(lat1_rad) * math.cos(lat2_rad) * math.sin(dlon / 2) ** 2)
-    c = 2 * math.atan2(math.sqrt(a), math.sqrt(1 - a))
-
-    distance = R * c
-    return round(distance, 2)
+    return distance_km(lat1, lon1, lat2, lon2)
 
 
 def is_within_radius(
@@ -55,40 +41,53 @@ def get_bounding_box(
         radius_km: float
 ) -> Tuple[float, float, float, float]:
     """
-    Calcula o bounding box (retângulo) que contém um círculo
-    Retorna: (min_lat, max_lat, min_lon, max_lon)
-    Útil para otimizar consultas no banco de dados
+    Calcula o bounding box (retângulo) que contém um círculo na esfera
+    Retorna: (min_lat, max_lat, min_lon, max_lon), em graus
+    Útil para otimizar consultas no banco de dados. A largura em longitude é o
+    máximo exato da calota (asin(sin(r/R) / cos(lat))), não r / (111 km * cos(lat)),
+    que fica curto longe do equador. Se o círculo cruza o antimeridiano,
+    min_lon > max_lon (use longitude_ranges); se contém um polo, a faixa de
+    longitude é o mundo inteiro.
     """
-    # Aproximação simples: 1 grau ≈ 111 km
-    lat_delta = radius_km / 111.0
-    lon_delta = radius_km / (111.0 * math.cos(math.radians(center_lat)))
+    # Meia casa decimal de folga: distâncias são arredondadas antes de comparar com o raio
+    angular_radius = (radius_km + 0.5 * 10 ** -DISTANCE_DECIMALS) / EARTH_RADIUS_KM
+    lat = math.radians(center_lat)
+    min_lat = lat - angular_radius
+    max_lat = lat + angular_radius
+
+    if min_lat <= -math.pi / 2 or max_lat >= math.pi / 2:
+        # O círculo contém um polo: todas as longitudes
+        return (
+            max(math.degrees(min_lat), -90.0),
+            min(math.degrees(max_lat), 90.0),
+            -180.0,
+            180.0
+        )
 
-    min_lat = center_lat - lat_delta
-    max_lat = center_lat + lat_delta
+    lon_delta = math.degrees(math.asin(min(1.0, math.sin(angular_radius) / math.cos(lat))))
     min_lon = center_lon - lon_delta
     max_lon = center_lon + lon_delta
+    if min_lon < -180.0:
+        min_lon += 360.0
+    if max_lon > 180.0:
+        max_lon -= 360.0
 
-    return min_lat, max_lat, min_lon, max_lon
+    return math.degrees(min_lat), math.degrees(max_lat), min_lon, max_lon
+
+
+def longitude_ranges(min_lon: float, max_lon: float) -> List[Tuple[float, float]]:
+    """Faixas [(de, até)] de um bounding box; duas quando ele cruza o antimeridiano"""
+    if min_lon <= max_lon:
+        return [(min_lon, max_lon)]
+    return [(min_lon, 180.0), (-180.0, max_lon)]
 
 
 def calculate_bearing(lat1: float, lon1: float, lat2: float, lon2: float) -> float:
     """
     Calcula o bearing (direção) entre dois pontos
-    Retorna o ângulo em graus (0-360)
+    Retorna o ângulo em graus (0-360); para vários pontos, use geo_kernel
     """
-    lat1_rad = math.radians(lat1)
-    lat2_rad = math.radians(lat2)
-    dlon_rad = math.radians(lon2 - lon1)
-
-    y = math.sin(dlon_rad) * math.cos(lat2_rad)
-    x = (math.cos(lat1_rad) * math.sin(lat2_rad) -
-         math.sin(lat1_rad) * math.cos(lat2_rad) * math.cos(dlon_rad))
-
-    bearing = math.atan2(y, x)
-    bearing = math.degrees(bearing)
-    bearing = (bearing + 360) % 360  # Normaliza para 0-360
-
-    return round(bearing, 2)
+    return bearing_deg(lat1, lon1, lat2, lon2)
 
 
 def get_cardinal_direction(bearing: float) -> str:
@@ -118,15 +117,21 @@ def sort_by_distance(
     Cada localização deve ter 'latitude' e 'longitude'
     Adiciona o campo 'distance_km' a cada item
     """
-    for location in locations:
-        distance = calculate_distance_km(
-            center_lat, center_lon,
-            location['latitude'], location['longitude']
-        )
+    if not locations:
+        return []
+
+    result = geo_kernel(
+        center_lat, center_lon,
+        [location['latitude'] for location in locations],
+        [location['longitude'] for location in locations],
+        with_bearings=False
+    )
+    distances = result.distances_km.tolist()
+    for location, distance in zip(locations, distances):
         location['distance_km'] = distance
         location['distance_formatted'] = format_distance(distance)
 
-    return sorted(locations, key=lambda x: x['distance_km'])
+    return [locations[i] for i in np.argsort(result.distances_km, kind='stable').tolist()]
 
 
 def validate_coordinates(latitude: float, longitude: float) -> bool:
@@ -0,0 +1,140 @@
+# app/services/nearby_cache.py
+import math
+from dataclasses import dataclass
+from typing import Callable, Hashable, List, Optional, Tuple
+
+import numpy as np
+
+from app.services.core.config import settings
+from app.services.geo_kernel import distance_km, geo_kernel
+from app.services.ttl_cache import TTLCache
+
+DEFAULT_CELL_SIZE_DEG = 0.01  # ≈ 1,1 km
+DEFAULT_RADIUS_BUCKET_KM = 5
+
+CacheKey = Tuple[int, int, int]
+Candidate = Tuple[Hashable, float, float, float]  # (id, latitude, longitude, distância do centro)
+CandidateLoader = Callable[[float, float, float], List[Candidate]]
+
+
+@dataclass
+class _CellCandidates:
+    center_lat: float
+    center_lon: float
+    search_radius_km: float
+    ids: List[Hashable]
+    latitudes: np.ndarray
+    longitudes: np.ndarray
+
+
+class NearbySearchCache(TTLCache):
+    """
+    Cache de buscas por proximidade por célula quantizada + faixa de raio
+    Usuários no mesmo quarteirão (mesma célula) com raios na mesma faixa reaproveitam
+    a lista de candidatos calculada a partir do centro da célula. Essa lista cobre o
+    raio da faixa mais meia diagonal da célula, então contém todo lava-jato que pode
+    estar no raio de qualquer ponto da célula; as distâncias exatas do usuário são
+    recalculadas por requisição com o geo_kernel.
+
+    LRU com TTL. Criação, desativação e mudança de endereço invalidam só as entradas
+    cujo círculo de busca contém o ponto alterado; outros processos veem a mudança
+    quando a entrada expira.
+    """
+
+    def __init__(
+            self,
+            max_entries: int = 2048,
+            ttl_seconds: float = 120,
+            cell_size_deg: float = DEFAULT_CELL_SIZE_DEG,
+            radius_bucket_km: float = DEFAULT_RADIUS_BUCKET_KM
+    ):
+        super().__init__(max_entries, ttl_seconds)
+        self.cell_size_deg = cell_size_deg
+        self.radius_bucket_km = radius_bucket_km
+
+    def _key(self, latitude: float, longitude: float, radius_km: float) -> CacheKey:
+        return (
+            math.floor(latitude / self.cell_size_deg),
+            math.floor(longitude / self.cell_size_deg),
+            max(1, math.ceil(radius_km / self.radius_bucket_km))
+        )
+
+    def _search_area(self, key: CacheKey) -> Tuple[float, float, float]:
+        """Centro da célula e raio que cobre a faixa a partir de qualquer ponto dela"""
+        row, col, bucket = key
+        center_lat = (row + 0.5) * self.cell_size_deg
+        center_lon = (col + 0.5) * self.cell_size_deg
+        half_cell = self.cell_size_deg / 2
+        # Canto mais distante do centro (o lado mais próximo do equador é o mais largo)
+        corner_lat = center_lat - half_cell if center_lat > 0 else center_lat + half_cell
+        half_diagonal = distance_km(center_lat, center_lon, corner_lat, center_lon + half_cell)
+        # 0,01 km de folga para o arredondamento das distâncias em 2 casas
+        return center_lat, center_lon, bucket * self.radius_bucket_km + half_diagonal + 0.01
+
+    def search(
+            self,
+            latitude: float,
+            longitude: float,
+            radius_km: float,
+            loader: CandidateLoader
+    ) -> List[Tuple[Hashable, float]]:
+        """
+        Retorna [(id, distância_km)] dentro do raio, do mais próximo ao mais distante
+        `loader(lat, lon, raio)` só é chamado em caso de miss e deve devolver os
+        candidatos (id, latitude, longitude, distância) em volta do centro da célula.
+        """
+        key = self._key(latitude, longitude, radius_km)
+        entry = self.get(key)
+
+        if entry is None:
+            center_lat, center_lon, search_radius = self._search_area(key)
+            candidates = loader(center_lat, center_lon, search_radius)
+            entry = _CellCandidates(
+                center_lat=center_lat,
+                center_lon=center_lon,
+                search_radius_km=search_radius,
+                ids=[candidate[0] for candidate in candidates],
+                latitudes=np.array([candidate[1] for candidate in candidates], dtype=np.float64),
+                longitudes=np.array([candidate[2] for candidate in candidates], dtype=np.float64)
+            )
+            self.put(key, entry)
+
+        if not entry.ids:
+            return []
+
+        result = geo_kernel(
+            latitude, longitude, entry.latitudes, entry.longitudes,
+            radius_km=radius_km, with_bearings=False
+        )
+        distances = result.distances_km
+        matches = [(entry.ids[i], float(distances[i])) for i in np.flatnonzero(result.within_radius).tolist()]
+        matches.sort(key=lambda match: (match[1], str(match[0])))
+        return matches
+
+    def invalidate_search(self, latitude: float, longitude: float, radius_km: float) -> bool:
+        """Remove a entrada que atende esta busca (ex.: candidatos que já não existem)"""
+        return self.invalidate(self._key(latitude, longitude, radius_km)) > 0
+
+    def invalidate_point(self, latitude: Optional[float], longitude: Optional[float]) -> int:
+        """Remove as entradas cujo círculo de busca contém o ponto; retorna quantas"""
+        if latitude is None or longitude is None:
+            return 0
+
+        def contains_point(entries: List[_CellCandidates]):
+            # Uma chamada ao kernel para todas as entradas (Haversine é simétrico)
+            result = geo_kernel(
+                latitude, longitude,
+                [entry.center_lat for entry in entries],
+                [entry.center_lon for entry in entries],
+                with_bearings=False
+            )
+            return (result.distances_km <= np.array([entry.search_radius_km for entry in entries])).tolist()
+
+        return self.invalidate_batch(contains_point)
+
+
+# Cache global de buscas por proximidade (um por processo)
+nearby_cache = NearbySearchCache(
+    max_entries=settings.NEARBY_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.NEARBY_CACHE_TTL_SECONDS
+)
@@ -1,15 +1,21 @@
 # app/services/notification.py
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 from datetime import datetime, timedelta
 from enum import Enum
 import smtplib
-from email.mime.text import MimeText
-from email.mime.multipart import MimeMultipart
 from dataclasses import dataclass
 import logging
+from app.services.core.config import settings
+from app.services.templates import CompiledNotification, RenderedEmail
 
 logger = logging.getLogger(__name__)
 
+APP_URL = "https://app.carwash.com"
+
+
+def review_link(booking_id) -> str:
+    return f"{APP_URL}/review/{booking_id}"
+
 
 class NotificationType(Enum):
     BOOKING_CREATED = "booking_created"
@@ -32,13 +38,14 @@ class NotificationTemplate:
 class NotificationService:
     def __init__(self, smtp_config: Dict = None):
         self.smtp_config = smtp_config or {
-            'host': 'localhost',
-            'port': 587,
-            'username': '',
-            'password': '',
-            'use_tls': True
+            'host': settings.SMTP_HOST,
+            'port': settings.SMTP_PORT,
+            'username': settings.SMTP_USERNAME,
+            'password': settings.SMTP_PASSWORD,
+            'use_tls': settings.SMTP_USE_TLS
         }
         self.templates = self._load_templates()
+        self.compiled = self._compile_templates()
 
     def _load_templates(self) -> Dict[NotificationType, NotificationTemplate]:
         """Carrega templates de email para diferentes tipos de notificação"""
@@ -229,38 +236,53 @@ class NotificationService:
             )
         }
 
-    def send_email(self, to_email: str, notification_type: NotificationType, data: Dict) -> bool:
-        """Envia email usando template específico"""
-        try:
-            template = self.templates.get(notification_type)
-            if not template:
-                logger.error(f"Template não encontrado para: {notification_type}")
-                return False
+    def _compile_templates(self) -> Dict[NotificationType, CompiledNotification]:
+        """Analisa cada template e pré-monta seu esqueleto MIME uma única vez"""
+        sender = self.smtp_config.get('username') or 'noreply@carwash.com'
+        return {
+            notification_type: CompiledNotification(
+                notification_type.value,
+                sender,
+                template.subject,
+                template.text_body,
+                template.html_body
+            )
+            for notification_type, template in self.templates.items()
+        }
 
-            # Formata o conteúdo com os dados
-            subject = template.subject.format(**data)
-            html_body = template.html_body.format(**data)
-            text_body = template.text_body.format(**data)
+    def build_message(self, to_email: str, notification_type: NotificationType, data: Dict) -> Optional[RenderedEmail]:
+        """Monta a mensagem MIME de um tipo de notificação"""
+        compiled = self.compiled.get(notification_type)
+        if not compiled:
+            logger.error(f"Template não encontrado para: {notification_type}")
+            return None
 
-            # Cria mensagem
-            msg = MimeMultipart('alternative')
-            msg['Subject'] = subject
-            msg['From'] = self.smtp_config.get('username', 'noreply@carwash.com')
-            msg['To'] = to_email
+        return compiled.render(to_email, data)
 
-            # Adiciona conteúdo
-            msg.attach(MimeText(text_body, 'plain', 'utf-8'))
-            msg.attach(MimeText(html_body, 'html', 'utf-8'))
+    def open_connection(self) -> smtplib.SMTP:
+        """Abre uma sessão SMTP autenticada (reutilizável para vários envios)"""
+        server = smtplib.SMTP(self.smtp_config['host'], self.smtp_config['port'])
+        try:
+            if self.smtp_config.get('use_tls'):
+                server.starttls()
 
-            # Envia email
-            with smtplib.SMTP(self.smtp_config['host'], self.smtp_config['port']) as server:
-                if self.smtp_config.get('use_tls'):
-                    server.starttls()
+            if self.smtp_config.get('username') and self.smtp_config.get('password'):
+                server.login(self.smtp_config['username'], self.smtp_config['password'])
+        except Exception:
+            server.close()
+            raise
+        return server
 
-                if self.smtp_config.get('username') and self.smtp_config.get('password'):
-                    server.login(self.smtp_config['username'], self.smtp_config['password'])
+    def send_email(self, to_email: str, notification_type: NotificationType, data: Dict) -> bool:
+        """Envia email usando template específico"""
+        try:
+            msg = self.build_message(to_email, notification_type, data)
+            if msg is None:
+                return False
 
-                server.send_message(msg)
+            # Envia email
+            with self.open_connection() as server:
+                server.sendmail(msg.sender, [msg.to], msg.raw)
 
             logger.info(f"Email enviado para {to_email}: {notification_type}")
             return True
@@ -269,6 +291,45 @@ class NotificationService:
             logger.error(f"Erro ao enviar email para {to_email}: {str(e)}")
             return False
 
+    def send_batch(self, messages: List[Tuple[str, NotificationType, Dict]]) -> Tuple[int, int]:
+        """
+        Envia vários emails pela mesma sessão SMTP (um handshake/login por lote)
+        Retorna (enviados, falhas); se a conexão cair, reconecta uma vez e segue
+        """
+        sent_count = 0
+        failed_count = 0
+        server = None
+
+        try:
+            for to_email, notification_type, data in messages:
+                try:
+                    msg = self.build_message(to_email, notification_type, data)
+                    if msg is None:
+                        failed_count += 1
+                        continue
+
+                    if server is None:
+                        server = self.open_connection()
+
+                    try:
+                        server.sendmail(msg.sender, [msg.to], msg.raw)
+                    except smtplib.SMTPServerDisconnected:
+                        server = self.open_connection()
+                        server.sendmail(msg.sender, [msg.to], msg.raw)
+
+                    sent_count += 1
+                except Exception as e:
+                    failed_count += 1
+                    logger.error(f"Erro ao enviar email para {to_email}: {str(e)}")
+        finally:
+            if server is not None:
+                try:
+                    server.quit()
+                except smtplib.SMTPException:
+                    server.close()
+
+        return sent_count, failed_count
+
     def send_booking_created(self, user_email: str, user_name: str, booking_data: Dict) -> bool:
         """Envia notificação de agendamento criado"""
         return self.send_email(
@@ -309,7 +370,7 @@ class NotificationService:
             NotificationType.REVIEW_REQUEST,
             {
                 'user_name': user_name,
-                'review_link': f"https://app.carwash.com/review/{booking_data.get('booking_id')}",
+                'review_link': review_link(booking_data.get('booking_id')),
                 **booking_data
             }
         )
@@ -320,7 +381,7 @@ class NotificationService:
             user_email,
             NotificationType.PASSWORD_RESET,
             {
-                'reset_link': f"https://app.carwash.com/reset-password?token={reset_token}"
+                'reset_link': f"{APP_URL}/reset-password?token={reset_token}"
             }
         )
 
@@ -336,14 +397,14 @@ class NotificationService:
 
     def send_bulk_reminders(self, reminders: List[Dict]) -> int:
         """Envia lembretes em lote"""
-        sent_count = 0
-        for reminder in reminders:
-            if self.send_booking_reminder(
-                    reminder['user_email'],
-                    reminder['user_name'],
-                    reminder['booking_data']
-            ):
-                sent_count += 1
+        sent_count, _ = self.send_batch([
+            (
+                reminder['user_email'],
+                NotificationType.BOOKING_REMINDER,
+                {'user_name': reminder['user_name'], **reminder['booking_data']}
+            )
+            for reminder in reminders
+        ])
 
         logger.info(f"Lembretes enviados: {sent_count}/{len(reminders)}")
         return sent_count
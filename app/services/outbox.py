@@ -0,0 +1,192 @@
+# app/services/outbox.py
+import asyncio
+import logging
+from typing import Dict, List, Optional
+
+import aiosmtplib
+
+from app.database import SessionLocal
+from app.crud.notification import claim_outbox_batch, complete_outbox_batch
+from app.services.core.config import settings
+from app.services.notification import NotificationService, notification_service
+from app.services.templates import RenderedEmail
+
+logger = logging.getLogger(__name__)
+
+
+class SMTPConnectionPool:
+    """Pool de sessões aiosmtplib já autenticadas, reaproveitadas entre envios"""
+
+    def __init__(self, smtp_config: Dict, size: int = 2):
+        self.smtp_config = smtp_config
+        self.size = size
+        self._idle: asyncio.Queue = asyncio.Queue()
+        self._slots = asyncio.Semaphore(size)
+
+    async def _connect(self) -> aiosmtplib.SMTP:
+        client = aiosmtplib.SMTP(
+            hostname=self.smtp_config['host'],
+            port=self.smtp_config['port'],
+            start_tls=bool(self.smtp_config.get('use_tls'))
+        )
+        try:
+            await client.connect()
+            if self.smtp_config.get('username') and self.smtp_config.get('password'):
+                await client.login(self.smtp_config['username'], self.smtp_config['password'])
+        except BaseException:
+            client.close()
+            raise
+        return client
+
+    def _release(self, client: aiosmtplib.SMTP) -> None:
+        if client.is_connected:
+            self._idle.put_nowait(client)
+        else:
+            client.close()
+
+    async def send(self, message: RenderedEmail) -> None:
+        async with self._slots:
+            client = None
+            while not self._idle.empty():
+                candidate = self._idle.get_nowait()
+                if candidate.is_connected:
+                    client = candidate
+                    break
+                candidate.close()
+
+            if client is None:
+                client = await self._connect()
+
+            try:
+                try:
+                    await client.sendmail(message.sender, [message.to], message.raw)
+                except (aiosmtplib.SMTPServerDisconnected, aiosmtplib.SMTPConnectError):
+                    # Sessão expirada no servidor: fecha a antiga e tenta uma conexão nova
+                    client.close()
+                    client = await self._connect()
+                    await client.sendmail(message.sender, [message.to], message.raw)
+            except (aiosmtplib.SMTPRecipientsRefused, aiosmtplib.SMTPResponseException):
+                # Recusa desta mensagem (destinatário, remetente, conteúdo): o sendmail já
+                # desfez o envelope com RSET e a sessão continua boa para os próximos envios
+                self._release(client)
+                raise
+            except BaseException:
+                client.close()
+                raise
+
+            self._idle.put_nowait(client)
+
+    async def close(self) -> None:
+        while not self._idle.empty():
+            client = self._idle.get_nowait()
+            try:
+                await client.quit()
+            except aiosmtplib.SMTPException:
+                client.close()
+
+
+class OutboxWorker:
+    """
+    Drena a outbox de notificações em segundo plano
+    Cada worker reserva um lote (em thread, pois a sessão do banco é síncrona),
+    envia pelo pool SMTP com concorrência limitada e registra o resultado.
+    """
+
+    def __init__(
+            self,
+            service: Optional[NotificationService] = None,
+            workers: int = settings.OUTBOX_WORKERS,
+            batch_size: int = settings.OUTBOX_BATCH_SIZE,
+            pool_size: int = settings.OUTBOX_SMTP_POOL_SIZE,
+            max_attempts: int = settings.OUTBOX_MAX_ATTEMPTS,
+            poll_interval: float = 2.0
+    ):
+        self.service = service or notification_service
+        self.workers = workers
+        self.batch_size = batch_size
+        self.pool_size = pool_size
+        self.max_attempts = max_attempts
+        self.poll_interval = poll_interval
+        self._pool: Optional[SMTPConnectionPool] = None
+        self._tasks: List[asyncio.Task] = []
+        self._stopping: Optional[asyncio.Event] = None
+
+    async def start(self) -> None:
+        if self._tasks:
+            return
+        self._pool = SMTPConnectionPool(self.service.smtp_config, size=self.pool_size)
+        self._stopping = asyncio.Event()
+        self._tasks = [
+            asyncio.create_task(self._run(worker_id), name=f"outbox-worker-{worker_id}")
+            for worker_id in range(self.workers)
+        ]
+        logger.info(f"Outbox: {self.workers} workers iniciados")
+
+    async def stop(self) -> None:
+        if not self._tasks:
+            return
+        self._stopping.set()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        await self._pool.close()
+        logger.info("Outbox: workers finalizados")
+
+    def _claim(self) -> List[Dict]:
+        db = SessionLocal()
+        try:
+            return claim_outbox_batch(db, limit=self.batch_size, max_attempts=self.max_attempts)
+        finally:
+            db.close()
+
+    def _complete(self, sent_ids: List[int], failures: List) -> None:
+        db = SessionLocal()
+        try:
+            complete_outbox_batch(db, sent_ids, failures, max_attempts=self.max_attempts)
+        finally:
+            db.close()
+
+    async def _send(self, entry: Dict) -> Optional[str]:
+        """Envia uma notificação; retorna a mensagem de erro ou None"""
+        message = self.service.build_message(entry['destinatario'], entry['tipo'], entry['dados'])
+        if message is None:
+            return f"Template não encontrado para: {entry['tipo']}"
+        try:
+            await self._pool.send(message)
+            return None
+        except Exception as e:
+            return str(e) or e.__class__.__name__
+
+    async def _run(self, worker_id: int) -> None:
+        while not self._stopping.is_set():
+            try:
+                batch = await asyncio.to_thread(self._claim)
+            except Exception as e:
+                logger.error(f"Outbox worker {worker_id}: erro ao reservar lote: {e}")
+                batch = []
+
+            if not batch:
+                try:
+                    await asyncio.wait_for(self._stopping.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            errors = await asyncio.gather(*(self._send(entry) for entry in batch))
+
+            sent_ids = [entry['id'] for entry, error in zip(batch, errors) if error is None]
+            failures = [
+                (entry['id'], entry['tentativas'], error)
+                for entry, error in zip(batch, errors) if error is not None
+            ]
+
+            try:
+                await asyncio.to_thread(self._complete, sent_ids, failures)
+            except Exception as e:
+                # As linhas continuam reservadas pelo lease e voltam para a fila depois
+                logger.error(f"Outbox worker {worker_id}: erro ao registrar lote: {e}")
+
+            logger.info(f"Outbox worker {worker_id}: {len(sent_ids)} enviados, {len(failures)} falhas")
+
+
+# Instância global dos workers (iniciada no lifespan da aplicação)
+outbox_worker = OutboxWorker()
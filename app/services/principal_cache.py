@@ -0,0 +1,29 @@
+# app/services/principal_cache.py
+from typing import Optional
+
+from app.services.core.config import settings
+from app.services.ttl_cache import TTLCache
+
+
+class PrincipalCache(TTLCache):
+    """
+    Cache LRU com TTL dos usuários autenticados, por subject do token (email)
+    Guarda só os valores das colunas do usuário, nunca a instância ORM: cada
+    requisição remonta a sua própria instância a partir deles, então nada é
+    compartilhado entre sessões/threads. Alterações de usuário neste processo
+    invalidam a entrada; em outros processos valem depois do TTL, que por isso é curto.
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl_seconds: float = 60):
+        super().__init__(max_entries, ttl_seconds)
+
+    def invalidate(self, *subjects: Optional[str]) -> int:
+        """Remove as entradas dos subjects (ex.: email antigo e novo numa troca de email)"""
+        return super().invalidate(*[subject for subject in subjects if subject is not None])
+
+
+# Cache global dos usuários autenticados (um por processo)
+principal_cache = PrincipalCache(
+    max_entries=settings.PRINCIPAL_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.PRINCIPAL_CACHE_TTL_SECONDS
+)
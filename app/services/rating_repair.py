@@ -0,0 +1,51 @@
+# app/services/rating_repair.py
+import logging
+import time
+from typing import Optional
+
+from sqlalchemy.orm import Session
+
+from app.crud.car_wash import rebuild_rating_stats
+from app.services.review_stats_cache import review_stats_cache
+
+logger = logging.getLogger(__name__)
+
+
+def repair_rating_aggregates(db: Session, car_wash_id: Optional[str] = None) -> int:
+    """
+    Recalcula os agregados de avaliação a partir das avaliações e grava as correções
+    Os agregados são mantidos por delta; este job corrige divergências (edição manual
+    no banco, bug, restauração parcial) e popula lava-jatos com avaliações anteriores
+    à tabela de agregados. Retorna quantos lava-jatos foram criados ou corrigidos.
+    """
+    started = time.perf_counter()
+    repaired = rebuild_rating_stats(db, car_wash_id)
+    db.commit()
+    if car_wash_id:
+        review_stats_cache.invalidate(car_wash_id)
+    else:
+        review_stats_cache.clear()
+    logger.info(
+        f"Agregados de avaliação: {repaired} lava-jatos criados/corrigidos "
+        f"em {time.perf_counter() - started:.2f}s"
+    )
+    return repaired
+
+
+if __name__ == "__main__":
+    # Execução avulsa (cron):
+    #   python -m app.services.rating_repair [--car-wash <id>]
+    import argparse
+    from app.database import SessionLocal
+
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description="Recalcula os agregados de avaliação dos lava-jatos")
+    parser.add_argument("--car-wash", dest="car_wash_id", default=None, help="Repara só este lava-jato")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        repair_rating_aggregates(db, args.car_wash_id)
+    finally:
+        db.close()
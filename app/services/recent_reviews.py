@@ -0,0 +1,148 @@
+# app/services/recent_reviews.py
+import hashlib
+import json
+import threading
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.schemas.review import Review as ReviewSchema
+
+DEFAULT_CAPACITY = 50  # Maior `limit` aceito por /review/recent
+DEFAULT_MAX_AGE_SECONDS = 300
+
+
+def _sort_key(item: Dict) -> Tuple[str, str]:
+    return item["criado_em"], item["id"]
+
+
+class RecentReviewsFeed:
+    """
+    Ring buffer em memória com as últimas `capacity` avaliações já serializadas
+    Criação e edição de avaliações neste processo entram direto no buffer
+    (write-through); remoções tiram o item e, se o buffer estava cheio, forçam uma
+    recarga para repor a avaliação que passa a caber no feed. Outros processos
+    aparecem na recarga por idade (`max_age_seconds`).
+
+    O corpo JSON e o ETag de cada `limit` são calculados uma vez por versão do
+    buffer. O ETag deriva do conteúdo, então workers com o mesmo feed devolvem o
+    mesmo ETag e o cliente recebe 304 de qualquer um deles.
+    """
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY, max_age_seconds: Optional[float] = DEFAULT_MAX_AGE_SECONDS):
+        self.capacity = capacity
+        self.max_age_seconds = max_age_seconds
+        self._items: List[Dict] = []  # Mais recente primeiro
+        self._pages: Dict[int, Tuple[bytes, str]] = {}
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._loaded_at: Optional[float] = None
+        # Durante uma carga: id -> item gravado (push) ou None (remove) depois do início da consulta
+        self._changes_during_load: Optional[Dict[str, Optional[Dict]]] = None
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    @staticmethod
+    def serialize(review) -> Dict:
+        return ReviewSchema.model_validate(review).model_dump(mode="json")
+
+    def _store_unlocked(self, items: List[Dict]):
+        items.sort(key=_sort_key, reverse=True)
+        self._items = items[:self.capacity]
+        self._pages = {}
+
+    def push(self, review):
+        """Insere ou atualiza (mesmo id) uma avaliação no feed"""
+        item = self.serialize(review)
+        with self._lock:
+            if self._changes_during_load is not None:
+                self._changes_during_load[item["id"]] = item
+            self._store_unlocked([existing for existing in self._items if existing["id"] != item["id"]] + [item])
+
+    def remove(self, review_id):
+        review_id = str(review_id)
+        with self._lock:
+            if self._changes_during_load is not None:
+                self._changes_during_load[review_id] = None
+            remaining = [item for item in self._items if item["id"] != review_id]
+            if len(remaining) == len(self._items):
+                return
+            was_full = len(self._items) >= self.capacity
+            self._store_unlocked(remaining)
+            if was_full:
+                # Pode haver no banco uma avaliação que agora entra no feed
+                self._loaded_at = None
+
+    def load(self, reviews: Iterable):
+        """
+        Substitui o conteúdo do feed por `reviews`
+        Pushes e remoções feitos enquanto a consulta de ensure_loaded rodava são
+        reaplicados por cima, já que o resultado do banco pode não incluí-los.
+        """
+        items = [self.serialize(review) for review in reviews]
+        with self._lock:
+            changes = self._changes_during_load or {}
+            self._changes_during_load = None
+            items = [item for item in items if item["id"] not in changes]
+            items += [item for item in changes.values() if item is not None]
+            self._store_unlocked(items)
+            self._loaded_at = time.monotonic()
+
+    def invalidate(self):
+        """Força recarga do banco na próxima consulta"""
+        with self._lock:
+            self._loaded_at = None
+
+    def is_stale(self) -> bool:
+        if self._loaded_at is None:
+            return True
+        if self.max_age_seconds is None:
+            return False
+        return time.monotonic() - self._loaded_at > self.max_age_seconds
+
+    def ensure_loaded(self, db: Session):
+        """Carrega as avaliações mais recentes se o feed estiver vazio ou vencido"""
+        if not self.is_stale():
+            return
+        # Uma carga por vez; quem chegou junto espera e reaproveita o resultado
+        with self._load_lock:
+            if not self.is_stale():
+                return
+            from app.crud.review import get_recent_reviews
+
+            with self._lock:
+                self._changes_during_load = {}
+            try:
+                reviews = get_recent_reviews(db, limit=self.capacity)
+            except Exception:
+                with self._lock:
+                    self._changes_during_load = None
+                raise
+            self.load(reviews)
+
+    def page(self, limit: int) -> Tuple[bytes, str]:
+        """Retorna (corpo JSON, ETag) das `limit` avaliações mais recentes"""
+        with self._lock:
+            cached = self._pages.get(limit)
+            if cached is None:
+                body = json.dumps(self._items[:limit], ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+                cached = (body, f'"{hashlib.sha1(body).hexdigest()[:20]}"')
+                self._pages[limit] = cached
+            return cached
+
+
+# Feed global das avaliações recentes (um por processo)
+recent_reviews_feed = RecentReviewsFeed()
+
+
+def prime_recent_reviews():
+    """Carrega o feed com uma sessão própria (chamado em thread no startup)"""
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        recent_reviews_feed.ensure_loaded(db)
+    finally:
+        db.close()
@@ -0,0 +1,155 @@
+# app/services/reminders.py
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor, Future
+from dataclasses import dataclass, field
+from datetime import date
+from typing import Deque, List, Optional
+from collections import deque
+
+from sqlalchemy.orm import Session
+
+from app.crud.booking import iter_reminder_batches
+from app.services.notification import NotificationService, NotificationType, notification_service
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ReminderBatchReport:
+    batch: int
+    total: int
+    sent: int
+    failed: int
+    elapsed_seconds: float
+
+    @property
+    def throughput(self) -> float:
+        """Emails enviados por segundo no lote"""
+        return self.sent / self.elapsed_seconds if self.elapsed_seconds else 0.0
+
+
+@dataclass
+class ReminderJobReport:
+    reminder_date: date
+    batches: List[ReminderBatchReport] = field(default_factory=list)
+    elapsed_seconds: float = 0.0
+
+    @property
+    def total(self) -> int:
+        return sum(batch.total for batch in self.batches)
+
+    @property
+    def sent(self) -> int:
+        return sum(batch.sent for batch in self.batches)
+
+    @property
+    def failed(self) -> int:
+        return sum(batch.failed for batch in self.batches)
+
+    @property
+    def throughput(self) -> float:
+        return self.sent / self.elapsed_seconds if self.elapsed_seconds else 0.0
+
+
+def _send_reminder_batch(service: NotificationService, batch_number: int, reminders: List[dict]) -> ReminderBatchReport:
+    started = time.perf_counter()
+    sent, failed = service.send_batch([
+        (
+            reminder['user_email'],
+            NotificationType.BOOKING_REMINDER,
+            {'user_name': reminder['user_name'], **reminder['booking_data']}
+        )
+        for reminder in reminders
+    ])
+    return ReminderBatchReport(
+        batch=batch_number,
+        total=len(reminders),
+        sent=sent,
+        failed=failed,
+        elapsed_seconds=time.perf_counter() - started
+    )
+
+
+def _collect(pending: Deque[Future], report: ReminderJobReport):
+    batch_report = pending.popleft().result()
+    report.batches.append(batch_report)
+    logger.info(
+        f"Lote {batch_report.batch}: {batch_report.sent}/{batch_report.total} enviados, "
+        f"{batch_report.failed} falhas ({batch_report.throughput:.1f} emails/s)"
+    )
+
+
+def dispatch_booking_reminders(
+        db: Session,
+        reminder_date: date,
+        batch_size: int = 200,
+        max_workers: int = 4,
+        service: Optional[NotificationService] = None
+) -> ReminderJobReport:
+    """
+    Envia os lembretes do dia em lotes
+    Os agendamentos são lidos do banco aos poucos; cada lote usa uma única sessão SMTP
+    e no máximo `max_workers` lotes são enviados ao mesmo tempo. Como só há
+    `max_workers` lotes em voo, a leitura do banco acompanha o ritmo dos envios.
+    """
+    service = service or notification_service
+    report = ReminderJobReport(reminder_date=reminder_date)
+    started = time.perf_counter()
+    pending: Deque[Future] = deque()
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="reminders") as executor:
+        for batch_number, reminders in enumerate(iter_reminder_batches(db, reminder_date, batch_size), start=1):
+            if len(pending) >= max_workers:
+                _collect(pending, report)
+            pending.append(executor.submit(_send_reminder_batch, service, batch_number, reminders))
+
+        while pending:
+            _collect(pending, report)
+
+    report.elapsed_seconds = time.perf_counter() - started
+    logger.info(
+        f"Lembretes de {reminder_date}: {report.sent}/{report.total} enviados, "
+        f"{report.failed} falhas em {report.elapsed_seconds:.2f}s ({report.throughput:.1f} emails/s)"
+    )
+    return report
+
+
+if __name__ == "__main__":
+    # Execução avulsa (cron). Para testar localmente, aponte para um SMTP de teste:
+    #   python -m aiosmtpd -n -l localhost:1025
+    #   python -m app.services.reminders --smtp-port 1025 --no-tls
+    import argparse
+    from datetime import timedelta
+    from app.database import SessionLocal
+
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description="Envia lembretes de agendamento")
+    parser.add_argument("--date", type=date.fromisoformat, default=date.today() + timedelta(days=1))
+    parser.add_argument("--batch-size", type=int, default=200)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--smtp-host", default="localhost")
+    parser.add_argument("--smtp-port", type=int, default=587)
+    parser.add_argument("--no-tls", action="store_true")
+    args = parser.parse_args()
+
+    smtp_service = NotificationService({
+        'host': args.smtp_host,
+        'port': args.smtp_port,
+        'username': '',
+        'password': '',
+        'use_tls': not args.no_tls
+    })
+
+    db = SessionLocal()
+    try:
+        dispatch_booking_reminders(
+            db,
+            args.date,
+            batch_size=args.batch_size,
+            max_workers=args.workers,
+            service=smtp_service
+        )
+    finally:
+        db.close()
@@ -0,0 +1,90 @@
+# app/services/review_dedupe.py
+import logging
+from typing import List
+
+from sqlalchemy import delete, desc, func, select
+from sqlalchemy.orm import Session
+
+from app.crud.car_wash import rebuild_rating_stats
+from app.models.review import Review
+from app.services.recent_reviews import recent_reviews_feed
+from app.services.review_stats_cache import review_stats_cache
+
+logger = logging.getLogger(__name__)
+
+
+def find_duplicate_reviews(db: Session) -> List:
+    """
+    Avaliações repetidas do mesmo usuário no mesmo lava-jato, exceto a mais recente
+    de cada par (user_id, car_wash_id). Retorna (id, user_id, car_wash_id, nota, criado_em).
+    """
+    ranked = select(
+        Review.id,
+        func.row_number().over(
+            partition_by=(Review.user_id, Review.car_wash_id),
+            order_by=(desc(Review.criado_em), desc(Review.id))
+        ).label("posicao")
+    ).subquery()
+
+    return db.execute(
+        select(Review.id, Review.user_id, Review.car_wash_id, Review.nota, Review.criado_em).where(
+            Review.id.in_(select(ranked.c.id).where(ranked.c.posicao > 1))
+        ).order_by(Review.car_wash_id, Review.user_id, Review.criado_em)
+    ).all()
+
+
+def remove_duplicate_reviews(db: Session, dry_run: bool = False) -> int:
+    """
+    Remove as avaliações repetidas, mantendo a mais recente de cada usuário e lava-jato
+    Migração avulsa exigida pelo índice único ux_reviews_user_car_wash: bases
+    anteriores a ele podem ter repetições, e o startup se recusa a subir sem o índice.
+    Cada avaliação removida é registrada no log; os agregados dos lava-jatos afetados
+    são recalculados na mesma transação. Retorna quantas foram (ou seriam) removidas.
+    """
+    duplicates = find_duplicate_reviews(db)
+    for review in duplicates:
+        logger.warning(
+            f"{'Removeria' if dry_run else 'Removendo'} avaliação repetida {review.id} "
+            f"(usuário {review.user_id}, lava-jato {review.car_wash_id}, nota {review.nota}, "
+            f"criada em {review.criado_em})"
+        )
+    if dry_run or not duplicates:
+        db.rollback()
+        return len(duplicates)
+
+    db.execute(
+        delete(Review).where(Review.id.in_([review.id for review in duplicates])).execution_options(
+            synchronize_session=False
+        )
+    )
+    car_wash_ids = {review.car_wash_id for review in duplicates}
+    for car_wash_id in car_wash_ids:
+        rebuild_rating_stats(db, car_wash_id)
+    db.commit()
+
+    for car_wash_id in car_wash_ids:
+        review_stats_cache.invalidate(car_wash_id)
+    recent_reviews_feed.invalidate()
+    logger.info(f"Avaliações repetidas removidas: {len(duplicates)} em {len(car_wash_ids)} lava-jatos")
+    return len(duplicates)
+
+
+if __name__ == "__main__":
+    # Execução avulsa, antes de subir a versão com o índice único (o startup cria o
+    # índice depois que as repetições somem):
+    #   python -m app.services.review_dedupe [--dry-run]
+    import argparse
+    import app.crud.review  # noqa: F401  (registra os modelos relacionados às avaliações)
+    from app.database import SessionLocal
+
+    logging.basicConfig(level=logging.INFO)
+
+    parser = argparse.ArgumentParser(description="Remove avaliações repetidas (usuário + lava-jato)")
+    parser.add_argument("--dry-run", action="store_true", help="Só lista o que seria removido")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        remove_duplicate_reviews(db, dry_run=args.dry_run)
+    finally:
+        db.close()
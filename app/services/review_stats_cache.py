@@ -0,0 +1,133 @@
+# app/services/review_stats_cache.py
+from decimal import ROUND_HALF_UP, Decimal
+from typing import Dict, Optional
+
+from app.services.core.config import settings
+from app.services.ttl_cache import TTLCache
+
+RATING_STARS = range(1, 6)
+
+
+def rating_stats_payload(stats) -> Dict:
+    """
+    Monta a resposta de /review/car-wash/{id}/stats a partir de uma linha de agregados
+    (soma_notas, total_avaliacoes, nota_1..nota_5). A média é arredondada como o
+    round() do PostgreSQL, igual a car_washes.nota.
+    """
+    total = int(stats.total_avaliacoes or 0)
+    average = Decimal(int(stats.soma_notas or 0)) / total if total else Decimal(0)
+    return {
+        'nota_media': float(average.quantize(Decimal('0.1'), rounding=ROUND_HALF_UP)),
+        'total_avaliacoes': total,
+        'distribuicao': {
+            str(star): int(getattr(stats, f'nota_{star}') or 0)
+            for star in reversed(RATING_STARS)
+        }
+    }
+
+
+class ReviewStatsCache(TTLCache):
+    """
+    Cache LRU com TTL das estatísticas de avaliação, por lava-jato
+    Cada entrada guarda a `versao` da linha de agregados que a gerou. Escritas deste
+    processo publicam a versão nova (write-through) e uma entrada nunca é trocada por
+    uma versão mais antiga, então respostas de transações concorrentes que chegam
+    fora de ordem não regridem o cache. Alterações feitas por outros processos
+    aparecem quando a entrada expira.
+    """
+
+    def __init__(self, max_entries: int = 10000, ttl_seconds: float = 300):
+        super().__init__(max_entries, ttl_seconds)
+
+    @staticmethod
+    def _key(car_wash_id) -> str:
+        return str(car_wash_id)
+
+    def get(self, car_wash_id) -> Optional[Dict]:
+        cached = super().get(self._key(car_wash_id))
+        return cached[1] if cached is not None else None
+
+    def put(self, car_wash_id, version: int, payload: Dict):
+        """Guarda as estatísticas da `version`, a menos que já exista uma versão mais nova"""
+        super().put(
+            self._key(car_wash_id),
+            (version, payload),
+            replaces=lambda current: current[0] <= version
+        )
+
+    def invalidate(self, car_wash_id) -> int:
+        return super().invalidate(self._key(car_wash_id))
+
+
+# Cache global das estatísticas de avaliação (um por processo)
+review_stats_cache = ReviewStatsCache(
+    max_entries=settings.REVIEW_STATS_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.REVIEW_STATS_CACHE_TTL_SECONDS
+)
+
+
+if __name__ == "__main__":
+    # Benchmark: varredura das avaliações com CASE (get_review_stats antigo) vs. linha de
+    # agregados por chave primária vs. cache, com 100 a 1M avaliações no mesmo lava-jato
+    import time
+    from sqlalchemy import text
+    from app.database import engine
+
+    def timed(function, repeat):
+        started = time.perf_counter()
+        for _ in range(repeat):
+            result = function()
+        return (time.perf_counter() - started) * 1000 / repeat, result
+
+    scan_sql = text("""
+        SELECT coalesce(sum(nota), 0) AS soma_notas, count(*) AS total_avaliacoes,
+               sum(CASE WHEN nota = 1 THEN 1 ELSE 0 END) AS nota_1,
+               sum(CASE WHEN nota = 2 THEN 1 ELSE 0 END) AS nota_2,
+               sum(CASE WHEN nota = 3 THEN 1 ELSE 0 END) AS nota_3,
+               sum(CASE WHEN nota = 4 THEN 1 ELSE 0 END) AS nota_4,
+               sum(CASE WHEN nota = 5 THEN 1 ELSE 0 END) AS nota_5
+        FROM bench_reviews WHERE car_wash_id = :car_wash_id
+    """)
+    lookup_sql = text("SELECT * FROM bench_rating_stats WHERE car_wash_id = :car_wash_id")
+
+    with engine.connect() as connection:
+        connection.execute(text(
+            "CREATE TEMPORARY TABLE bench_reviews (id bigserial PRIMARY KEY, car_wash_id int NOT NULL, nota int NOT NULL)"
+        ))
+        connection.execute(text("CREATE INDEX ON bench_reviews (car_wash_id)"))
+        connection.execute(text("""
+            CREATE TEMPORARY TABLE bench_rating_stats (
+                car_wash_id int PRIMARY KEY, soma_notas bigint, total_avaliacoes int,
+                nota_1 int, nota_2 int, nota_3 int, nota_4 int, nota_5 int, versao bigint
+            )
+        """))
+
+        for car_wash_id, total in enumerate((100, 10_000, 1_000_000), start=1):
+            connection.execute(text(
+                "INSERT INTO bench_reviews (car_wash_id, nota) "
+                "SELECT :car_wash_id, 1 + (random() * 4)::int FROM generate_series(1, :total)"
+            ), {"car_wash_id": car_wash_id, "total": total})
+            connection.execute(text("""
+                INSERT INTO bench_rating_stats
+                SELECT car_wash_id, sum(nota), count(*),
+                       count(*) FILTER (WHERE nota = 1), count(*) FILTER (WHERE nota = 2),
+                       count(*) FILTER (WHERE nota = 3), count(*) FILTER (WHERE nota = 4),
+                       count(*) FILTER (WHERE nota = 5), 0
+                FROM bench_reviews WHERE car_wash_id = :car_wash_id GROUP BY car_wash_id
+            """), {"car_wash_id": car_wash_id})
+            connection.execute(text("ANALYZE bench_reviews"))
+            connection.execute(text("ANALYZE bench_rating_stats"))
+
+            params = {"car_wash_id": car_wash_id}
+            scan_ms, scanned = timed(lambda: connection.execute(scan_sql, params).first(), 20)
+            lookup_ms, stored = timed(lambda: connection.execute(lookup_sql, params).first(), 200)
+            assert rating_stats_payload(scanned) == rating_stats_payload(stored)
+
+            cache = ReviewStatsCache()
+            cache.put(car_wash_id, stored.versao, rating_stats_payload(stored))
+            cache_ms, _ = timed(lambda: cache.get(car_wash_id), 10_000)
+            print(
+                f"{total:>9,} avaliações: varredura CASE {scan_ms:8.2f} ms | "
+                f"agregados por PK {lookup_ms:6.3f} ms | cache {cache_ms * 1000:6.2f} µs"
+            )
+        connection.rollback()
@@ -0,0 +1,438 @@
+# app/services/suggest.py
+import heapq
+import re
+import threading
+import time
+import unicodedata
+from bisect import bisect_left, insort
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy.orm import Session
+
+MAX_PREFIX_LENGTH = 6  # Prefixos maiores são verificados no candidato
+MIN_TRIGRAM_SIMILARITY = 0.3
+# Trigramas presentes em muitos nomes ("lav", "  l") não ajudam a achar candidatos
+MAX_TRIGRAM_POSTINGS = 5000
+DEFAULT_MAX_AGE_SECONDS = 300
+
+SuggestionKey = Tuple[str, str]  # (tipo, id)
+_NON_ALNUM = re.compile(r"[^0-9a-z]+")
+
+
+def normalize(value: str) -> str:
+    """Minúsculas, sem acentos e só com letras/dígitos separados por espaço"""
+    value = value or ""
+    if not value.isascii():
+        decomposed = unicodedata.normalize("NFKD", value)
+        value = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return _NON_ALNUM.sub(" ", value.lower()).strip()
+
+
+def trigrams(value: str) -> Set[str]:
+    """Trigramas no estilo pg_trgm: cada palavra com dois espaços antes e um depois"""
+    grams = set()
+    for token in value.split():
+        padded = f"  {token} "
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+@dataclass
+class Suggestion:
+    tipo: str  # "car_wash" ou "service"
+    id: str  # id do lava-jato; para serviços, o nome normalizado
+    nome: str
+    popularidade: float = 0.0  # avaliações do lava-jato / lava-jatos que oferecem o serviço
+    normalized: str = field(default="", repr=False)
+    tokens: Tuple[str, ...] = field(default=(), repr=False)
+    grams: Set[str] = field(default_factory=set, repr=False)
+    rank: Tuple = field(default=(), repr=False)
+
+    @property
+    def key(self) -> SuggestionKey:
+        return self.tipo, self.id
+
+
+class SuggestIndex:
+    """
+    Índice de autocomplete em memória para nomes de lava-jatos e serviços ativos
+    Serviços são agregados por nome ("Polimento" aparece uma vez, com quantos
+    lava-jatos o oferecem). Cada prefixo (até MAX_PREFIX_LENGTH letras) de cada
+    palavra do nome aponta para uma lista já ordenada por relevância (mais
+    avaliações/ofertas, nome mais curto). A busca
+    percorre a menor lista na ordem e para ao juntar `limit` resultados, então o custo
+    não depende do tamanho do cadastro. Se o prefixo achar pouco, completa com
+    similaridade de trigramas (tolera erros de digitação).
+
+    Mantido incrementalmente pelas funções de CRUD; recarregado do banco depois de
+    `max_age_seconds` para absorver alterações de outros processos.
+    """
+
+    def __init__(self, max_age_seconds: Optional[float] = DEFAULT_MAX_AGE_SECONDS):
+        self.max_age_seconds = max_age_seconds
+        self._entries: Dict[SuggestionKey, Suggestion] = {}
+        self._prefixes: Dict[str, List[Tuple]] = defaultdict(list)
+        self._trigrams: Dict[str, Set[SuggestionKey]] = defaultdict(set)
+        # Serviço -> nome normalizado e nome normalizado -> (nome exibido, ids dos serviços)
+        self._service_names: Dict[str, str] = {}
+        self._service_groups: Dict[str, Tuple[str, Set[str]]] = {}
+        self._lock = threading.RLock()
+        self._load_lock = threading.Lock()
+        self._loaded_at: Optional[float] = None
+        # Durante uma carga, gravações feitas depois do início da consulta:
+        # (tipo, id) -> Suggestion ou None (removida); ("service_id", id) -> nome do serviço ou None
+        self._changes_during_load: Optional[Dict[Tuple[str, str], Optional[object]]] = None
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def _prefixes_of(tokens: Iterable[str]) -> Set[str]:
+        return {
+            token[:length]
+            for token in tokens
+            for length in range(1, min(len(token), MAX_PREFIX_LENGTH) + 1)
+        }
+
+    @staticmethod
+    def _prepare(suggestion: Suggestion) -> Suggestion:
+        suggestion.normalized = normalize(suggestion.nome)
+        suggestion.tokens = tuple(suggestion.normalized.split())
+        suggestion.grams = trigrams(suggestion.normalized)
+        # Tupla compartilhada por todas as listas de prefixo em que a sugestão aparece
+        suggestion.rank = (-suggestion.popularidade, len(suggestion.normalized), suggestion.normalized, suggestion.key)
+        return suggestion
+
+    def _remove_unlocked(self, key: SuggestionKey) -> bool:
+        suggestion = self._entries.pop(key, None)
+        if suggestion is None:
+            return False
+
+        for prefix in self._prefixes_of(suggestion.tokens):
+            postings = self._prefixes[prefix]
+            position = bisect_left(postings, suggestion.rank)
+            if position < len(postings) and postings[position] == suggestion.rank:
+                del postings[position]
+            if not postings:
+                del self._prefixes[prefix]
+        for gram in suggestion.grams:
+            keys = self._trigrams[gram]
+            keys.discard(key)
+            if not keys:
+                del self._trigrams[gram]
+        return True
+
+    def _add_unlocked(self, suggestion: Suggestion):
+        suggestion = self._prepare(suggestion)
+        self._remove_unlocked(suggestion.key)
+        if not suggestion.tokens:
+            return
+        key = suggestion.key
+        self._entries[key] = suggestion
+        for prefix in self._prefixes_of(suggestion.tokens):
+            insort(self._prefixes[prefix], suggestion.rank)
+        for gram in suggestion.grams:
+            self._trigrams[gram].add(key)
+
+    def _record_change_unlocked(self, key: Tuple[str, str], change: Optional[object]):
+        if self._changes_during_load is not None:
+            self._changes_during_load[key] = change
+
+    def add(self, suggestion: Suggestion):
+        """Adiciona ou atualiza (nome, popularidade) uma sugestão"""
+        with self._lock:
+            self._record_change_unlocked(suggestion.key, suggestion)
+            self._add_unlocked(suggestion)
+
+    def remove(self, tipo: str, suggestion_id) -> bool:
+        key = (tipo, str(suggestion_id))
+        with self._lock:
+            self._record_change_unlocked(key, None)
+            return self._remove_unlocked(key)
+
+    def add_car_wash(self, car_wash):
+        if not car_wash.ativo:
+            self.remove_car_wash(car_wash.id)
+            return
+        self.add(Suggestion(
+            tipo="car_wash",
+            id=str(car_wash.id),
+            nome=car_wash.nome,
+            popularidade=float(car_wash.total_avaliacoes or 0)
+        ))
+
+    def remove_car_wash(self, car_wash_id):
+        self.remove("car_wash", car_wash_id)
+
+    def _refresh_service_group_unlocked(self, name_key: str):
+        display, service_ids = self._service_groups.get(name_key, ("", set()))
+        if service_ids:
+            self._add_unlocked(Suggestion(
+                tipo="service", id=name_key, nome=display, popularidade=float(len(service_ids))
+            ))
+        else:
+            self._service_groups.pop(name_key, None)
+            self._remove_unlocked(("service", name_key))
+
+    def _detach_service_unlocked(self, service_id: str):
+        name_key = self._service_names.pop(service_id, None)
+        if name_key is None:
+            return
+        self._service_groups[name_key][1].discard(service_id)
+        self._refresh_service_group_unlocked(name_key)
+
+    def _attach_service_unlocked(self, service_id: str, nome: str):
+        name_key = normalize(nome)
+        if self._service_names.get(service_id) == name_key:
+            return
+        self._detach_service_unlocked(service_id)
+        if not name_key:
+            return
+        self._service_names[service_id] = name_key
+        display, service_ids = self._service_groups.setdefault(name_key, (nome, set()))
+        service_ids.add(service_id)
+        self._refresh_service_group_unlocked(name_key)
+
+    def add_service(self, service):
+        """Adiciona, renomeia ou (se inativo) remove um serviço do seu grupo de nome"""
+        service_id = str(service.id)
+        with self._lock:
+            self._record_change_unlocked(("service_id", service_id), service.nome if service.ativo else None)
+            if service.ativo:
+                self._attach_service_unlocked(service_id, service.nome)
+            else:
+                self._detach_service_unlocked(service_id)
+
+    def remove_service(self, service_id):
+        service_id = str(service_id)
+        with self._lock:
+            self._record_change_unlocked(("service_id", service_id), None)
+            self._detach_service_unlocked(service_id)
+
+    def load(
+            self,
+            car_washes: Iterable[Tuple[str, str, float]],
+            services: Iterable[Tuple[str, str]]
+    ):
+        """
+        Substitui todo o conteúdo a partir de (id, nome, avaliações) dos lava-jatos e
+        (id, nome) dos serviços; cada lista de prefixo é ordenada uma única vez
+        Gravações feitas enquanto as consultas de ensure_loaded rodavam são reaplicadas
+        por cima, já que o resultado do banco pode não incluí-las.
+        """
+        service_names: Dict[str, str] = {}
+        service_groups: Dict[str, Tuple[str, Set[str]]] = {}
+        for service_id, nome in services:
+            name_key = normalize(nome)
+            if not name_key:
+                continue
+            service_names[str(service_id)] = name_key
+            service_groups.setdefault(name_key, (nome, set()))[1].add(str(service_id))
+
+        suggestions = [
+            *(
+                Suggestion(tipo="car_wash", id=str(car_wash_id), nome=nome, popularidade=float(total or 0))
+                for car_wash_id, nome, total in car_washes
+            ),
+            *(
+                Suggestion(tipo="service", id=name_key, nome=display, popularidade=float(len(service_ids)))
+                for name_key, (display, service_ids) in service_groups.items()
+            )
+        ]
+
+        entries: Dict[SuggestionKey, Suggestion] = {}
+        prefixes: Dict[str, List[Tuple]] = defaultdict(list)
+        grams: Dict[str, Set[SuggestionKey]] = defaultdict(set)
+        for suggestion in suggestions:
+            suggestion = self._prepare(suggestion)
+            if not suggestion.tokens:
+                continue
+            key, rank = suggestion.key, suggestion.rank
+            entries[key] = suggestion
+            for prefix in self._prefixes_of(suggestion.tokens):
+                prefixes[prefix].append(rank)
+            for gram in suggestion.grams:
+                grams[gram].add(key)
+
+        for postings in prefixes.values():
+            postings.sort()
+
+        with self._lock:
+            self._entries = entries
+            self._prefixes = prefixes
+            self._trigrams = grams
+            self._service_names = service_names
+            self._service_groups = service_groups
+            changes = self._changes_during_load or {}
+            self._changes_during_load = None
+            for (tipo, change_id), change in changes.items():
+                if tipo == "service_id":
+                    if change is None:
+                        self._detach_service_unlocked(change_id)
+                    else:
+                        self._attach_service_unlocked(change_id, change)
+                elif change is None:
+                    self._remove_unlocked((tipo, change_id))
+                else:
+                    self._add_unlocked(change)
+            self._loaded_at = time.monotonic()
+
+    def is_stale(self) -> bool:
+        if self._loaded_at is None:
+            return True
+        if self.max_age_seconds is None:
+            return False
+        return time.monotonic() - self._loaded_at > self.max_age_seconds
+
+    def is_loading(self) -> bool:
+        return self._load_lock.locked()
+
+    def ensure_loaded(self, db: Session):
+        """Carrega nomes de lava-jatos e serviços ativos se o índice estiver vazio ou vencido"""
+        if not self.is_stale():
+            return
+        # Uma carga por vez; quem chegou junto espera e reaproveita o resultado
+        with self._load_lock:
+            if not self.is_stale():
+                return
+            from app.models.car_wash import CarWash
+            from app.models.service import Service
+
+            with self._lock:
+                self._changes_during_load = {}
+            try:
+                car_washes = db.query(CarWash.id, CarWash.nome, CarWash.total_avaliacoes).filter(
+                    CarWash.ativo == True
+                ).all()
+                services = db.query(Service.id, Service.nome).join(
+                    CarWash, CarWash.id == Service.car_wash_id
+                ).filter(Service.ativo == True, CarWash.ativo == True).all()
+            except Exception:
+                with self._lock:
+                    self._changes_during_load = None
+                raise
+            self.load(car_washes, services)
+
+    def _prefix_matches(self, tokens: List[str], tipo: Optional[str], limit: int) -> List[Suggestion]:
+        # Cada termo digitado precisa ser prefixo de alguma palavra do nome
+        postings = [self._prefixes.get(token[:MAX_PREFIX_LENGTH], ()) for token in tokens]
+        shortest = min(postings, key=len)
+
+        matches = []
+        for rank in shortest:
+            suggestion = self._entries[rank[-1]]
+            if tipo and suggestion.tipo != tipo:
+                continue
+            if all(any(word.startswith(token) for word in suggestion.tokens) for token in tokens):
+                matches.append(suggestion)
+                if len(matches) >= limit:
+                    break
+        return matches
+
+    def _trigram_matches(
+            self,
+            normalized_query: str,
+            tipo: Optional[str],
+            limit: int,
+            exclude: Set[SuggestionKey]
+    ) -> List[Suggestion]:
+        query_grams = trigrams(normalized_query)
+        if not query_grams:
+            return []
+
+        candidates: Set[SuggestionKey] = set()
+        for gram in query_grams:
+            keys = self._trigrams.get(gram, ())
+            if len(keys) <= MAX_TRIGRAM_POSTINGS:
+                candidates.update(keys)
+
+        scored = []
+        for key in candidates - exclude:
+            suggestion = self._entries[key]
+            if tipo and suggestion.tipo != tipo:
+                continue
+            overlap = len(query_grams & suggestion.grams)
+            similarity = overlap / (len(query_grams) + len(suggestion.grams) - overlap)
+            if similarity >= MIN_TRIGRAM_SIMILARITY:
+                scored.append((-similarity, suggestion.rank, suggestion))
+        return [suggestion for _, _, suggestion in heapq.nsmallest(limit, scored, key=lambda item: item[:2])]
+
+    def suggest(self, query: str, limit: int = 10, tipo: Optional[str] = None) -> List[Suggestion]:
+        """
+        Até `limit` sugestões para o texto digitado
+        Nomes que começam com o texto vêm primeiro; depois os que têm todas as palavras
+        com prefixo correspondente; por último, parecidos por trigramas.
+        """
+        normalized_query = normalize(query)
+        tokens = normalized_query.split()
+        if not tokens or limit <= 0:
+            return []
+
+        with self._lock:
+            # Busca alguns candidatos a mais para poder promover quem começa com o texto
+            matches = self._prefix_matches(tokens, tipo, limit * 4)
+            matches.sort(key=lambda suggestion: not suggestion.normalized.startswith(normalized_query))
+            matches = matches[:limit]
+
+            if len(matches) < limit and len(normalized_query) >= 3:
+                found = {suggestion.key for suggestion in matches}
+                matches += self._trigram_matches(normalized_query, tipo, limit - len(matches), found)
+        return matches
+
+
+# Índice global de autocomplete (um por processo)
+suggest_index = SuggestIndex()
+
+
+def prime_suggest_index():
+    """Carrega o índice com uma sessão própria (chamado em thread no startup)"""
+    from app.database import SessionLocal
+
+    db = SessionLocal()
+    try:
+        suggest_index.ensure_loaded(db)
+    finally:
+        db.close()
+
+
+if __name__ == "__main__":
+    # Benchmark: 100k lava-jatos + 300k serviços, tempo por sugestão
+    import random
+
+    rng = random.Random(11)
+    prefixes = ["Lava-Jato", "Auto Center", "Estética Automotiva", "Lava Rápido", "Car Wash", "Lavagem"]
+    names = ["São Jorge", "Central", "Brilho", "Água Viva", "Espuma", "Dona Maria", "Avenida", "Jardins",
+             "Premium", "Express", "Ipiranga", "Paulista", "Boa Vista", "Shopping", "Vila Nova", "Lagoa"]
+    services = ["Lavagem simples", "Lavagem completa", "Polimento", "Cristalização", "Higienização interna",
+                "Cera de carnaúba", "Lavagem de motor", "Vitrificação", "Lavagem a seco", "Aspiração"]
+
+    index = SuggestIndex(max_age_seconds=None)
+    car_washes = [
+        (f"cw{i}", f"{rng.choice(prefixes)} {rng.choice(names)} {i}", rng.randint(0, 500))
+        for i in range(100_000)
+    ]
+    services = [(f"sv{i}", rng.choice(services)) for i in range(300_000)]
+
+    started = time.perf_counter()
+    index.load(car_washes, services)
+    print(f"carga de 100k lava-jatos + 300k serviços ({len(index):,} nomes): {time.perf_counter() - started:.2f}s")
+
+    for query in ["la", "lav", "lava jato sao", "polim", "higieniz", "estetica auto brilho", "cristalisacao", "xyzw"]:
+        repeat = 1000
+        started = time.perf_counter()
+        for _ in range(repeat):
+            results = index.suggest(query, limit=10)
+        elapsed_ms = (time.perf_counter() - started) * 1000 / repeat
+        print(f"{query!r:24} {elapsed_ms:.3f} ms  -> {[s.nome for s in results[:3]]}")
+
+    class _Row:
+        def __init__(self, **kwargs):
+            self.__dict__.update(kwargs)
+
+    started = time.perf_counter()
+    for i in range(1000):
+        index.add_car_wash(_Row(id=f"novo{i}", nome=f"Lava-Jato Novo {i}", total_avaliacoes=1, ativo=True))
+        index.add_service(_Row(id=f"sv{i}", nome="Lavagem de tapete", ativo=True))
+    print(f"atualização incremental: {(time.perf_counter() - started):.3f} ms por lava-jato + serviço")
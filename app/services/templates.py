@@ -0,0 +1,177 @@
+# app/services/templates.py
+import base64
+from dataclasses import dataclass
+from email.header import Header
+from functools import lru_cache
+from string import Formatter
+from typing import Dict, List, Tuple
+
+CRLF = b"\r\n"
+
+
+@dataclass
+class RenderedEmail:
+    sender: str
+    to: str
+    subject: str
+    raw: bytes  # Mensagem MIME completa, pronta para SMTP sendmail
+
+
+class CompiledTemplate:
+    """
+    Template de notificação analisado uma única vez
+    Assunto, texto e HTML viram uma lista única de pedaços literais com posições
+    reservadas para os campos; renderizar é preencher essas posições e juntar.
+    """
+
+    def __init__(self, subject: str, text_body: str, html_body: str):
+        self._pieces: List[str] = []
+        self._slots: List[Tuple[int, str, str]] = []
+        self._bounds: List[Tuple[int, int]] = []
+
+        for source in (subject, text_body, html_body):
+            start = len(self._pieces)
+            for literal, field_name, format_spec, conversion in Formatter().parse(source):
+                if literal:
+                    self._pieces.append(literal)
+                if field_name is None:
+                    continue
+                if not field_name.isidentifier() or conversion:
+                    raise ValueError(f"Campo não suportado no template: {{{field_name}}}")
+                self._slots.append((len(self._pieces), field_name, format_spec or ""))
+                self._pieces.append("")
+            self._bounds.append((start, len(self._pieces)))
+
+        self.fields = frozenset(name for _, name, _ in self._slots)
+
+    def render(self, data: Dict) -> Tuple[str, str, str]:
+        """Retorna (assunto, texto, html); campos ausentes lançam KeyError como str.format"""
+        pieces = self._pieces.copy()
+        for position, name, format_spec in self._slots:
+            value = data[name]
+            pieces[position] = value if type(value) is str and not format_spec else format(value, format_spec)
+        return tuple("".join(pieces[start:end]) for start, end in self._bounds)
+
+
+@lru_cache(maxsize=256)
+def _rfc2047(value: str) -> bytes:
+    # Assuntos se repetem entre mensagens do mesmo tipo e a codificação RFC 2047 é cara
+    return Header(value, "utf-8").encode().encode("ascii")
+
+
+class MimeSkeleton:
+    """
+    Estrutura multipart/alternative pré-montada para um tipo de notificação
+    Cabeçalhos fixos, boundary e cabeçalhos das partes são gerados uma vez;
+    por mensagem só entram assunto, destinatário e os corpos em base64.
+    """
+
+    def __init__(self, name: str, sender: str):
+        boundary = f"=_carwash_{name}_alt"
+        self._head = (
+            f'Content-Type: multipart/alternative; boundary="{boundary}"\r\n'
+            f"MIME-Version: 1.0\r\n"
+            f"From: {sender}\r\n"
+        ).encode("ascii")
+        part_headers = (
+            "Content-Type: text/{subtype}; charset=\"utf-8\"\r\n"
+            "MIME-Version: 1.0\r\n"
+            "Content-Transfer-Encoding: base64\r\n\r\n"
+        )
+        self._text_part = f"\r\n--{boundary}\r\n{part_headers.format(subtype='plain')}".encode("ascii")
+        self._html_part = f"--{boundary}\r\n{part_headers.format(subtype='html')}".encode("ascii")
+        self._closing = f"--{boundary}--\r\n".encode("ascii")
+
+    @staticmethod
+    def _encode_header(value: str) -> bytes:
+        # Quebra de linha no valor injetaria cabeçalhos ou corpo (email.message também recusa)
+        if "\r" in value or "\n" in value:
+            raise ValueError("Valores de cabeçalho não podem conter quebras de linha")
+        if value.isascii():
+            return value.encode("ascii")
+        return _rfc2047(value)
+
+    @staticmethod
+    def _encode_body(value: str) -> bytes:
+        return base64.encodebytes(value.encode("utf-8")).replace(b"\n", CRLF)
+
+    def build(self, to_email: str, subject: str, text_body: str, html_body: str) -> bytes:
+        return b"".join((
+            self._head,
+            b"Subject: ", self._encode_header(subject), CRLF,
+            b"To: ", self._encode_header(to_email), CRLF,
+            self._text_part, self._encode_body(text_body),
+            self._html_part, self._encode_body(html_body),
+            self._closing
+        ))
+
+
+class CompiledNotification:
+    """Template compilado + esqueleto MIME de um tipo de notificação"""
+
+    def __init__(self, name: str, sender: str, subject: str, text_body: str, html_body: str):
+        self.sender = sender
+        self.template = CompiledTemplate(subject, text_body, html_body)
+        self.skeleton = MimeSkeleton(name, sender)
+
+    def render(self, to_email: str, data: Dict) -> RenderedEmail:
+        subject, text_body, html_body = self.template.render(data)
+        return RenderedEmail(
+            sender=self.sender,
+            to=to_email,
+            subject=subject,
+            raw=self.skeleton.build(to_email, subject, text_body, html_body)
+        )
+
+
+if __name__ == "__main__":
+    # Benchmark: 100k lembretes com str.format + MIMEMultipart vs. templates compilados
+    import time
+    from email import message_from_bytes
+    from email.header import decode_header, make_header
+    from email.mime.multipart import MIMEMultipart
+    from email.mime.text import MIMEText
+    from app.services.notification import NotificationService, NotificationType
+
+    total = 100_000
+    service = NotificationService()
+    template = service.templates[NotificationType.BOOKING_REMINDER]
+    compiled = service.compiled[NotificationType.BOOKING_REMINDER]
+    reminders = [
+        (f"cliente{i}@example.com", {
+            'user_name': f"Cliente {i}",
+            'car_wash_name': "Lava-Jato Central",
+            'service_name': "Lavagem completa",
+            'booking_date': "18/10/2026",
+            'booking_time': f"{8 + i % 10:02d}:00",
+            'car_wash_address': "Av. Paulista, 1000"
+        })
+        for i in range(total)
+    ]
+
+    # Sanidade: o resultado decodificado é o mesmo do caminho antigo
+    sample_to, sample_data = reminders[0]
+    parsed = message_from_bytes(compiled.render(sample_to, sample_data).raw)
+    assert str(make_header(decode_header(parsed['Subject']))) == template.subject.format(**sample_data)
+    assert parsed.get_payload()[0].get_payload(decode=True).decode() == template.text_body.format(**sample_data)
+    assert parsed.get_payload()[1].get_payload(decode=True).decode() == template.html_body.format(**sample_data)
+
+    started = time.perf_counter()
+    for to_email, data in reminders:
+        msg = MIMEMultipart('alternative')
+        msg['Subject'] = template.subject.format(**data)
+        msg['From'] = 'noreply@carwash.com'
+        msg['To'] = to_email
+        msg.attach(MIMEText(template.text_body.format(**data), 'plain', 'utf-8'))
+        msg.attach(MIMEText(template.html_body.format(**data), 'html', 'utf-8'))
+        msg.as_bytes()
+    legacy_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for to_email, data in reminders:
+        compiled.render(to_email, data)
+    compiled_seconds = time.perf_counter() - started
+
+    print(f"str.format + MIMEMultipart: {legacy_seconds:.2f}s ({total / legacy_seconds:,.0f} msgs/s)")
+    print(f"templates compilados:       {compiled_seconds:.2f}s ({total / compiled_seconds:,.0f} msgs/s)")
+    print(f"ganho: {legacy_seconds / compiled_seconds:.1f}x")
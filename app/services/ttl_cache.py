@@ -0,0 +1,117 @@
+# app/services/ttl_cache.py
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Hashable, Iterable, List, Optional
+
+
+@dataclass
+class _CacheEntry:
+    value: Any
+    expires_at: float
+
+
+class TTLCache:
+    """
+    Cache LRU com TTL, seguro entre threads (um por processo)
+    Base dos caches em memória da aplicação: cada um define a chave e o que guarda,
+    e todos compartilham a expiração, o despejo do menos usado e as estatísticas
+    expostas em /health. `max_entries` = 0 desliga o cache.
+    """
+
+    def __init__(self, max_entries: int, ttl_seconds: float):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Hashable, _CacheEntry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_entries > 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry.expires_at <= time.monotonic():
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry.value
+
+    def put(self, key: Hashable, value: Any, replaces: Optional[Callable[[Any], bool]] = None):
+        """
+        Guarda `value` em `key`
+        Com `replaces`, uma entrada ainda válida só é trocada se `replaces(valor_atual)`
+        for verdadeiro (ex.: não trocar uma versão mais nova por uma mais antiga).
+        """
+        if not self.enabled:
+            return
+        with self._lock:
+            now = time.monotonic()
+            current = self._entries.get(key)
+            if replaces is not None and current is not None and current.expires_at > now and not replaces(current.value):
+                return
+            self._entries[key] = _CacheEntry(value=value, expires_at=now + self.ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, *keys: Hashable) -> int:
+        """Remove as entradas das chaves; retorna quantas existiam"""
+        with self._lock:
+            removed = sum(1 for key in keys if self._entries.pop(key, None) is not None)
+            self.invalidations += removed
+        return removed
+
+    def invalidate_where(self, predicate: Callable[[Hashable, Any], bool]) -> int:
+        """Remove as entradas em que `predicate(chave, valor)` é verdadeiro; retorna quantas"""
+        with self._lock:
+            stale = [key for key, entry in self._entries.items() if predicate(key, entry.value)]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+        return len(stale)
+
+    def invalidate_batch(self, select: Callable[[List[Any]], Iterable[bool]]) -> int:
+        """
+        Como invalidate_where, mas `select` recebe todos os valores de uma vez e devolve
+        um booleano por valor, na mesma ordem (permite um cálculo vetorizado); retorna quantas
+        """
+        with self._lock:
+            keys = list(self._entries)
+            if not keys:
+                return 0
+            stale = [
+                key for key, remove in zip(keys, select([self._entries[key].value for key in keys])) if remove
+            ]
+            for key in stale:
+                del self._entries[key]
+            self.invalidations += len(stale)
+        return len(stale)
+
+    def clear(self):
+        with self._lock:
+            self.invalidations += len(self._entries)
+            self._entries.clear()
+
+    def stats(self) -> Dict:
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations
+            }
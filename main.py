@@ -11,6 +11,7 @@ from fastapi.responses import JSONResponse
 from fastapi import Request  # ✅ ADICIONAR PARA HANDLERS
 from contextlib import asynccontextmanager
 from pathlib import Path
+import asyncio
 import logging
 import traceback
 import sys
@@ -33,6 +34,10 @@ current_dir = os.path.dirname(os.path.abspath(__file__))
 if current_dir not in sys.path:
     sys.path.insert(0, current_dir)
 
+# Módulos da aplicação só depois do logging (app.database também chama basicConfig)
+from app.database import SchemaMigrationRequired  # noqa: E402
+from app.services.core.password_executor import PasswordHashingBusy  # noqa: E402
+
 
 @asynccontextmanager
 async def lifespan(app_instance: FastAPI):  # ✅ RENOMEADO PARA EVITAR SHADOW
@@ -112,6 +117,14 @@ async def lifespan(app_instance: FastAPI):  # ✅ RENOMEADO PARA EVITAR SHADOW
         except OSError as e:  # ✅ MAIS ESPECÍFICO
             logger.warning(f"⚠️ Erro ao verificar schemas: {e}")
 
+    # Custo do bcrypt calibrado para esta máquina (antes de qualquer login)
+    try:
+        from app.services.core.security import configure_bcrypt_cost
+        bcrypt_rounds = await asyncio.to_thread(configure_bcrypt_cost)
+        logger.info(f"🔐 Custo do bcrypt: {bcrypt_rounds} rounds")
+    except Exception as e:
+        logger.warning(f"⚠️ Não foi possível calibrar o bcrypt, usando o custo padrão: {e}")
+
     # Inicialização do banco de dados
     try:
         logger.info("🔍 Testando conexão com banco de dados...")
@@ -122,12 +135,30 @@ async def lifespan(app_instance: FastAPI):  # ✅ RENOMEADO PARA EVITAR SHADOW
             logger.info("📋 Criando/verificando tabelas...")
             create_tables()
             logger.info("✅ Tabelas verificadas!")
+
+            # Workers da outbox de notificações (envio fora do caminho da requisição)
+            from app.services.outbox import outbox_worker
+            await outbox_worker.start()
+            logger.info("📨 Workers da outbox de notificações iniciados")
+
+            # Índice de autocomplete carregado em segundo plano (não atrasa o startup)
+            from app.services.suggest import prime_suggest_index
+            app_instance.state.suggest_priming = asyncio.create_task(asyncio.to_thread(prime_suggest_index))
+            logger.info("🔎 Carregando índice de autocomplete em segundo plano")
+
+            # Feed de avaliações recentes também carregado em segundo plano
+            from app.services.recent_reviews import prime_recent_reviews
+            app_instance.state.recent_reviews_priming = asyncio.create_task(asyncio.to_thread(prime_recent_reviews))
         else:
             logger.warning("⚠️ Banco de dados não disponível!")
 
     except ImportError as e:
         logger.error(f"❌ Erro de importação do módulo database: {e}")
         logger.warning("⚠️ Módulo database não encontrado")
+    except SchemaMigrationRequired as e:
+        # Subir sem o índice único deixaria create_review quebrado: interrompe o startup
+        logger.critical(f"❌ {e}")
+        raise
     except Exception as e:
         logger.error(f"❌ Erro na inicialização do banco: {e}")
         logger.error(f"🔍 Traceback: {traceback.format_exc()}")
@@ -142,6 +173,18 @@ async def lifespan(app_instance: FastAPI):  # ✅ RENOMEADO PARA EVITAR SHADOW
     # ========================
     logger.info("🛑 Finalizando CarWash API...")
 
+    try:
+        from app.services.outbox import outbox_worker
+        await outbox_worker.stop()
+    except Exception as e:
+        logger.warning(f"⚠️ Erro ao finalizar workers da outbox: {e}")
+
+    try:
+        from app.services.core.password_executor import password_executor
+        password_executor.shutdown()
+    except ImportError:
+        pass
+
 
 # ========================
 # CRIAR APLICAÇÃO FASTAPI
@@ -218,6 +261,7 @@ def load_routers():
         {"module": "service", "prefix": "/service", "tags": ["service"]},
         {"module": "booking", "prefix": "/booking", "tags": ["booking"]},
         {"module": "review", "prefix": "/review", "tags": ["review"]},
+        {"module": "search", "prefix": "/search", "tags": ["search"]},
         {"module": "schedule", "prefix": "/car-wash", "tags": ["schedule"]},
         {"module": "upload", "prefix": "/upload", "tags": ["upload"]},
         {"module": "admin", "prefix": "/admin", "tags": ["admin"]},
@@ -342,6 +386,31 @@ async def health_check():
         }
     }
 
+    try:
+        from app.services.nearby_cache import nearby_cache
+        health_data["nearby_cache"] = nearby_cache.stats()
+    except ImportError:
+        health_data["nearby_cache"] = "module_not_found"
+
+    try:
+        from app.services.review_stats_cache import review_stats_cache
+        health_data["review_stats_cache"] = review_stats_cache.stats()
+    except ImportError:
+        health_data["review_stats_cache"] = "module_not_found"
+
+    try:
+        from app.services.principal_cache import principal_cache
+        health_data["principal_cache"] = principal_cache.stats()
+    except ImportError:
+        health_data["principal_cache"] = "module_not_found"
+
+    try:
+        from app.services.core.password_executor import password_executor
+        from app.services.core.security import current_bcrypt_rounds
+        health_data["password_hashing"] = {**password_executor.stats(), "bcrypt_rounds": current_bcrypt_rounds()}
+    except ImportError:
+        health_data["password_hashing"] = "module_not_found"
+
     try:
         from app.database import test_connection
         health_data["database"] = "connected" if test_connection() else "disconnected"
@@ -369,6 +438,7 @@ async def get_info():
             "services": "/service/*" if "service" in loaded_routers else "❌ Não carregado",
             "bookings": "/booking/*" if "booking" in loaded_routers else "❌ Não carregado",
             "reviews": "/review/*" if "review" in loaded_routers else "❌ Não carregado",
+            "search": "/search/*" if "search" in loaded_routers else "❌ Não carregado",
             "schedule": "/car-wash/*/schedule" if "schedule" in loaded_routers else "❌ Não carregado",
             "admin": "/admin/*" if "admin" in loaded_routers else "❌ Não carregado",
             "uploads": "/upload/*" if "upload" in loaded_routers else "❌ Não carregado",
@@ -462,6 +532,20 @@ async def not_found_handler(request: Request, _):  # ✅ USAR REQUEST, IGNORAR E
     )
 
 
+@app.exception_handler(PasswordHashingBusy)
+async def password_hashing_busy_handler(request: Request, _):
+    # Fila do bcrypt cheia: recusa rápido em vez de acumular espera
+    return JSONResponse(
+        status_code=503,
+        content={
+            "error": "Serviço sobrecarregado",
+            "message": "Muitas autenticações simultâneas. Tente novamente em instantes.",
+            "path": str(request.url.path)
+        },
+        headers={"Retry-After": "1"}
+    )
+
+
 @app.exception_handler(500)
 async def internal_error_handler(request: Request, exc: Exception):  # ✅ USAR AMBOS
     logger.error(f"❌ Erro interno em {request.url.path}: {exc}")
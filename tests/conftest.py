@@ -0,0 +1,126 @@
+# tests/conftest.py
+"""
+Os testes rodam contra um PostgreSQL de teste apontado por TEST_DATABASE_URL
+(com as extensões btree_gist e unaccent disponíveis). As tabelas são criadas uma
+vez por sessão e esvaziadas depois de cada teste; sem a variável, os testes que
+usam o banco são pulados.
+"""
+import os
+import uuid
+from datetime import date, time, timedelta
+from decimal import Decimal
+
+import pytest
+
+TEST_DATABASE_URL = os.environ.get("TEST_DATABASE_URL")
+
+# app.database lê DATABASE_URL na importação: nunca aponta para o banco da aplicação
+os.environ["DATABASE_URL"] = TEST_DATABASE_URL or "postgresql://localhost/carwash_test_indisponivel"
+os.environ.setdefault("SECRET_KEY", "chave-dos-testes")
+
+
+@pytest.fixture(scope="session")
+def engine():
+    if not TEST_DATABASE_URL:
+        pytest.skip("TEST_DATABASE_URL não definido")
+
+    from app.database import create_tables, engine as app_engine
+    # Registra todos os modelos e os Index() declarados nos módulos de CRUD
+    import app.crud.booking  # noqa: F401
+    import app.crud.review  # noqa: F401
+    import app.crud.service  # noqa: F401
+    import app.crud.user  # noqa: F401
+
+    create_tables()
+    return app_engine
+
+
+def _reset_process_state():
+    from app.services.nearby_cache import nearby_cache
+    from app.services.principal_cache import principal_cache
+    from app.services.recent_reviews import recent_reviews_feed
+    from app.services.review_stats_cache import review_stats_cache
+    from app.services.suggest import suggest_index
+
+    for cache in (nearby_cache, principal_cache, review_stats_cache):
+        cache.clear()
+    suggest_index.load([], [])
+    recent_reviews_feed.load([])
+
+
+@pytest.fixture
+def db(engine):
+    from sqlalchemy import text
+    from app.database import Base, SessionLocal
+
+    _reset_process_state()
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.close()
+        tables = ", ".join(table.name for table in Base.metadata.sorted_tables)
+        with engine.begin() as connection:
+            connection.execute(text(f"TRUNCATE {tables} CASCADE"))
+        _reset_process_state()
+
+
+@pytest.fixture
+def make_user(db):
+    from app.crud.user import create_user
+    from app.schemas.user import UserCreate
+
+    def make_user(**fields):
+        fields.setdefault("nome", "Cliente de Teste")
+        fields.setdefault("email", f"cliente-{uuid.uuid4().hex[:12]}@example.com")
+        # Hash pronto: os testes não pagam o custo do bcrypt
+        return create_user(db, UserCreate(senha="senha-de-teste", **fields), senha_hash="$2b$04$hash-de-teste")
+
+    return make_user
+
+
+@pytest.fixture
+def make_car_wash(db):
+    from app.crud.car_wash import create_car_wash
+    from app.schemas.car_wash import CarWashCreate
+
+    def make_car_wash(**fields):
+        fields.setdefault("nome", "Lava-Jato de Teste")
+        fields.setdefault("latitude", -23.5505)
+        fields.setdefault("longitude", -46.6333)
+        return create_car_wash(db, CarWashCreate(**fields))
+
+    return make_car_wash
+
+
+@pytest.fixture
+def make_service(db):
+    from app.crud.service import create_service
+    from app.schemas.service import ServiceCreate
+
+    def make_service(car_wash, **fields):
+        fields.setdefault("nome", "Lavagem completa")
+        fields.setdefault("preco", Decimal("50.00"))
+        fields.setdefault("duracao_minutos", 60)
+        return create_service(db, ServiceCreate(car_wash_id=car_wash.id, **fields))
+
+    return make_service
+
+
+@pytest.fixture
+def completed_booking(db):
+    """Agendamento concluído (pré-requisito para avaliar o lava-jato)"""
+    from app.crud.booking import reserve_booking, update_booking_status
+    from app.models.booking import BookingStatus
+    from app.schemas.booking import BookingCreate
+
+    def completed_booking(user, service, day_offset: int = 1):
+        booking = reserve_booking(db, BookingCreate(
+            car_wash_id=service.car_wash_id,
+            service_id=service.id,
+            data=date.today() - timedelta(days=day_offset),
+            hora=time(10, 0)
+        ), str(user.id))
+        return update_booking_status(db, str(booking.id), BookingStatus.CONCLUIDO)
+
+    return completed_booking
@@ -0,0 +1,109 @@
+# tests/test_booking.py
+import threading
+import time as timer
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, time, timedelta
+
+from app.crud.booking import ACTIVE_STATUSES, reserve_booking
+from app.database import SessionLocal
+from app.models.booking import Booking
+from app.models.booking_interval import BookingInterval
+from app.schemas.booking import BookingCreate
+
+
+def _reserve_concurrently(attempts):
+    """
+    Dispara as reservas (BookingCreate, user_id) ao mesmo tempo, uma sessão por tentativa
+    Retorna (ids aceitos por tentativa ou None, segundos decorridos).
+    """
+    barrier = threading.Barrier(len(attempts))
+
+    def attempt(item):
+        booking_data, user_id = item
+        session = SessionLocal()
+        try:
+            barrier.wait()
+            booking = reserve_booking(session, booking_data, user_id)
+            return booking.id if booking else None
+        finally:
+            session.close()
+
+    started = timer.perf_counter()
+    with ThreadPoolExecutor(max_workers=len(attempts)) as pool:
+        results = list(pool.map(attempt, attempts))
+    return results, timer.perf_counter() - started
+
+
+def _assert_no_double_booking(db, car_wash, duration_minutes):
+    bookings = db.query(Booking).filter(
+        Booking.car_wash_id == car_wash.id, Booking.status.in_(ACTIVE_STATUSES)
+    ).order_by(Booking.data, Booking.hora).all()
+    periods = [
+        (start, start + timedelta(minutes=duration_minutes))
+        for start in (datetime.combine(booking.data, booking.hora) for booking in bookings)
+    ]
+    for (_, previous_end), (next_start, _) in zip(periods, periods[1:]):
+        assert next_start >= previous_end, "agendamentos ativos sobrepostos"
+    assert db.query(BookingInterval).filter(BookingInterval.car_wash_id == car_wash.id).count() == len(bookings)
+    return bookings
+
+
+def test_concurrent_reservations_of_the_same_slot(db, make_user, make_car_wash, make_service):
+    car_wash = make_car_wash()
+    service = make_service(car_wash, duracao_minutos=60)
+    users = [str(make_user().id) for _ in range(20)]
+    booking_data = BookingCreate(
+        car_wash_id=car_wash.id, service_id=service.id, data=date.today() + timedelta(days=30), hora=time(10, 0)
+    )
+
+    attempts = [(booking_data, users[i % len(users)]) for i in range(300)]
+    results, elapsed = _reserve_concurrently(attempts)
+
+    winners = [booking_id for booking_id in results if booking_id]
+    assert len(winners) == 1
+    assert [booking.id for booking in _assert_no_double_booking(db, car_wash, 60)] == winners
+    print(f"\n{len(attempts)} reservas do mesmo horário em {elapsed:.2f}s ({len(attempts) / elapsed:.0f} tentativas/s)")
+
+
+def test_concurrent_reservations_of_overlapping_slots(db, make_user, make_car_wash, make_service):
+    """Horários a cada 30 min com serviço de 60 min: vizinhos se sobrepõem, nenhum par pode coexistir"""
+    car_wash = make_car_wash()
+    service = make_service(car_wash, duracao_minutos=60)
+    users = [str(make_user().id) for _ in range(20)]
+    target_date = date.today() + timedelta(days=30)
+    slots = [time(minutes // 60, minutes % 60) for minutes in range(0, 24 * 60, 30)]
+
+    attempts = [
+        (BookingCreate(car_wash_id=car_wash.id, service_id=service.id, data=target_date, hora=slot), users[i % len(users)])
+        for i, slot in enumerate(slots * 5)
+    ]
+    results, elapsed = _reserve_concurrently(attempts)
+
+    winners = [booking_id for booking_id in results if booking_id]
+    bookings = _assert_no_double_booking(db, car_wash, 60)
+    assert sorted(booking.id for booking in bookings) == sorted(winners)
+    # Cada reserva aceita bloqueia no máximo o próprio horário e os dois vizinhos
+    assert len(winners) >= len(slots) // 3
+    print(
+        f"\n{len(attempts)} reservas em {len(slots)} horários sobrepostos: {len(winners)} aceitas em "
+        f"{elapsed:.2f}s ({len(winners) / elapsed:.0f} agendamentos/s, {len(attempts) / elapsed:.0f} tentativas/s)"
+    )
+
+
+def test_concurrent_reservations_of_free_days(db, make_user, make_car_wash, make_service):
+    """Dias diferentes não disputam o mesmo advisory lock: todas as reservas entram"""
+    car_wash = make_car_wash()
+    service = make_service(car_wash, duracao_minutos=60)
+    users = [str(make_user().id) for _ in range(20)]
+
+    attempts = [
+        (BookingCreate(
+            car_wash_id=car_wash.id, service_id=service.id, data=date.today() + timedelta(days=day), hora=time(10, 0)
+        ), users[day % len(users)])
+        for day in range(1, 201)
+    ]
+    results, elapsed = _reserve_concurrently(attempts)
+
+    assert all(results)
+    assert len(_assert_no_double_booking(db, car_wash, 60)) == len(attempts)
+    print(f"\n{len(attempts)} reservas em dias livres em {elapsed:.2f}s ({len(attempts) / elapsed:.0f} agendamentos/s)")
@@ -0,0 +1,32 @@
+# tests/test_car_wash.py
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.database import get_db
+from app.routes.car_wash import router
+from app.services.core.config import settings
+from app.services.core.dependencies import get_current_user
+
+
+def _client(db, user):
+    app = FastAPI()
+    app.include_router(router, prefix="/car-wash")
+    app.dependency_overrides[get_db] = lambda: db
+    app.dependency_overrides[get_current_user] = lambda: user
+    return TestClient(app)
+
+
+def test_only_admins_move_a_car_wash(db, make_user, make_car_wash, monkeypatch):
+    car_wash = make_car_wash(latitude=-23.5505, longitude=-46.6333)
+    admin, customer = make_user(email="admin@lavajato.com"), make_user(email="cliente@lavajato.com")
+    monkeypatch.setattr(settings, "ADMIN_EMAILS", ["admin@lavajato.com"])
+    new_location = {"latitude": -22.9068, "longitude": -43.1729}
+
+    response = _client(db, customer).put(f"/car-wash/{car_wash.id}/location", json=new_location)
+    assert response.status_code == 403
+    db.refresh(car_wash)
+    assert (car_wash.latitude, car_wash.longitude) == (-23.5505, -46.6333)
+
+    response = _client(db, admin).put(f"/car-wash/{car_wash.id}/location", json=new_location)
+    assert response.status_code == 200
+    assert (response.json()["latitude"], response.json()["longitude"]) == (-22.9068, -43.1729)
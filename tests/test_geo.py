@@ -0,0 +1,159 @@
+# tests/test_geo.py
+import random
+
+from app.services.geo_kernel import geo_kernel
+from app.services.location import calculate_bearing, calculate_distance_km
+from app.services.nearby_cache import NearbySearchCache
+
+
+def test_scalar_helpers_match_the_kernel():
+    rng = random.Random(5)
+    center_lat, center_lon = -23.55, -46.63
+    latitudes = [rng.uniform(-24.5, -22.5) for _ in range(2000)]
+    longitudes = [rng.uniform(-47.5, -45.5) for _ in range(2000)]
+
+    result = geo_kernel(center_lat, center_lon, latitudes, longitudes)
+    assert [
+        calculate_distance_km(center_lat, center_lon, lat, lon) for lat, lon in zip(latitudes, longitudes)
+    ] == result.distances_km.tolist()
+    assert [
+        calculate_bearing(center_lat, center_lon, lat, lon) for lat, lon in zip(latitudes, longitudes)
+    ] == result.bearings.tolist()
+
+
+def test_invalidate_point_removes_only_searches_that_cover_it():
+    cache = NearbySearchCache(max_entries=100, ttl_seconds=60)
+    cache.search(-23.55, -46.63, 5, lambda lat, lon, radius: [("perto", -23.56, -46.64, 1.0)])
+    cache.search(-22.90, -43.17, 5, lambda lat, lon, radius: [("longe", -22.91, -43.18, 1.0)])
+
+    assert cache.invalidate_point(-23.57, -46.65) == 1
+    assert cache.stats()["entries"] == 1
+    assert cache.invalidate_point(None, None) == 0
+
+
+def _inside_box(box, latitude, longitude):
+    from app.services.location import longitude_ranges
+
+    min_lat, max_lat, min_lon, max_lon = box
+    return min_lat <= latitude <= max_lat and any(
+        low <= longitude <= high for low, high in longitude_ranges(min_lon, max_lon)
+    )
+
+
+def test_bounding_box_contains_the_whole_circle():
+    from app.services.location import get_bounding_box
+
+    rng = random.Random(9)
+    # Equador, Brasil, latitudes altas, perto dos polos e do antimeridiano
+    centers = [(0, 0), (-23.55, -46.63), (64.1, -21.9), (-78.0, 166.7), (89.5, 10), (10, 179.9), (-45, -179.95)]
+    for center_lat, center_lon in centers:
+        for radius_km in (1, 50, 800, 5000):
+            box = get_bounding_box(center_lat, center_lon, radius_km)
+            latitudes = [rng.uniform(-90, 90) for _ in range(20_000)]
+            longitudes = [rng.uniform(-180, 180) for _ in range(20_000)]
+            # Pontos concentrados na borda do círculo, onde a aproximação antiga falhava
+            for _ in range(2000):
+                latitudes.append(max(-90.0, min(90.0, center_lat + rng.uniform(-1, 1) * radius_km / 100)))
+                longitudes.append((center_lon + rng.uniform(-1, 1) * radius_km / 20 + 180) % 360 - 180)
+
+            result = geo_kernel(center_lat, center_lon, latitudes, longitudes, radius_km=radius_km, with_bearings=False)
+            for latitude, longitude, inside in zip(latitudes, longitudes, result.within_radius.tolist()):
+                if inside:
+                    assert _inside_box(box, latitude, longitude), (center_lat, center_lon, radius_km, latitude, longitude)
+
+
+def test_grid_index_searches_across_the_antimeridian():
+    from app.services.geo_index import SpatialGridIndex
+
+    index = SpatialGridIndex(max_age_seconds=None)
+    index.load([("leste", -17.0, 179.99), ("oeste", -17.0, -179.99), ("longe", -17.0, 170.0)])
+
+    assert [point_id for point_id, _ in index.query_radius(-17.0, 179.995, 5)] == ["leste", "oeste"]
+    assert [point_id for point_id, _ in index.query_nearest(-17.0, -179.999, 2)] == ["oeste", "leste"]
+
+
+def test_nearby_search_in_the_database_across_the_antimeridian(db, make_car_wash):
+    from app.crud.car_wash import get_nearby_car_washes, get_nearest_car_washes
+
+    east = make_car_wash(nome="Lava-Jato Leste", latitude=-17.0, longitude=179.99)
+    west = make_car_wash(nome="Lava-Jato Oeste", latitude=-17.0, longitude=-179.99)
+
+    nearby = get_nearby_car_washes(db, user_lat=-17.0, user_lon=-179.999, radius_km=5)
+    assert [car_wash.id for car_wash in nearby] == [west.id, east.id]
+    nearest = get_nearest_car_washes(db, user_lat=-17.0, user_lon=179.999, k=2)
+    assert [car_wash.id for car_wash in nearest] == [east.id, west.id]
+
+
+class _QueryDuringLoad:
+    """Sessão falsa: roda `during_query` no meio da consulta e devolve `rows`"""
+
+    def __init__(self, rows, during_query):
+        self.rows = rows
+        self.during_query = during_query
+
+    def query(self, *columns):
+        return self
+
+    def filter(self, *criteria):
+        return self
+
+    def all(self):
+        self.during_query()
+        return self.rows
+
+    def close(self):
+        pass
+
+
+def test_grid_index_keeps_changes_made_during_the_load():
+    from app.services.geo_index import SpatialGridIndex
+
+    index = SpatialGridIndex(max_age_seconds=None)
+
+    def concurrent_writes():
+        index.add("novo", -23.55, -46.63)
+        index.remove("removido")
+        index.move("movido", -23.56, -46.64)
+
+    index.ensure_loaded(_QueryDuringLoad(
+        [("removido", -23.55, -46.63), ("movido", -10.0, -40.0)], concurrent_writes
+    ))
+
+    assert sorted(point_id for point_id, _ in index.query_radius(-23.55, -46.63, 5)) == ["movido", "novo"]
+    index.add("depois", -23.55, -46.63)
+    assert index._changes_during_load is None
+
+
+def test_stale_grid_index_reloads_once_in_the_background(monkeypatch):
+    import threading
+    import time
+    import app.database
+    from app.services.geo_index import SpatialGridIndex
+
+    index = SpatialGridIndex(max_age_seconds=300)
+    index.load([("antigo", -23.55, -46.63)])
+    index._loaded_at -= 301
+
+    release, queries = threading.Event(), []
+
+    def slow_query():
+        queries.append(threading.current_thread().name)
+        release.wait(5)
+
+    monkeypatch.setattr(
+        app.database, "SessionLocal", lambda: _QueryDuringLoad([("novo", -23.55, -46.63)], slow_query)
+    )
+
+    # Quem consulta durante a recarga não espera nem dispara outra carga
+    for _ in range(20):
+        index.ensure_loaded(None)
+        assert [point_id for point_id, _ in index.query_radius(-23.55, -46.63, 5)] == ["antigo"]
+    assert index.is_loading()
+
+    release.set()
+    for _ in range(100):
+        if not index.is_loading():
+            break
+        time.sleep(0.05)
+    assert queries == ["geo-index-reload"]
+    assert [point_id for point_id, _ in index.query_radius(-23.55, -46.63, 5)] == ["novo"]
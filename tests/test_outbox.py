@@ -0,0 +1,95 @@
+# tests/test_outbox.py
+import asyncio
+
+import aiosmtplib
+import pytest
+
+from app.services.outbox import SMTPConnectionPool
+from app.services.templates import RenderedEmail
+
+
+class FakeSMTP:
+    """Cliente SMTP falso: cada chamada de sendmail consome o próximo resultado de `outcomes`"""
+
+    instances = []
+    outcomes = []
+
+    def __init__(self, **kwargs):
+        self.is_connected = False
+        self.closed = False
+        self.sent = 0
+        FakeSMTP.instances.append(self)
+
+    async def connect(self):
+        self.is_connected = True
+
+    async def sendmail(self, sender, recipients, raw):
+        outcome = FakeSMTP.outcomes.pop(0)
+        if outcome is not None:
+            if isinstance(outcome, aiosmtplib.SMTPServerDisconnected):
+                self.is_connected = False
+            raise outcome
+        self.sent += 1
+
+    def close(self):
+        self.is_connected = False
+        self.closed = True
+
+
+@pytest.fixture
+def pool(monkeypatch):
+    monkeypatch.setattr(aiosmtplib, "SMTP", FakeSMTP)
+    FakeSMTP.instances, FakeSMTP.outcomes = [], []
+    return SMTPConnectionPool({"host": "smtp.teste", "port": 25}, size=1)
+
+
+def _message():
+    return RenderedEmail(sender="noreply@teste", to="cliente@teste", subject="Teste", raw=b"Subject: Teste\r\n\r\nOi")
+
+
+def test_expired_session_is_closed_before_reconnecting(pool):
+    FakeSMTP.outcomes = [None, aiosmtplib.SMTPServerDisconnected("expirou"), None]
+
+    async def scenario():
+        await pool.send(_message())
+        await pool.send(_message())
+
+    asyncio.run(scenario())
+    stale, fresh = FakeSMTP.instances
+    assert stale.closed and stale.sent == 1
+    assert not fresh.closed and fresh.sent == 1
+    assert pool._idle.get_nowait() is fresh
+
+
+def test_refused_message_keeps_the_session(pool):
+    FakeSMTP.outcomes = [aiosmtplib.SMTPRecipientsRefused([]), aiosmtplib.SMTPDataError(554, "conteúdo recusado"), None]
+
+    async def scenario():
+        with pytest.raises(aiosmtplib.SMTPRecipientsRefused):
+            await pool.send(_message())
+        with pytest.raises(aiosmtplib.SMTPDataError):
+            await pool.send(_message())
+        await pool.send(_message())
+
+    asyncio.run(scenario())
+    [client] = FakeSMTP.instances
+    assert not client.closed and client.sent == 1
+
+
+def test_failed_reconnect_closes_both_clients(pool, monkeypatch):
+    FakeSMTP.outcomes = [aiosmtplib.SMTPServerDisconnected("expirou")]
+
+    async def refuse_connection(self):
+        raise aiosmtplib.SMTPConnectError("servidor fora do ar")
+
+    async def scenario():
+        client = FakeSMTP()
+        await client.connect()
+        pool._idle.put_nowait(client)
+        monkeypatch.setattr(FakeSMTP, "connect", refuse_connection)
+        with pytest.raises(aiosmtplib.SMTPConnectError):
+            await pool.send(_message())
+
+    asyncio.run(scenario())
+    assert [client.closed for client in FakeSMTP.instances] == [True, True]
+    assert pool._idle.empty()
@@ -0,0 +1,115 @@
+# tests/test_review.py
+import pytest
+
+from app.crud.review import create_review, delete_review, get_review_stats, update_review
+from app.schemas.review import ReviewCreate
+from app.services.review_stats_cache import review_stats_cache
+from app.services.suggest import suggest_index
+
+
+@pytest.fixture
+def reviewable(make_user, make_car_wash, make_service, completed_booking):
+    """(usuário, lava-jato) com agendamento concluído, pronto para avaliar"""
+    user = make_user()
+    car_wash = make_car_wash(nome="Lava-Jato Brilho")
+    completed_booking(user, make_service(car_wash))
+    return user, car_wash
+
+
+def _suggested(car_wash):
+    return {suggestion.id: suggestion for suggestion in suggest_index.suggest("brilho", tipo="car_wash")}.get(
+        str(car_wash.id)
+    )
+
+
+def test_review_writes_publish_rating_summary(db, reviewable):
+    user, car_wash = reviewable
+
+    review = create_review(db, ReviewCreate(car_wash_id=car_wash.id, nota=4), str(user.id))
+    assert review is not None
+    assert _suggested(car_wash).popularidade == 1
+    assert review_stats_cache.get(car_wash.id)["distribuicao"]["4"] == 1
+
+    update_review(db, str(review.id), str(user.id), nota=2)
+    stats = get_review_stats(db, str(car_wash.id))
+    assert stats["nota_media"] == 2.0
+    assert stats["distribuicao"]["4"] == 0 and stats["distribuicao"]["2"] == 1
+
+    assert delete_review(db, str(review.id), str(user.id))
+    assert _suggested(car_wash).popularidade == 0
+    assert review_stats_cache.get(car_wash.id)["total_avaliacoes"] == 0
+
+
+def test_repeated_review_is_rejected(db, reviewable):
+    user, car_wash = reviewable
+
+    assert create_review(db, ReviewCreate(car_wash_id=car_wash.id, nota=5), str(user.id)) is not None
+    assert create_review(db, ReviewCreate(car_wash_id=car_wash.id, nota=1), str(user.id)) is None
+    assert get_review_stats(db, str(car_wash.id))["total_avaliacoes"] == 1
+
+
+def test_create_review_statements(db, engine, reviewable):
+    """INSERT da avaliação + UPDATE dos agregados numa CTE ("WITH ...") + um COMMIT"""
+    from sqlalchemy import event
+    from app.crud.car_wash import rebuild_rating_stats
+
+    user, car_wash = reviewable
+    # Com a linha de agregados já criada, a avaliação não cai no rebuild completo
+    rebuild_rating_stats(db, str(car_wash.id))
+    db.commit()
+
+    statements, commits = [], []
+
+    def count_statement(connection, cursor, statement, parameters, context, executemany):
+        statements.append(statement.split(None, 1)[0].upper())
+
+    def count_commit(connection):
+        commits.append(connection)
+
+    event.listen(engine, "before_cursor_execute", count_statement)
+    event.listen(engine, "commit", count_commit)
+    try:
+        review = create_review(db, ReviewCreate(car_wash_id=car_wash.id, nota=5), str(user.id))
+    finally:
+        event.remove(engine, "before_cursor_execute", count_statement)
+        event.remove(engine, "commit", count_commit)
+
+    assert review is not None
+    assert statements == ["INSERT", "WITH"]
+    assert len(commits) == 1
+
+
+def test_unique_index_requires_dedupe(db, engine, reviewable):
+    """Com avaliações repetidas o startup falha sem apagar nada; a migração remove a mais antiga"""
+    from sqlalchemy import text
+    from app.database import SchemaMigrationRequired, create_missing_indexes
+    from app.models.review import Review
+    from app.services.review_dedupe import remove_duplicate_reviews
+
+    user, car_wash = reviewable
+    with engine.begin() as connection:
+        connection.execute(text("DROP INDEX ux_reviews_user_car_wash"))
+    older = Review(user_id=user.id, car_wash_id=car_wash.id, nota=1)
+    db.add(older)
+    db.commit()
+    older_id = older.id
+    newer = Review(user_id=user.id, car_wash_id=car_wash.id, nota=5)
+    db.add(newer)
+    db.commit()
+
+    try:
+        with pytest.raises(SchemaMigrationRequired, match="app.services.review_dedupe"):
+            create_missing_indexes()
+        assert db.query(Review).count() == 2
+
+        assert remove_duplicate_reviews(db, dry_run=True) == 1
+        assert db.query(Review).count() == 2
+        assert remove_duplicate_reviews(db) == 1
+        assert [review.id for review in db.query(Review).all()] == [newer.id]
+        assert get_review_stats(db, str(car_wash.id))["nota_media"] == 5.0
+    finally:
+        # Recria o índice mesmo se o teste falhou antes da migração
+        db.rollback()
+        db.query(Review).filter(Review.id == older_id).delete()
+        db.commit()
+        create_missing_indexes()
@@ -0,0 +1,67 @@
+# tests/test_suggest.py
+from types import SimpleNamespace
+
+import pytest
+
+from app.services.suggest import SuggestIndex
+
+
+class _QueriesDuringLoad:
+    """Sessão falsa: devolve um resultado por consulta e roda `during_query` antes da primeira"""
+
+    def __init__(self, results, during_query):
+        self.results = list(results)
+        self.during_query = during_query
+
+    def query(self, *columns):
+        return self
+
+    def join(self, *args):
+        return self
+
+    def filter(self, *criteria):
+        return self
+
+    def all(self):
+        if self.during_query:
+            self.during_query()
+            self.during_query = None
+        return self.results.pop(0)
+
+
+def test_suggest_index_keeps_changes_made_during_the_load():
+    index = SuggestIndex(max_age_seconds=None)
+
+    def concurrent_writes():
+        index.add_car_wash(SimpleNamespace(id="novo", nome="Lava-Jato Novo", total_avaliacoes=0, ativo=True))
+        index.remove_car_wash("fechado")
+        index.add_service(SimpleNamespace(id="s2", nome="Polimento técnico", ativo=True))
+        index.remove_service("s1")
+        index.add_service(SimpleNamespace(id="s3", nome="Cristalização", ativo=True))
+
+    index.ensure_loaded(_QueriesDuringLoad(
+        [
+            [("fechado", "Lava-Jato Fechado", 3), ("aberto", "Lava-Jato Aberto", 1)],
+            [("s1", "Polimento"), ("s2", "Polimento")],
+        ],
+        concurrent_writes
+    ))
+
+    assert sorted(s.id for s in index.suggest("lava jato", tipo="car_wash")) == ["aberto", "novo"]
+    assert {s.nome: s.popularidade for s in index.suggest("polim", tipo="service")} == {"Polimento técnico": 1.0}
+    assert [s.nome for s in index.suggest("crista", tipo="service")] == ["Cristalização"]
+
+    index.remove_car_wash("aberto")
+    assert index._changes_during_load is None
+
+
+def test_suggest_index_discards_changes_when_the_load_fails():
+    index = SuggestIndex(max_age_seconds=None)
+
+    class FailingSession(_QueriesDuringLoad):
+        def all(self):
+            raise RuntimeError("banco fora do ar")
+
+    with pytest.raises(RuntimeError):
+        index.ensure_loaded(FailingSession([], None))
+    assert index._changes_during_load is None and index.is_stale()